@@ -0,0 +1,160 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from trading_calendar import TradingCalendar
+from trading_strategy_season import (
+    INITIAL_CAPITAL,
+    PERIODS,
+    STOP_LOSS,
+    TAKE_PROFIT,
+    compute_basic_metrics,
+    ensure_datetime_index,
+    prepare_price_arrays,
+    run_strategy_arrays,
+)
+from data_loader import load_ohlcv
+
+# Thứ tự cột của bảng kết quả khi ghi nối tiếp ra file
+RESULT_COLUMNS = ['symbol', 'n_bars', 'start_date', 'end_date', 'Number of trades',
+                  'Total return (%)', 'Win rate (%)', 'CAGR (%)', 'Max drawdown (%)', 'error']
+
+
+def discover_csv_files(data_dir: str, pattern: str = '*.csv') -> List[Path]:
+    """Liệt kê (đã sắp xếp) các file CSV trong thư mục dữ liệu."""
+    data_dir = Path(data_dir)
+    if not data_dir.is_dir():
+        raise FileNotFoundError(f"Không tìm thấy thư mục dữ liệu: {data_dir}")
+    return sorted(p for p in data_dir.glob(pattern) if p.is_file())
+
+
+def backtest_symbol(path: str,
+                    initial_capital: float = INITIAL_CAPITAL,
+                    stop_loss: float = STOP_LOSS,
+                    take_profit: float = TAKE_PROFIT,
+                    periods: Optional[Iterable[Tuple[int, int]]] = None,
+                    use_cache: bool = False,
+                    cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Đọc một file OHLCV (load_ohlcv), chuẩn hóa một lần bằng ensure_datetime_index, chạy
+    run_strategy_arrays (như run_strategy engine numpy, nhưng không chuẩn hóa / copy df lần nữa)
+    và compute_basic_metrics. Trả về một dòng kết quả nhỏ; DataFrame giá được giải phóng ngay khi
+    hàm kết thúc. Lỗi của một mã không làm dừng cả batch mà được ghi vào cột 'error'.
+    Cache nhị phân chỉ dùng khi use_cache=True (mặc định tắt để không ghi thư mục .ohlcv_cache vào
+    thư mục dữ liệu của người dùng); cache_dir đặt cache ở chỗ khác.
+    """
+    path = Path(path)
+    row: Dict[str, Any] = {'symbol': path.stem}
+    try:
+        df = ensure_datetime_index(load_ohlcv(path, use_cache=use_cache, cache_dir=cache_dir))
+        row['n_bars'] = len(df)
+        row['start_date'] = df.index[0] if len(df) else pd.NaT
+        row['end_date'] = df.index[-1] if len(df) else pd.NaT
+
+        _, opens, closes = prepare_price_arrays(df)
+        trades = run_strategy_arrays(TradingCalendar(df.index), opens, closes,
+                                     initial_capital=initial_capital,
+                                     stop_loss=stop_loss,
+                                     take_profit=take_profit,
+                                     periods=list(periods) if periods is not None else PERIODS)
+        metrics = compute_basic_metrics(trades, initial_capital=initial_capital)
+        if metrics is None:
+            row['Number of trades'] = 0
+        else:
+            row.update(metrics)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def iter_batch_backtest(data_dir: str,
+                        pattern: str = '*.csv',
+                        n_jobs: Optional[int] = None,
+                        max_in_flight: Optional[int] = None,
+                        initial_capital: float = INITIAL_CAPITAL,
+                        stop_loss: float = STOP_LOSS,
+                        take_profit: float = TAKE_PROFIT,
+                        periods: Optional[Iterable[Tuple[int, int]]] = None,
+                        use_cache: bool = False,
+                        cache_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Chạy backtest cho từng file CSV và yield kết quả từng mã ngay khi xong (thứ tự hoàn thành).
+
+    Chỉ tối đa `max_in_flight` file (mặc định 2 × n_jobs) được gửi cho pool cùng lúc, nên
+    số mã nằm trong bộ nhớ luôn bị chặn dù thư mục có hàng nghìn file.
+    """
+    files = discover_csv_files(data_dir, pattern)
+    if periods is not None:
+        periods = [tuple(p) for p in periods]
+    kwargs = dict(initial_capital=initial_capital, stop_loss=stop_loss,
+                  take_profit=take_profit, periods=periods, use_cache=use_cache, cache_dir=cache_dir)
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(int(n_jobs), len(files) or 1))
+
+    if n_jobs == 1:
+        for path in files:
+            yield backtest_symbol(str(path), **kwargs)
+        return
+
+    if max_in_flight is None:
+        max_in_flight = 2 * n_jobs
+    max_in_flight = max(1, int(max_in_flight))
+
+    pending_files = iter(files)
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        in_flight = set()
+        for path in pending_files:
+            in_flight.add(pool.submit(backtest_symbol, str(path), **kwargs))
+            if len(in_flight) >= max_in_flight:
+                break
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+                nxt = next(pending_files, None)
+                if nxt is not None:
+                    in_flight.add(pool.submit(backtest_symbol, str(nxt), **kwargs))
+
+
+def run_batch_backtest(data_dir: str,
+                       pattern: str = '*.csv',
+                       n_jobs: Optional[int] = None,
+                       max_in_flight: Optional[int] = None,
+                       output_path: Optional[str] = None,
+                       initial_capital: float = INITIAL_CAPITAL,
+                       stop_loss: float = STOP_LOSS,
+                       take_profit: float = TAKE_PROFIT,
+                       periods: Optional[Iterable[Tuple[int, int]]] = None,
+                       use_cache: bool = False,
+                       cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Backtest chiến lược theo mùa cho toàn bộ file CSV trong data_dir.
+
+    Kết quả từng mã được gom dần vào một bảng (mỗi dòng một mã); nếu có output_path thì
+    mỗi dòng còn được ghi nối tiếp vào file CSV ngay khi có, để theo dõi batch dài.
+    """
+    rows = []
+    header_written = False
+    for row in iter_batch_backtest(data_dir, pattern=pattern, n_jobs=n_jobs,
+                                   max_in_flight=max_in_flight,
+                                   initial_capital=initial_capital,
+                                   stop_loss=stop_loss,
+                                   take_profit=take_profit,
+                                   periods=periods,
+                                   use_cache=use_cache,
+                                   cache_dir=cache_dir):
+        rows.append(row)
+        if output_path is not None:
+            pd.DataFrame([row]).reindex(columns=RESULT_COLUMNS).to_csv(
+                output_path, mode='a' if header_written else 'w', header=not header_written, index=False)
+            header_written = True
+
+    if not rows:
+        return pd.DataFrame(columns=['symbol'])
+    return pd.DataFrame(rows).sort_values('symbol').reset_index(drop=True)
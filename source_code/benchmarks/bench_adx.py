@@ -0,0 +1,62 @@
+"""
+So sánh ADX bản NumPy (indicators.adx) với talib.ADX: thời gian chạy và sai số tuyệt đối lớn nhất.
+
+Chạy từ thư mục source_code:
+    python benchmarks/bench_adx.py --sizes 5000 50000 500000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indicators import adx, load_talib  # noqa: E402
+
+
+def make_ohlc(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = close * rng.uniform(0.002, 0.02, n)
+    high = close + spread * rng.random(n)
+    low = close - spread * rng.random(n)
+    return high, low, close
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 50000, 500000])
+    parser.add_argument('--timeperiod', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    talib = load_talib()
+    if talib is None:
+        print("Chưa cài TA-Lib: chỉ đo bản NumPy.")
+
+    print(f"{'n':>10} {'numpy (ms)':>12} {'talib (ms)':>12} {'max |diff|':>12}")
+    for n in args.sizes:
+        high, low, close = make_ohlc(n)
+        t_np = best_time(lambda: adx(high, low, close, args.timeperiod, backend='numpy'), args.repeat)
+        if talib is None:
+            print(f"{n:>10} {t_np * 1e3:>12.3f} {'-':>12} {'-':>12}")
+            continue
+        t_ta = best_time(lambda: talib.ADX(high, low, close, timeperiod=args.timeperiod), args.repeat)
+        diff = np.nanmax(np.abs(adx(high, low, close, args.timeperiod) -
+                                talib.ADX(high, low, close, timeperiod=args.timeperiod)))
+        print(f"{n:>10} {t_np * 1e3:>12.3f} {t_ta * 1e3:>12.3f} {diff:>12.2e}")
+
+
+if __name__ == '__main__':
+    main()
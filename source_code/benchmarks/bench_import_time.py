@@ -0,0 +1,81 @@
+"""
+Đo thời gian import từng module trong một interpreter mới (giống lúc worker của process pool khởi động)
+và liệt kê các thư viện nặng bị kéo theo (matplotlib, IPython, scipy, talib).
+
+Chạy từ thư mục source_code:
+    python benchmarks/bench_import_time.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    'trading_strategy_season',
+    'yearly_return',
+    'calendar_analysis',
+    'check_trend_following',
+    'check_mean_reversion',
+    'check_outliers',
+    'pattern_up_down',
+    'parameter_sweep',
+    'batch_backtest',
+]
+
+# Mốc so sánh: chi phí import trực tiếp các thư viện nặng
+REFERENCE = ['pandas', 'matplotlib.pyplot', 'IPython.display', 'scipy.stats']
+
+HEAVY = ['matplotlib.pyplot', 'IPython', 'scipy.stats', 'talib']
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+dt = time.perf_counter() - t0
+print(json.dumps({{'seconds': dt, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module: str, repeat: int) -> dict:
+    samples, heavy = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY)],
+                             cwd=SOURCE_DIR, capture_output=True, text=True,
+                             env={**os.environ, 'MPLBACKEND': 'Agg'})
+        if out.returncode != 0:
+            return {'module': module, 'error': out.stderr.strip().splitlines()[-1]}
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(res['seconds'])
+        heavy = res['heavy']
+    return {'module': module, 'median_ms': statistics.median(samples) * 1e3,
+            'min_ms': min(samples) * 1e3, 'heavy_loaded': heavy}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--modules', nargs='+', default=None)
+    parser.add_argument('--json', default=None, help='ghi kết quả ra file JSON')
+    args = parser.parse_args(argv)
+
+    modules = args.modules or MODULES + REFERENCE
+    results = [time_import(m, args.repeat) for m in modules]
+
+    print(f"{'module':<28} {'median (ms)':>12} {'min (ms)':>10}  heavy imports")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['module']:<28} {'lỗi':>12}  {r['error']}")
+            continue
+        print(f"{r['module']:<28} {r['median_ms']:>12.1f} {r['min_ms']:>10.1f}  {', '.join(r['heavy_loaded']) or '-'}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Benchmark khả năng mở rộng của các module phân tích trên dữ liệu OHLCV giả lập.
+
+Với mỗi (hàm, số nến, số mã): đo thời gian (lấy lần nhanh nhất sau `--repeat` lần) và bộ nhớ
+cấp phát đỉnh (tracemalloc, chạy riêng một lần) rồi ghi ra file JSON để so sánh giữa các phiên bản.
+Khi một hàm vượt `--time-budget` giây ở một kích thước, các kích thước lớn hơn của hàm đó được bỏ qua
+(status = 'skipped') — đó chính là "bức tường" mở rộng của hàm.
+
+Chạy từ thư mục source_code:
+    python benchmarks/bench_scaling.py                                   # 1e3..1e5 nến, 1 và 10 mã
+    python benchmarks/bench_scaling.py --sizes 1000 1000000 10000000 --symbols 1
+    python benchmarks/bench_scaling.py --symbols 1 10 100 1000 --sizes 5000
+    python benchmarks/bench_scaling.py --baseline old.json --output new.json   # in tỉ lệ so với bản cũ
+"""
+import argparse
+import contextlib
+import datetime as dt
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SOURCE_DIR)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from synthetic_data import iter_universe  # noqa: E402
+from trading_strategy_season import ensure_datetime_index, run_strategy  # noqa: E402
+from check_outliers import detect_outliers  # noqa: E402
+from pattern_up_down import analyze_up_down  # noqa: E402
+from calendar_analysis import analyze_calendar_effects  # noqa: E402
+from check_trend_following import check_trend_following  # noqa: E402
+from check_mean_reversion import check_mean_reversion  # noqa: E402
+from yearly_return import evaluate_seasonal_strategy  # noqa: E402
+import indicator_cache  # noqa: E402
+
+INITIAL_CAPITAL = 100_000
+
+
+# ---------------------------------------------------------
+# 1. Các hàm được đo: setup (không tính giờ) + run (tính giờ)
+# ---------------------------------------------------------
+def _trades(df):
+    return run_strategy(ensure_datetime_index(df), initial_capital=INITIAL_CAPITAL, engine='numpy')
+
+
+TARGETS: Dict[str, Dict[str, Callable]] = {
+    'run_strategy': {
+        'setup': ensure_datetime_index,
+        'run': lambda x: run_strategy(x, initial_capital=INITIAL_CAPITAL),
+    },
+    'run_strategy[numpy]': {
+        'setup': ensure_datetime_index,
+        'run': lambda x: run_strategy(x, initial_capital=INITIAL_CAPITAL, engine='numpy'),
+    },
+    'detect_outliers': {
+        'setup': lambda df: df,
+        'run': lambda x: detect_outliers(x, price_col='Close', threshold=3),
+    },
+    'analyze_up_down': {
+        'setup': lambda df: df,
+        'run': lambda x: analyze_up_down(x, plot=False, print_summary=False),
+    },
+    'analyze_calendar_effects': {
+        'setup': lambda df: df,
+        'run': lambda x: analyze_calendar_effects(x, plot=False),
+    },
+    'check_trend_following': {
+        'setup': lambda df: df,
+        'run': check_trend_following,
+    },
+    'check_mean_reversion': {
+        'setup': lambda df: df,
+        'run': check_mean_reversion,
+    },
+    'evaluate_seasonal_strategy': {
+        'setup': _trades,
+        'run': lambda trades: evaluate_seasonal_strategy(trades, INITIAL_CAPITAL, plot=False),
+    },
+}
+
+
+def _reset_caches() -> None:
+    # đo lần chạy "lạnh": không để cache indicator của lần trước làm nhanh giả tạo
+    indicator_cache.DEFAULT_CACHE.clear()
+    gc.collect()
+
+
+# ---------------------------------------------------------
+# 2. Đo một cấu hình
+# ---------------------------------------------------------
+def _measure(run: Callable, inputs: list, repeat: int, memory: bool) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    best = float('inf')
+    for _ in range(repeat):
+        _reset_caches()
+        t0 = time.perf_counter()
+        for x in inputs:
+            run(x)
+        best = min(best, time.perf_counter() - t0)
+    out['seconds'] = best
+
+    if memory:
+        _reset_caches()
+        tracemalloc.start()
+        try:
+            for x in inputs:
+                run(x)
+            out['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return out
+
+
+def bench_one(name: str, n_bars: int, n_symbols: int, repeat: int, seed: int, memory: bool) -> Dict[str, Any]:
+    target = TARGETS[name]
+    row: Dict[str, Any] = {'target': name, 'n_bars': n_bars, 'n_symbols': n_symbols}
+    try:
+        # một số hàm in bảng tổng kết (analyze_monthly, ...): bỏ phần in ra trong lúc đo
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            inputs = [target['setup'](df) for _, df in iter_universe(n_symbols, n_bars, seed=seed)]
+            row.update(_measure(target['run'], inputs, repeat, memory))
+        row['seconds_per_symbol'] = row['seconds'] / n_symbols
+        row['bars_per_second'] = n_bars * n_symbols / row['seconds'] if row['seconds'] > 0 else None
+        row['status'] = 'ok'
+    except MemoryError:
+        row['status'] = 'memory_error'
+    except Exception as e:
+        row['status'] = 'error'
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SOURCE_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(targets: List[str], sizes: List[int], symbols: List[int], repeat: int = 3, seed: int = 0,
+              memory: bool = True, time_budget: float = 60.0, verbose: bool = True) -> Dict[str, Any]:
+    results = []
+    for name in targets:
+        for n_symbols in symbols:
+            over_budget = False
+            for n_bars in sorted(sizes):
+                if over_budget:
+                    results.append({'target': name, 'n_bars': n_bars, 'n_symbols': n_symbols, 'status': 'skipped'})
+                    continue
+                row = bench_one(name, n_bars, n_symbols, repeat, seed, memory)
+                results.append(row)
+                if verbose:
+                    _print_row(row)
+                if row['status'] != 'ok' or row['seconds'] > time_budget:
+                    over_budget = True
+
+    return {
+        'meta': {
+            'timestamp': dt.datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+            'seed': seed,
+            'time_budget': time_budget,
+        },
+        'results': results,
+    }
+
+
+# ---------------------------------------------------------
+# 3. In kết quả / so sánh với bản cũ
+# ---------------------------------------------------------
+def _print_row(row: Dict[str, Any]) -> None:
+    if row['status'] != 'ok':
+        print(f"{row['target']:<28} {row['n_bars']:>10} {row['n_symbols']:>6}  {row['status']} {row.get('error', '')}")
+        return
+    peak = row.get('peak_bytes')
+    peak_s = f"{peak / 1024 ** 2:>10.1f}" if peak is not None else f"{'-':>10}"
+    print(f"{row['target']:<28} {row['n_bars']:>10} {row['n_symbols']:>6} {row['seconds']:>10.4f} {peak_s}")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Tỉ lệ thời gian / bộ nhớ (hiện tại ÷ bản cũ) cho các cấu hình có ở cả hai file."""
+    key = lambda r: (r['target'], r['n_bars'], r['n_symbols'])  # noqa: E731
+    old = {key(r): r for r in baseline['results'] if r.get('status') == 'ok'}
+    out = []
+    for r in current['results']:
+        o = old.get(key(r))
+        if r.get('status') != 'ok' or o is None:
+            continue
+        out.append({
+            'target': r['target'], 'n_bars': r['n_bars'], 'n_symbols': r['n_symbols'],
+            'time_ratio': r['seconds'] / o['seconds'] if o['seconds'] > 0 else None,
+            'memory_ratio': (r['peak_bytes'] / o['peak_bytes']
+                             if r.get('peak_bytes') and o.get('peak_bytes') else None),
+        })
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-budget', type=float, default=60.0,
+                        help='bỏ qua kích thước lớn hơn khi một lần chạy vượt quá số giây này')
+    parser.add_argument('--no-memory', action='store_true', help='không đo bộ nhớ (tracemalloc làm chậm)')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help='file JSON của lần chạy trước để so sánh')
+    args = parser.parse_args(argv)
+
+    print(f"{'target':<28} {'n_bars':>10} {'syms':>6} {'seconds':>10} {'peak (MB)':>10}")
+    report = run_suite(args.targets, args.sizes, args.symbols, repeat=args.repeat, seed=args.seed,
+                       memory=not args.no_memory, time_budget=args.time_budget)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['comparison'] = compare(report, json.load(f))
+        print(f"\n{'target':<28} {'n_bars':>10} {'syms':>6} {'time x':>8} {'mem x':>8}")
+        for c in report['comparison']:
+            mem = f"{c['memory_ratio']:>8.2f}" if c['memory_ratio'] is not None else f"{'-':>8}"
+            print(f"{c['target']:<28} {c['n_bars']:>10} {c['n_symbols']:>6} {c['time_ratio']:>8.2f} {mem}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nĐã ghi kết quả: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Sinh dữ liệu OHLCV giả lập (tất định theo seed) cùng schema với Data/KO.csv:
+    Date, Open, High, Low, Close, Volume, Dividends, Stock Splits
+
+Cột Date là datetime có tz (UTC), giống df sau bước pd.to_datetime(df['Date'], utc=True) trong notebook.
+Tần suất mặc định là tần suất thô nhất còn nằm trong giới hạn ngày của pandas (năm 2262):
+ngày làm việc (≤ 60k nến), rồi nến giờ (≤ 2M nến), rồi nến phút — nên 10^7 nến vẫn trải nhiều năm
+cho các phân tích theo ngày / tháng / năm.
+"""
+import os
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+START = '1990-01-02'
+# (số nến tối đa, tần suất) tính từ START mà không vượt pd.Timestamp.max
+FREQ_LIMITS = [(60_000, 'B'), (2_000_000, 'h'), (100_000_000, 'min')]
+
+
+def default_freq(n_bars: int) -> str:
+    for limit, freq in FREQ_LIMITS:
+        if n_bars <= limit:
+            return freq
+    raise ValueError(f"n_bars quá lớn (tối đa {FREQ_LIMITS[-1][0]})")
+
+
+def make_dates(n_bars: int, start: str = START, freq: Optional[str] = None) -> pd.DatetimeIndex:
+    freq = default_freq(n_bars) if freq is None else freq
+    return pd.date_range(start=start, periods=n_bars, freq=freq, tz='UTC')
+
+
+def make_ohlcv(n_bars: int,
+               seed: int = 0,
+               start: str = START,
+               freq: Optional[str] = None,
+               drift: float = 0.0003,
+               volatility: float = 0.012,
+               start_price: float = 50.0) -> pd.DataFrame:
+    """
+    Một mã OHLCV giả lập: Close theo GBM, Open cách Close trước một gap nhỏ,
+    High/Low bao quanh Open/Close. Cùng (n_bars, seed, ...) luôn cho cùng dữ liệu.
+    drift / volatility tính theo ngày và được quy đổi theo độ dài nến (giờ, phút).
+    """
+    if n_bars < 1:
+        raise ValueError("n_bars phải >= 1")
+    freq = default_freq(n_bars) if freq is None else freq
+    rng = np.random.default_rng(seed)
+
+    days_per_bar = 1.0 if freq == 'B' else pd.Timedelta(pd.tseries.frequencies.to_offset(freq)) / pd.Timedelta('1D')
+    drift = drift * days_per_bar
+    volatility = volatility * np.sqrt(days_per_bar)
+
+    log_ret = rng.normal(drift, volatility, n_bars)
+    close = start_price * np.exp(np.cumsum(log_ret))
+    prev_close = np.concatenate(([start_price], close[:-1]))
+    open_ = prev_close * np.exp(rng.normal(0.0, volatility / 4, n_bars))
+    body_hi = np.maximum(open_, close)
+    body_lo = np.minimum(open_, close)
+    high = body_hi * (1 + np.abs(rng.normal(0.0, volatility / 2, n_bars)))
+    low = body_lo * (1 - np.abs(rng.normal(0.0, volatility / 2, n_bars)))
+    volume = rng.lognormal(16.0, 0.4, n_bars).astype(np.int64)
+
+    return pd.DataFrame({
+        'Date': make_dates(n_bars, start=start, freq=freq),
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume,
+        'Dividends': np.zeros(n_bars),
+        'Stock Splits': np.zeros(n_bars),
+    }, columns=COLUMNS)
+
+
+def iter_universe(n_symbols: int, n_bars: int, seed: int = 0, **kwargs) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Sinh lần lượt (symbol, df) cho n_symbols mã (seed của mã i = seed + i), không giữ cả universe trong bộ nhớ."""
+    width = max(4, len(str(n_symbols - 1)))
+    for i in range(n_symbols):
+        yield f"SYN{i:0{width}d}", make_ohlcv(n_bars, seed=seed + i, **kwargs)
+
+
+def to_csv_like_ko(df: pd.DataFrame, path: str) -> None:
+    """Ghi ra CSV cùng định dạng ngày với KO.csv (ví dụ 2005-10-03 00:00:00+00:00)."""
+    out = df.copy()
+    s = out['Date'].dt.strftime('%Y-%m-%d %H:%M:%S%z')
+    out['Date'] = s.str[:-2] + ':' + s.str[-2:]
+    out.to_csv(path, index=False)
+
+
+def write_universe(data_dir: str, n_symbols: int, n_bars: int, seed: int = 0, **kwargs) -> list:
+    """Ghi universe giả lập ra thư mục (mỗi mã một file CSV) để chạy batch_backtest."""
+    os.makedirs(data_dir, exist_ok=True)
+    paths = []
+    for symbol, df in iter_universe(n_symbols, n_bars, seed=seed, **kwargs):
+        path = os.path.join(data_dir, f"{symbol}.csv")
+        to_csv_like_ko(df, path)
+        paths.append(path)
+    return paths
@@ -1,7 +1,14 @@
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional, Sequence
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from lazy_imports import lazy_module
+from trading_calendar import TradingCalendar
+from instrumentation import pipeline
+from calendar_stats import MONTH_NAMES, STAT_COLUMNS, calendar_stats, group_stats, split_by
+from calendar_cube import CalendarCube
+
+# matplotlib chỉ được import khi gọi hàm vẽ
+plt = lazy_module('matplotlib.pyplot')
 
 
 def add_calendar_columns(df: pd.DataFrame, date_col: str = 'Date') -> pd.DataFrame:
@@ -34,26 +41,34 @@ def compute_daily_return(df: pd.DataFrame, price_col: str = 'Close', return_col:
     return df
 
 
-def analyze_monthly(df: pd.DataFrame, return_col: str = 'Daily_Return') -> pd.DataFrame:
-    """Tính thống kê theo tháng và in ra kết quả giống format gốc."""
-    monthly_stats = []
-    for month in range(1, 13):
-        month_data = df[df['Month'] == month]
-        if len(month_data) > 0:
-            returns = month_data[return_col].dropna()
-            if len(returns) > 0:
-                monthly_stats.append({
-                    'Month': month,
-                    'Month_Name': month_data['Month_Name'].iloc[0],
-                    'Avg_Return': returns.mean(),
-                    'Median_Return': returns.median(),
-                    'Std_Dev': returns.std(),
-                    'Positive_Days': (returns > 0).sum(),
-                    'Negative_Days': (returns < 0).sum(),
-                    'Total_Days': len(returns)
-                })
-
-    monthly_df = pd.DataFrame(monthly_stats).sort_values('Avg_Return', ascending=False).reset_index(drop=True)
+def _stats_by_columns(df: pd.DataFrame, columns: Sequence[str], return_col: str) -> pd.DataFrame:
+    """group_stats theo các cột lịch đã có trong df (bỏ return NaN)."""
+    returns = df[return_col].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(returns)
+    return group_stats(returns[valid], {c: df[c].to_numpy()[valid] for c in columns})
+
+
+def _monthly_table(stats: pd.DataFrame) -> pd.DataFrame:
+    """Bảng thống kê theo tháng (Month, Month_Name, ...) từ output của calendar_stats."""
+    table = stats[['Month'] + STAT_COLUMNS].copy()
+    table.insert(1, 'Month_Name', [MONTH_NAMES[m - 1] for m in table['Month'].tolist()])
+    return table
+
+
+def _quarterly_table(stats: pd.DataFrame) -> pd.DataFrame:
+    """Bảng thống kê theo quý (Quarter = 'Q1'..'Q4', ...) từ output của calendar_stats."""
+    table = stats[STAT_COLUMNS].copy()
+    table.insert(0, 'Quarter', [f'Q{q}' for q in stats['Quarter'].tolist()])
+    return table
+
+
+def analyze_monthly(df: pd.DataFrame, return_col: str = 'Daily_Return', stats: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Tính thống kê theo tháng và in ra kết quả giống format gốc.
+    stats: bảng khóa 'month' của calendar_stats nếu đã tính (không nhóm lại df).
+    """
+    if stats is None:
+        stats = _stats_by_columns(df, ['Month'], return_col)
+    monthly_df = _monthly_table(stats).sort_values('Avg_Return', ascending=False).reset_index(drop=True)
 
     # In ra thông tin 
     print("=" * 70)
@@ -75,25 +90,13 @@ def analyze_monthly(df: pd.DataFrame, return_col: str = 'Daily_Return') -> pd.Da
     return monthly_df
 
 
-def analyze_quarterly(df: pd.DataFrame, return_col: str = 'Daily_Return') -> pd.DataFrame:
-    """Tính thống kê theo quý và in ra kết quả."""
-    quarterly_stats = []
-    for quarter in range(1, 5):
-        quarter_data = df[df['Quarter'] == quarter]
-        if len(quarter_data) > 0:
-            returns = quarter_data[return_col].dropna()
-            if len(returns) > 0:
-                quarterly_stats.append({
-                    'Quarter': f'Q{quarter}',
-                    'Avg_Return': returns.mean(),
-                    'Median_Return': returns.median(),
-                    'Std_Dev': returns.std(),
-                    'Positive_Days': (returns > 0).sum(),
-                    'Negative_Days': (returns < 0).sum(),
-                    'Total_Days': len(returns)
-                })
-
-    quarterly_df = pd.DataFrame(quarterly_stats).sort_values('Avg_Return', ascending=False).reset_index(drop=True)
+def analyze_quarterly(df: pd.DataFrame, return_col: str = 'Daily_Return', stats: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Tính thống kê theo quý và in ra kết quả.
+    stats: bảng khóa 'quarter' của calendar_stats nếu đã tính.
+    """
+    if stats is None:
+        stats = _stats_by_columns(df, ['Quarter'], return_col)
+    quarterly_df = _quarterly_table(stats).sort_values('Avg_Return', ascending=False).reset_index(drop=True)
 
     print("" + "=" * 70)
     print("2. PHÂN TÍCH THEO QUÝ (QUARTER EFFECT)")
@@ -156,54 +159,50 @@ def plot_calendar_effects(df: pd.DataFrame, monthly_df: pd.DataFrame, quarterly_
     return fig
 
 
+def _per_year_stats(df: pd.DataFrame, period_col: str, return_col: str,
+                    calendar: Optional[TradingCalendar],
+                    only_years: Optional[Sequence[int]] = None) -> Tuple[List[int], Dict[int, pd.DataFrame]]:
+    """Thống kê (Year, period) trong một lượt nhóm rồi tách theo năm (chỉ các năm only_years nếu truyền)."""
+    if calendar is not None:
+        # dùng sẵn mảng năm / tháng của calendar thay vì đọc cột của df
+        if len(calendar) != len(df):
+            raise ValueError("calendar không khớp với số dòng của df")
+        years = calendar.years
+        periods = calendar.months if period_col == 'Month' else (calendar.months - 1) // 3 + 1
+        all_years = [int(y) for y in calendar.unique_years()]
+    else:
+        years = df['Year'].to_numpy()
+        periods = df[period_col].to_numpy()
+        all_years = sorted(df['Year'].dropna().unique().astype(int))
+    returns = df[return_col].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(returns)
+    if only_years is not None:
+        wanted = set(int(y) for y in only_years)
+        all_years = [y for y in all_years if y in wanted]
+        valid &= np.isin(years, all_years)
+    stats = group_stats(returns[valid], {'Year': years[valid], period_col: periods[valid]})
+    return all_years, split_by(stats, 'Year')
+
+
 # Hàm tính thống kê theo tháng/quý cho từng năm và vẽ từng năm riêng biệt
-def compute_monthly_stats_per_year(df: pd.DataFrame, return_col: str = 'Daily_Return') -> Dict[int, pd.DataFrame]:
-    """Trả về dict: year -> monthly stats DataFrame (Month, Month_Name, Avg_Return, ...)."""
-    years = sorted(df['Year'].dropna().unique().astype(int))
-    out = {}
-    for y in years:
-        sub = df[df['Year'] == y]
-        stats = []
-        for m in range(1, 13):
-            mdata = sub[sub['Month'] == m]
-            returns = mdata[return_col].dropna()
-            if len(returns) > 0:
-                stats.append({
-                    'Month': m,
-                    'Month_Name': mdata['Month_Name'].iloc[0] if len(mdata) > 0 else pd.to_datetime(f'{y}-{m}-01').month_name(),
-                    'Avg_Return': returns.mean(),
-                    'Median_Return': returns.median(),
-                    'Std_Dev': returns.std(),
-                    'Positive_Days': (returns > 0).sum(),
-                    'Negative_Days': (returns < 0).sum(),
-                    'Total_Days': len(returns)
-                })
-        out[y] = pd.DataFrame(stats).sort_values('Month').reset_index(drop=True)
-    return out
+def compute_monthly_stats_per_year(df: pd.DataFrame, return_col: str = 'Daily_Return', calendar: Optional[TradingCalendar] = None,
+                                   years: Optional[Sequence[int]] = None) -> Dict[int, pd.DataFrame]:
+    """Trả về dict: year -> monthly stats DataFrame (Month, Month_Name, Avg_Return, ...).
+    Mọi (năm, tháng) được nhóm trong một lượt (calendar_stats.group_stats); calendar nếu truyền
+    (TradingCalendar dựng từ cột ngày của df) thì dùng mảng năm / tháng có sẵn của nó.
+    years: chỉ tính các năm này (None = mọi năm).
+    """
+    years, per_year = _per_year_stats(df, 'Month', return_col, calendar, years)
+    empty = pd.DataFrame(columns=['Month', 'Month_Name'] + STAT_COLUMNS)
+    return {y: _monthly_table(per_year[y]) if y in per_year else empty.copy() for y in years}
 
 # Tính thống kê theo quý
-def compute_quarterly_stats_per_year(df: pd.DataFrame, return_col: str = 'Daily_Return') -> Dict[int, pd.DataFrame]:
+def compute_quarterly_stats_per_year(df: pd.DataFrame, return_col: str = 'Daily_Return', calendar: Optional[TradingCalendar] = None,
+                                     years: Optional[Sequence[int]] = None) -> Dict[int, pd.DataFrame]:
 
-    years = sorted(df['Year'].dropna().unique().astype(int))
-    out = {}
-    for y in years:
-        sub = df[df['Year'] == y]
-        stats = []
-        for q in range(1, 5):
-            qdata = sub[sub['Quarter'] == q]
-            returns = qdata[return_col].dropna()
-            if len(returns) > 0:
-                stats.append({
-                    'Quarter': f'Q{q}',
-                    'Avg_Return': returns.mean(),
-                    'Median_Return': returns.median(),
-                    'Std_Dev': returns.std(),
-                    'Positive_Days': (returns > 0).sum(),
-                    'Negative_Days': (returns < 0).sum(),
-                    'Total_Days': len(returns)
-                })
-        out[y] = pd.DataFrame(stats).reset_index(drop=True)
-    return out
+    years, per_year = _per_year_stats(df, 'Quarter', return_col, calendar, years)
+    empty = pd.DataFrame(columns=['Quarter'] + STAT_COLUMNS)
+    return {y: _quarterly_table(per_year[y]) if y in per_year else empty.copy() for y in years}
 
 
 # Vẽ mỗi năm một figure (Tháng + Quý).
@@ -213,8 +212,15 @@ def plot_calendar_effects_by_year(
     years: List[int] = None,
     figsize: Tuple[int, int] = (12, 5),
     max_years: int = 10,
-    show: bool = True
+    show: bool = True,
+    calendar: Optional[TradingCalendar] = None,
+    cube: Optional[CalendarCube] = None,
+    symbol: Optional[str] = None
 ) -> Dict[int, Any]:
+    """
+    Chỉ tính thống kê cho các năm được vẽ. cube (CalendarCube đã dựng sẵn) thì lấy bảng tháng / quý
+    bằng cách cộng các ô của cube (symbol: chỉ lấy symbol này) thay vì nhóm lại df.
+    """
 
     if years is None:
         years = sorted(df['Year'].dropna().unique().astype(int).tolist())
@@ -229,8 +235,13 @@ def plot_calendar_effects_by_year(
     if len(years) > max_years:
         years = years[:max_years]  # giới hạn
 
-    monthly_per_year = compute_monthly_stats_per_year(df, return_col=return_col)
-    quarterly_per_year = compute_quarterly_stats_per_year(df, return_col=return_col)
+    if cube is not None:
+        symbols = None if symbol is None else [symbol]
+        monthly_per_year = cube.per_year('month', years=years, symbols=symbols)
+        quarterly_per_year = cube.per_year('quarter', years=years, symbols=symbols)
+    else:
+        monthly_per_year = compute_monthly_stats_per_year(df, return_col=return_col, calendar=calendar, years=years)
+        quarterly_per_year = compute_quarterly_stats_per_year(df, return_col=return_col, calendar=calendar, years=years)
 
     figs = {}
     for y in years:
@@ -294,32 +305,51 @@ def analyze_calendar_effects(
     plot: bool = True,
     per_year: bool = False,
     years: List[int] = None,
-    max_years: int = 10
+    max_years: int = 10,
+    instrument: bool = False,
+    extra_keys: Sequence[str] = ()
 ) -> Dict[str, Any]:
-
-    df2 = add_calendar_columns(df, date_col=date_col)
-    df2 = compute_daily_return(df2, price_col=price_col, return_col=return_col, percent=True)
-
-    monthly_df = analyze_monthly(df2, return_col=return_col)
-    quarterly_df = analyze_quarterly(df2, return_col=return_col)
-
-    fig = None
-    year_figs = None
-    if plot:
-        try:
-            if per_year:
-                # vẽ từng năm riêng biệt
-                year_figs = plot_calendar_effects_by_year(df2, return_col=return_col, years=years, max_years=max_years)
-            else:
-                fig = plot_calendar_effects(df2, monthly_df, quarterly_df)
-                plt.show()
-        except Exception as e:
-            print(f"Không thể vẽ biểu đồ: {e}")
-
-    return {
+    # instrument=True (hoặc gọi trong instrumentation.profiling()): thêm result['timings'] theo từng stage
+    # extra_keys: các khóa lịch khác của calendar_stats (ví dụ 'dayofweek', 'turn_of_month') tính chung lượt
+    with pipeline('analyze_calendar_effects', instrument) as prof:
+        with prof.stage('add_calendar_columns'):
+            df2 = add_calendar_columns(df, date_col=date_col)
+        with prof.stage('compute_daily_return'):
+            df2 = compute_daily_return(df2, price_col=price_col, return_col=return_col, percent=True)
+
+        # Mọi khóa lịch trong một lượt; bảng tháng / quý được in từ output này
+        with prof.stage('calendar_stats'):
+            keys = ['month', 'quarter'] + [k for k in extra_keys if k not in ('month', 'quarter')]
+            stats = calendar_stats(df2, keys=keys, return_col=return_col, date_col=date_col)
+
+        with prof.stage('analyze_monthly'):
+            monthly_df = analyze_monthly(df2, return_col=return_col, stats=stats['month'])
+        with prof.stage('analyze_quarterly'):
+            quarterly_df = analyze_quarterly(df2, return_col=return_col, stats=stats['quarter'])
+
+        fig = None
+        year_figs = None
+        if plot:
+            with prof.stage('plot'):
+                try:
+                    if per_year:
+                        # chỉ mục lịch chỉ cần cho bảng từng năm (chỉ dựng khi cột ngày đã sắp xếp)
+                        with prof.stage('trading_calendar'):
+                            calendar = (TradingCalendar(df2[date_col])
+                                        if df2[date_col].is_monotonic_increasing else None)
+                        # vẽ từng năm riêng biệt
+                        year_figs = plot_calendar_effects_by_year(df2, return_col=return_col, years=years, max_years=max_years, calendar=calendar)
+                    else:
+                        fig = plot_calendar_effects(df2, monthly_df, quarterly_df)
+                        plt.show()
+                except Exception as e:
+                    print(f"Không thể vẽ biểu đồ: {e}")
+
+    return prof.attach({
         'df': df2,
         'monthly_df': monthly_df,
         'quarterly_df': quarterly_df,
+        'calendar_stats': stats,  # dict key -> bảng thống kê theo khóa lịch
         'fig': fig,
         'year_figs': year_figs  # dict year -> fig (hoặc None nếu không per_year)
-    }
+    })
@@ -0,0 +1,437 @@
+import copy
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from calendar_stats import MONTH_NAMES, STAT_COLUMNS, frame_returns
+
+# Trục của cube: symbol × year × month (1-12) × day-of-week (0 = thứ Hai ... 6 = Chủ nhật)
+N_MONTHS = 12
+N_DOWS = 7
+BY_COLUMNS = {'symbol': 'Symbol', 'year': 'Year', 'quarter': 'Quarter', 'month': 'Month', 'dow': 'DayOfWeek'}
+STAT_ARRAYS = ('count', 'total', 'total_sq', 'positive', 'negative')
+# trục của mảng cube tương ứng với từng khóa `by` (quarter gộp từ trục tháng)
+BY_AXIS = {'symbol': 0, 'year': 1, 'month': 2, 'quarter': 2, 'dow': 3}
+
+# Quantile sketch: histogram trên các cạnh bin cố định (dùng chung mọi cube nên cộng được với nhau).
+# Cạnh theo sinh(): mịn quanh 0 (~0.003% / bin), thưa dần ở đuôi, phủ ±SKETCH_RANGE (% return).
+SKETCH_BINS = 256
+SKETCH_RANGE = 50.0
+SKETCH_SCALE = 0.05
+# Số ô (nhóm × bin) tối đa để tính quantile bằng histogram dày thay vì sắp xếp
+DENSE_SKETCH_CELLS = 1 << 22
+
+
+def sketch_edges(bins: int = SKETCH_BINS, value_range: float = SKETCH_RANGE, scale: float = SKETCH_SCALE) -> np.ndarray:
+    """Cạnh bin của sketch (bins + 1 giá trị, đối xứng quanh 0); ngoài khoảng được dồn vào bin đầu / cuối."""
+    a = np.arcsinh(value_range / scale)
+    return np.sinh(np.linspace(-a, a, bins + 1)) * scale
+
+
+class CalendarCube:
+    """
+    Cube thống kê đủ (sufficient statistics) của return theo symbol × year × month × day-of-week:
+    count, sum, sum of squares, số ngày dương / âm, kèm histogram (sketch) để ước lượng median / quantile.
+
+    Mọi lát cắt (khoảng năm, tập năm, nhóm symbol, tháng, thứ) được tính bằng cách cộng các ô thay vì
+    quét lại dữ liệu; hai cube cộng được với nhau (merge) và lưu / nạp bằng một file .npz.
+    Mean / std khớp pandas tới sai số làm tròn; median là xấp xỉ (nội suy trong bin của sketch).
+
+    Dữ liệu thêm vào (add_frame / add_returns / merge) được gom lại và chỉ ghép vào mảng chính một lần
+    ở truy vấn kế tiếp, nên dựng cube cho nhiều symbol tốn thời gian tuyến tính.
+    """
+
+    def __init__(self, symbols: Sequence[str] = (), year0: int = 0, n_years: int = 0,
+                 edges: Optional[np.ndarray] = None):
+        self._symbols: List[str] = list(symbols)
+        self._year0 = int(year0)
+        self.edges = sketch_edges() if edges is None else np.asarray(edges, dtype=np.float64)
+        shape = (len(self._symbols), int(n_years), N_MONTHS, N_DOWS)
+        self._arrays = {
+            'count': np.zeros(shape, dtype=np.int64),
+            'total': np.zeros(shape, dtype=np.float64),
+            'total_sq': np.zeros(shape, dtype=np.float64),
+            'positive': np.zeros(shape, dtype=np.int64),
+            'negative': np.zeros(shape, dtype=np.int64),
+        }
+        # sketch dạng thưa: mỗi phần tử một (ô, bin) có số đếm > 0; ô = chỉ số phẳng trong (symbol, year, month, dow)
+        self._sk_cell = np.empty(0, dtype=np.int64)
+        self._sk_bin = np.empty(0, dtype=np.int16)
+        self._sk_count = np.empty(0, dtype=np.int64)
+        self._pending: List['CalendarCube'] = []
+
+    # ---- trạng thái (luôn đã ghép phần đang chờ) ----
+    def _get(self, name: str) -> np.ndarray:
+        self._flush()
+        return self._arrays[name]
+
+    count = property(lambda self: self._get('count'))
+    total = property(lambda self: self._get('total'))
+    total_sq = property(lambda self: self._get('total_sq'))
+    positive = property(lambda self: self._get('positive'))
+    negative = property(lambda self: self._get('negative'))
+
+    @property
+    def symbols(self) -> List[str]:
+        self._flush()
+        return list(self._symbols)
+
+    @property
+    def year0(self) -> int:
+        self._flush()
+        return self._year0
+
+    @property
+    def n_years(self) -> int:
+        self._flush()
+        return self._arrays['count'].shape[1]
+
+    @property
+    def years(self) -> np.ndarray:
+        return np.arange(self.year0, self.year0 + self.n_years)
+
+    @property
+    def n_bins(self) -> int:
+        return len(self.edges) - 1
+
+    def __len__(self) -> int:
+        return int(self.count.sum())
+
+    def __repr__(self) -> str:
+        n_years = self.n_years
+        yr = f"{self._year0}-{self._year0 + n_years - 1}" if n_years else "-"
+        return f"CalendarCube(symbols={len(self._symbols)}, years={yr}, observations={len(self)})"
+
+    # ---- ghép ----
+    def _flush(self) -> None:
+        """Ghép mọi cube đang chờ vào mảng chính: cấp phát một lần cho hợp các symbol / năm."""
+        if not self._pending:
+            return
+        parts = [self] + self._pending
+        self._pending = []
+        symbols = list(dict.fromkeys(s for p in parts for s in p._symbols))
+        spans = [(p._year0, p._year0 + p._arrays['count'].shape[1]) for p in parts if p._arrays['count'].shape[1]]
+        year0 = min(a for a, _ in spans) if spans else 0
+        n_years = max(b for _, b in spans) - year0 if spans else 0
+        shape = (len(symbols), n_years, N_MONTHS, N_DOWS)
+        sym_index = {s: i for i, s in enumerate(symbols)}
+
+        arrays = {name: np.zeros(shape, dtype=arr.dtype) for name, arr in self._arrays.items()}
+        cells, bins, counts = [], [], []
+        for p in parts:
+            p_shape = p._arrays['count'].shape
+            if p_shape[0] == 0 or p_shape[1] == 0:
+                continue
+            pos = np.array([sym_index[s] for s in p._symbols], dtype=np.int64)
+            y_off = p._year0 - year0
+            for name in STAT_ARRAYS:
+                if len(pos) == 1:
+                    arrays[name][pos[0], y_off:y_off + p_shape[1]] += p._arrays[name][0]
+                else:
+                    arrays[name][pos, y_off:y_off + p_shape[1]] += p._arrays[name]
+            if len(p._sk_cell):
+                s, y, m, d = np.unravel_index(p._sk_cell, p_shape)
+                cells.append(np.ravel_multi_index((pos[s], y + y_off, m, d), shape))
+                bins.append(p._sk_bin)
+                counts.append(p._sk_count)
+
+        self._symbols, self._year0, self._arrays = symbols, year0, arrays
+        if cells:
+            key = np.concatenate(cells) * self.n_bins + np.concatenate(bins)
+            uniq, inv = np.unique(key, return_inverse=True)
+            self._sk_cell = uniq // self.n_bins
+            self._sk_bin = (uniq % self.n_bins).astype(np.int16)
+            self._sk_count = np.bincount(inv, weights=np.concatenate(counts)).astype(np.int64)
+        else:
+            self._sk_cell = np.empty(0, dtype=np.int64)
+            self._sk_bin = np.empty(0, dtype=np.int16)
+            self._sk_count = np.empty(0, dtype=np.int64)
+
+    # ---- nạp dữ liệu ----
+    def add_returns(self, symbol: str, dates, returns) -> 'CalendarCube':
+        """Cộng thêm các return (đơn vị %, NaN bị bỏ) của một symbol vào cube."""
+        dt = pd.DatetimeIndex(dates)
+        r = np.asarray(returns, dtype=np.float64)
+        if len(dt) != len(r):
+            raise ValueError("dates và returns phải cùng độ dài")
+        valid = ~np.isnan(r)
+        dt, r = dt[valid], r[valid]
+        if len(r) == 0:
+            return self
+
+        years = dt.year.to_numpy().astype(np.int64)
+        year0 = int(years.min())
+        part = CalendarCube([symbol], year0, int(years.max()) - year0 + 1, edges=self.edges)
+        shape = part._arrays['count'].shape
+        cell = np.ravel_multi_index(
+            (np.zeros(len(r), dtype=np.int64), years - year0, dt.month.to_numpy() - 1, dt.dayofweek.to_numpy()),
+            shape)
+        size = part._arrays['count'].size
+        part._arrays['count'] += np.bincount(cell, minlength=size).reshape(shape)
+        part._arrays['total'] += np.bincount(cell, weights=r, minlength=size).reshape(shape)
+        part._arrays['total_sq'] += np.bincount(cell, weights=r * r, minlength=size).reshape(shape)
+        part._arrays['positive'] += np.bincount(cell, weights=r > 0, minlength=size).astype(np.int64).reshape(shape)
+        part._arrays['negative'] += np.bincount(cell, weights=r < 0, minlength=size).astype(np.int64).reshape(shape)
+
+        bins = np.clip(np.searchsorted(self.edges, r, side='right') - 1, 0, self.n_bins - 1)
+        uniq, cnt = np.unique(cell * self.n_bins + bins, return_counts=True)
+        part._sk_cell = uniq // self.n_bins
+        part._sk_bin = (uniq % self.n_bins).astype(np.int16)
+        part._sk_count = cnt.astype(np.int64)
+        self._pending.append(part)
+        return self
+
+    def add_frame(self, symbol: str, df: pd.DataFrame, date_col: str = 'Date', price_col: str = 'Close',
+                  return_col: str = 'Daily_Return') -> 'CalendarCube':
+        """Như add_returns, lấy return từ df (tính pct_change * 100 như compute_daily_return nếu chưa có cột)."""
+        dates, returns = frame_returns(df, date_col, price_col, return_col)
+        return self.add_returns(symbol, dates, returns)
+
+    @classmethod
+    def from_frames(cls, frames: Union[Dict[str, pd.DataFrame], Iterable[Tuple[str, pd.DataFrame]]],
+                    **kwargs) -> 'CalendarCube':
+        """Dựng cube từ {symbol: df} hoặc iterable (symbol, df) (ví dụ iter_universe)."""
+        cube = cls()
+        items = frames.items() if isinstance(frames, dict) else frames
+        for symbol, df in items:
+            cube.add_frame(symbol, df, **kwargs)
+        return cube
+
+    def merge(self, other: 'CalendarCube') -> 'CalendarCube':
+        """Cộng một cube khác vào cube này (symbol trùng thì cộng dồn). Hai cube phải cùng cạnh sketch."""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Hai cube có cạnh bin sketch khác nhau, không merge được")
+        other._flush()
+        # ảnh chụp của other: mảng không bao giờ bị sửa tại chỗ (_flush cấp phát mảng mới) nên chỉ cần copy nông
+        snapshot = copy.copy(other)
+        snapshot._pending = []
+        self._pending.append(snapshot)
+        return self
+
+    # ---- truy vấn ----
+    def _masks(self, symbols, years, months, dows) -> Tuple[np.ndarray, ...]:
+        def pick(values, n, offset):
+            if values is None:
+                return np.ones(n, dtype=bool)
+            idx = np.asarray(list(values), dtype=np.int64) - offset
+            mask = np.zeros(n, dtype=bool)
+            mask[idx[(idx >= 0) & (idx < n)]] = True
+            return mask
+
+        if symbols is None:
+            sym_mask = np.ones(len(self._symbols), dtype=bool)
+        else:
+            wanted = set(symbols)
+            missing = wanted - set(self._symbols)
+            if missing:
+                raise KeyError(f"Cube không có symbol: {sorted(missing)}")
+            sym_mask = np.array([s in wanted for s in self._symbols], dtype=bool)
+        return sym_mask, pick(years, self.n_years, self._year0), pick(months, N_MONTHS, 1), pick(dows, N_DOWS, 0)
+
+    def _slice(self, by: Sequence[str], symbols, years, months, dows) -> Tuple[Tuple[np.ndarray, ...], Tuple[int, ...]]:
+        """Kiểm tra `by`, trả về (mask từng trục của lát cắt, kích thước từng trục của `by`)."""
+        for b in by:
+            if b not in BY_COLUMNS:
+                raise ValueError(f"Không hỗ trợ by='{b}' (chỉ {list(BY_COLUMNS)})")
+        if 'quarter' in by and 'month' in by:
+            raise ValueError("Không nhóm đồng thời theo 'quarter' và 'month'")
+        self._flush()
+        shape = self._arrays['count'].shape
+        sizes = {'symbol': shape[0], 'year': shape[1], 'month': N_MONTHS, 'quarter': 4, 'dow': N_DOWS}
+        return self._masks(symbols, years, months, dows), tuple(sizes[b] for b in by)
+
+    def _reduce(self, name: str, masks: Tuple[np.ndarray, ...], by: Sequence[str], dims: Tuple[int, ...]) -> np.ndarray:
+        """
+        Cộng mảng `name` trên lát cắt theo các trục không thuộc `by` (sum theo trục, không quét từng ô);
+        kết quả phẳng theo thứ tự np.ravel_multi_index(..., dims).
+        """
+        arr = self._arrays[name]
+        idx = [np.flatnonzero(m) for m in masks]
+        sel = arr if all(m.all() for m in masks) else arr[np.ix_(*idx)]
+        keep_axes = sorted({BY_AXIS[b] for b in by})
+        red = sel.sum(axis=tuple(a for a in range(4) if a not in keep_axes))
+        full_shape = [arr.shape[a] for a in keep_axes]
+        full = np.zeros(full_shape, dtype=red.dtype)
+        full[np.ix_(*[idx[a] for a in keep_axes])] = red
+        if 'quarter' in by:
+            p = keep_axes.index(2)
+            full = full.reshape(full_shape[:p] + [4, 3] + full_shape[p + 1:]).sum(axis=p + 1)
+        full = np.transpose(full, [keep_axes.index(BY_AXIS[b]) for b in by])
+        return full.reshape(-1)
+
+    def _sketch_groups(self, masks: Tuple[np.ndarray, ...], by: Sequence[str], dims: Tuple[int, ...]) -> np.ndarray:
+        """
+        Nhóm của từng phần tử sketch (-1 = ngoài lát cắt): tính nhóm cho mỗi ô của cube bằng broadcast
+        theo trục rồi tra một lần theo ô, thay vì giải mã tọa độ của từng phần tử.
+        """
+        shape = self._arrays['count'].shape
+        labels = {'symbol': np.arange(shape[0]), 'year': np.arange(shape[1]),
+                  'month': np.arange(N_MONTHS), 'quarter': np.arange(N_MONTHS) // 3, 'dow': np.arange(N_DOWS)}
+        cell_group = np.zeros((1, 1, 1, 1), dtype=np.int64)
+        stride = 1
+        for b, size in zip(reversed(by), reversed(dims)):
+            ax = BY_AXIS[b]
+            cell_group = cell_group + (labels[b] * stride).reshape([-1 if i == ax else 1 for i in range(4)])
+            stride *= size
+        selected = masks[0][:, None, None, None] & masks[1][None, :, None, None] \
+            & masks[2][None, None, :, None] & masks[3][None, None, None, :]
+        cell_group = np.where(selected, np.broadcast_to(cell_group, shape), -1).reshape(-1)
+        return cell_group[self._sk_cell]
+
+    def _key_columns(self, by: Sequence[str], dims: Tuple[int, ...], groups: np.ndarray) -> Dict[str, object]:
+        out = {}
+        idx = np.unravel_index(groups, dims) if by else ()
+        for b, i in zip(by, idx):
+            if b == 'symbol':
+                out[BY_COLUMNS[b]] = [self._symbols[k] for k in i.tolist()]
+            else:
+                offset = {'year': self._year0, 'month': 1, 'quarter': 1, 'dow': 0}[b]
+                out[BY_COLUMNS[b]] = (i + offset).astype(np.int64)
+        return out
+
+    def stats(self,
+              by: Sequence[str] = ('month',),
+              symbols: Optional[Iterable[str]] = None,
+              years: Optional[Iterable[int]] = None,
+              months: Optional[Iterable[int]] = None,
+              dows: Optional[Iterable[int]] = None,
+              median: bool = True) -> pd.DataFrame:
+        """
+        Bảng thống kê theo `by` (tập con của 'symbol', 'year', 'quarter', 'month', 'dow') trên lát cắt
+        symbols × years × months × dows (None = tất cả). Cùng cột với calendar_stats:
+        Avg_Return, Median_Return (từ sketch), Std_Dev, Positive_Days, Negative_Days, Total_Days.
+        Chỉ giữ các nhóm có dữ liệu, sắp theo khóa tăng dần.
+        """
+        by = list(by)
+        masks, dims = self._slice(by, symbols, years, months, dows)
+        n = self._reduce('count', masks, by, dims)
+        keep = np.flatnonzero(n > 0)
+        n = n[keep]
+        s = self._reduce('total', masks, by, dims)[keep]
+        sq = self._reduce('total_sq', masks, by, dims)[keep]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.maximum(sq - s * s / n, 0.0) / (n - 1)
+        out = self._key_columns(by, dims, keep)
+        out['Avg_Return'] = s / n
+        out['Median_Return'] = self._group_quantile(0.5, masks, by, dims, keep) if median else np.full(len(keep), np.nan)
+        out['Std_Dev'] = np.where(n > 1, np.sqrt(var), np.nan)
+        out['Positive_Days'] = self._reduce('positive', masks, by, dims)[keep].astype(np.int64)
+        out['Negative_Days'] = self._reduce('negative', masks, by, dims)[keep].astype(np.int64)
+        out['Total_Days'] = n.astype(np.int64)
+        return pd.DataFrame(out, columns=[BY_COLUMNS[b] for b in by] + STAT_COLUMNS)
+
+    def _group_quantile(self, q: float, masks: Tuple[np.ndarray, ...], by: Sequence[str],
+                        dims: Tuple[int, ...], groups: np.ndarray) -> np.ndarray:
+        """
+        Quantile q của các nhóm `groups` từ sketch: bin đầu tiên mà số đếm tích lũy đạt q * n,
+        nội suy tuyến tính trong bin đó.
+        """
+        out = np.full(len(groups), np.nan)
+        group = self._sketch_groups(masks, by, dims)
+        if len(groups) == 0 or len(group) == 0:
+            return out
+        # chỉ số gọn 0..len(groups)-1 cho các nhóm được hỏi
+        n_dense = int(np.prod(dims)) if by else 1
+        slot = np.full(n_dense + 1, -1, dtype=np.int64)
+        slot[groups] = np.arange(len(groups))
+        g = slot[group]  # group = -1 -> slot[-1] = -1
+        ok = g >= 0
+        g, b, c = g[ok], self._sk_bin[ok].astype(np.int64), self._sk_count[ok]
+
+        n_groups = len(groups)
+        if n_groups * self.n_bins <= DENSE_SKETCH_CELLS:
+            # ít nhóm: histogram dày (nhóm × bin) bằng bincount, không cần sắp xếp
+            hist = np.bincount(g * self.n_bins + b, weights=c, minlength=n_groups * self.n_bins)
+            hist = hist.reshape(n_groups, self.n_bins)
+            within = np.cumsum(hist, axis=1)
+            target = q * within[:, -1]
+            reached = (within >= target[:, None]) & (hist > 0)
+            has = reached.any(axis=1)
+            rows = np.flatnonzero(has)
+            bins = reached[rows].argmax(axis=1)
+            count = hist[rows, bins]
+            below = within[rows, bins] - count
+        else:
+            # nhiều nhóm: gộp các phần tử sketch cùng (nhóm, bin) (đã sắp) rồi tích lũy trong từng nhóm
+            key, inv = np.unique(g * self.n_bins + b, return_inverse=True)
+            c = np.bincount(inv.reshape(-1), weights=c)
+            g, b = key // self.n_bins, key % self.n_bins
+            totals = np.bincount(g, weights=c, minlength=n_groups)
+            start = np.concatenate(([0], np.cumsum(totals)[:-1]))
+            within = np.cumsum(c) - start[g]
+            target = q * totals
+            hit = np.flatnonzero(within >= target[g])
+            rows, first_pos = np.unique(g[hit], return_index=True)
+            i = hit[first_pos]
+            has = np.zeros(n_groups, dtype=bool)
+            has[rows] = True
+            bins, count, below = b[i], c[i], within[i] - c[i]
+
+        frac = np.clip((target[rows] - below) / count, 0.0, 1.0)
+        lo, hi = self.edges[bins], self.edges[bins + 1]
+        out[rows] = lo + frac * (hi - lo)
+        return out
+
+    def quantile(self, q: float, by: Sequence[str] = ('month',),
+                 symbols: Optional[Iterable[str]] = None,
+                 years: Optional[Iterable[int]] = None,
+                 months: Optional[Iterable[int]] = None,
+                 dows: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """Quantile q (0-1) theo nhóm, ước lượng từ sketch; cột khóa + cột 'Quantile'."""
+        if not 0 <= q <= 1:
+            raise ValueError("q phải nằm trong [0, 1]")
+        by = list(by)
+        masks, dims = self._slice(by, symbols, years, months, dows)
+        keep = np.flatnonzero(self._reduce('count', masks, by, dims) > 0)
+        out = self._key_columns(by, dims, keep)
+        out['Quantile'] = self._group_quantile(q, masks, by, dims, keep)
+        return pd.DataFrame(out)
+
+    # ---- bảng cùng định dạng calendar_analysis ----
+    def monthly_table(self, **slice_kwargs) -> pd.DataFrame:
+        """Bảng theo tháng (Month, Month_Name, ...) như analyze_monthly, trước khi sắp theo Avg_Return."""
+        table = self.stats(by=('month',), **slice_kwargs)
+        table.insert(1, 'Month_Name', [MONTH_NAMES[m - 1] for m in table['Month'].tolist()])
+        return table
+
+    def quarterly_table(self, **slice_kwargs) -> pd.DataFrame:
+        """Bảng theo quý (Quarter = 'Q1'..'Q4', ...) như analyze_quarterly."""
+        table = self.stats(by=('quarter',), **slice_kwargs)
+        table['Quarter'] = [f'Q{q}' for q in table['Quarter'].tolist()]
+        return table
+
+    def per_year(self, period: str = 'month', years: Optional[Iterable[int]] = None,
+                 **slice_kwargs) -> Dict[int, pd.DataFrame]:
+        """{year: bảng theo tháng / quý} như compute_monthly_stats_per_year / compute_quarterly_stats_per_year."""
+        if period not in ('month', 'quarter'):
+            raise ValueError("period chỉ là 'month' hoặc 'quarter'")
+        table = self.stats(by=('year', period), years=years, **slice_kwargs)
+        out = {}
+        for y, sub in table.groupby('Year', sort=True):
+            sub = sub.drop(columns='Year').reset_index(drop=True)
+            if period == 'month':
+                sub.insert(1, 'Month_Name', [MONTH_NAMES[m - 1] for m in sub['Month'].tolist()])
+            else:
+                sub['Quarter'] = [f'Q{q}' for q in sub['Quarter'].tolist()]
+            out[int(y)] = sub
+        return out
+
+    # ---- lưu / nạp ----
+    def save(self, path: str) -> None:
+        """Lưu cube ra một file .npz (nén)."""
+        self._flush()
+        meta = {'symbols': self._symbols, 'year0': self._year0, 'version': 1}
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), edges=self.edges,
+                            sk_cell=self._sk_cell, sk_bin=self._sk_bin, sk_count=self._sk_count,
+                            **self._arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'CalendarCube':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            cube = cls(meta['symbols'], meta['year0'], data['count'].shape[1], edges=data['edges'])
+            cube._arrays = {name: data[name] for name in STAT_ARRAYS}
+            cube._sk_cell, cube._sk_bin, cube._sk_count = data['sk_cell'], data['sk_bin'], data['sk_count']
+        return cube
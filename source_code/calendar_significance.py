@@ -0,0 +1,259 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from calendar_stats import MONTH_NAMES, frame_returns, group_stats
+from instrumentation import pipeline
+from trading_strategy_season import PERIODS
+
+N_MONTHS = 12
+# Giới hạn bộ nhớ cho ma trận resample (số resample × số ngày) của mỗi chunk
+MAX_CHUNK_BYTES = 64 << 20
+# Độ dài block mặc định của block bootstrap (~1 tháng giao dịch)
+BLOCK_SIZE = 21
+
+# Trạng thái của mỗi worker (context dựng một lần trong initializer)
+_WORKER: Dict[str, Any] = {}
+
+
+def months_in_periods(periods: Iterable[Tuple[int, int]] = PERIODS) -> List[int]:
+    """Các tháng thuộc các giai đoạn (tháng bắt đầu, tháng kết thúc) của chiến lược theo mùa."""
+    months = set()
+    for start_m, end_m in periods:
+        months.update(range(int(start_m), int(end_m) + 1))
+    return sorted(months)
+
+
+class _ResampleContext:
+    """Return (đã bỏ NaN) + mã tháng 0-11, dùng lại cho mọi chunk resample."""
+
+    def __init__(self, returns: np.ndarray, months: np.ndarray, block_size: int):
+        self.returns = returns
+        self.months = months
+        self.block_size = block_size
+        # one-hot (ngày × tháng): tổng theo tháng của một lô hoán vị = một phép nhân ma trận
+        self.onehot = np.zeros((len(returns), N_MONTHS))
+        self.onehot[np.arange(len(returns)), months] = 1.0
+
+    def run(self, kind: str, n_rows: int, seed: np.random.SeedSequence) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Một chunk n_rows resample -> (tổng return theo tháng (n_rows × 12), số ngày theo tháng hoặc None
+        nếu không đổi như với hoán vị nhãn).
+        """
+        rng = np.random.default_rng(seed)
+        r = self.returns
+        n = len(r)
+        if kind == 'permutation':
+            # hoán vị return trên từng dòng = hoán vị nhãn tháng (số ngày mỗi tháng giữ nguyên)
+            shuffled = rng.permuted(np.broadcast_to(r, (n_rows, n)), axis=1)
+            return shuffled @ self.onehot, None
+
+        # circular block bootstrap: nối các block độ dài block_size bắt đầu ngẫu nhiên, vòng qua cuối chuỗi
+        L = self.block_size
+        starts = rng.integers(0, n, size=(n_rows, math.ceil(n / L)))
+        idx = (starts[:, :, None] + np.arange(L)).reshape(n_rows, -1)[:, :n] % n
+        key = (np.arange(n_rows)[:, None] * N_MONTHS + self.months[idx]).ravel()
+        size = n_rows * N_MONTHS
+        sums = np.bincount(key, weights=r[idx].ravel(), minlength=size).reshape(n_rows, N_MONTHS)
+        counts = np.bincount(key, minlength=size).reshape(n_rows, N_MONTHS)
+        return sums, counts
+
+
+def _init_worker(returns: np.ndarray, months: np.ndarray, block_size: int) -> None:
+    """Initializer của process pool: dựng context một lần cho mỗi worker (mảng nhỏ, gửi qua pickle)."""
+    _WORKER["ctx"] = _ResampleContext(returns, months, block_size)
+
+
+def _run_task(task: Tuple[str, int, np.random.SeedSequence]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    return _WORKER["ctx"].run(*task)
+
+
+def _resample(ctx: _ResampleContext, kind: str, n_resamples: int, seed: np.random.SeedSequence,
+              chunk_size: int, n_jobs: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Chạy n_resamples resample theo chunk. Mỗi chunk có seed con riêng (SeedSequence.spawn) nên
+    kết quả chỉ phụ thuộc seed và chunk_size, không phụ thuộc n_jobs.
+    """
+    sizes = [min(chunk_size, n_resamples - lo) for lo in range(0, n_resamples, chunk_size)]
+    tasks = [(kind, size, child) for size, child in zip(sizes, seed.spawn(len(sizes)))]
+    if n_jobs == 1 or len(tasks) == 1:
+        parts = [ctx.run(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks)),
+                                 initializer=_init_worker,
+                                 initargs=(ctx.returns, ctx.months, ctx.block_size)) as pool:
+            parts = list(pool.map(_run_task, tasks))
+    sums = np.concatenate([p[0] for p in parts])
+    counts = None if parts[0][1] is None else np.concatenate([p[1] for p in parts])
+    return sums, counts
+
+
+def _holm(p: np.ndarray) -> np.ndarray:
+    """Hiệu chỉnh Holm–Bonferroni cho một họ kiểm định (NaN giữ nguyên)."""
+    out = np.full(len(p), np.nan)
+    ok = np.flatnonzero(~np.isnan(p))
+    if len(ok) == 0:
+        return out
+    order = ok[np.argsort(p[ok], kind='stable')]
+    m = len(order)
+    adjusted = np.minimum(np.maximum.accumulate(p[order] * (m - np.arange(m))), 1.0)
+    out[order] = adjusted
+    return out
+
+
+def significance_from_returns(returns: np.ndarray,
+                              months: np.ndarray,
+                              n_permutations: int = 10000,
+                              n_bootstrap: int = 10000,
+                              block_size: int = BLOCK_SIZE,
+                              confidence: float = 0.95,
+                              month_sets: Optional[Dict[str, Sequence[int]]] = None,
+                              seed: Optional[int] = None,
+                              chunk_size: Optional[int] = None,
+                              n_jobs: Optional[int] = 1,
+                              instrument: bool = False) -> Dict[str, pd.DataFrame]:
+    """
+    Kiểm định hiệu ứng lịch trên mảng return (%) và tháng (1-12) cùng độ dài (NaN bị bỏ).
+
+    - Hoán vị nhãn (n_permutations lần): phân phối của mean mỗi nhóm khi tháng không liên quan đến return.
+      P_Value hai phía theo |mean - mean toàn chuỗi|, P_Greater / P_Less một phía (+1 ở tử và mẫu),
+      P_Holm = P_Value hiệu chỉnh Holm trong cùng bảng (12 tháng / 4 quý / các tập tháng).
+    - Block bootstrap (n_bootstrap lần, block block_size ngày, vòng qua cuối chuỗi): khoảng tin cậy
+      percentile CI_Lower / CI_Upper và Boot_Std cho mean mỗi nhóm, giữ được tự tương quan ngắn hạn.
+
+    Mỗi resample chỉ được rút về 12 tổng theo tháng; quý và các tập tháng (month_sets, ví dụ các tháng
+    của chiến lược theo mùa) được cộng từ đó. Resample chạy theo chunk (resample × ngày) không vượt
+    MAX_CHUNK_BYTES nếu chunk_size=None; n_jobs > 1 (None = os.cpu_count()) chia chunk cho process pool.
+    Trả về {'monthly', 'quarterly', 'sets'}.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("confidence phải nằm trong (0, 1)")
+    if n_permutations < 0 or n_bootstrap < 0:
+        raise ValueError("n_permutations và n_bootstrap phải >= 0")
+    if block_size < 1:
+        raise ValueError("block_size phải >= 1")
+    returns = np.asarray(returns, dtype=np.float64)
+    months = np.asarray(months, dtype=np.int64)
+    if len(returns) != len(months):
+        raise ValueError("returns và months phải cùng độ dài")
+    valid = ~np.isnan(returns)
+    returns, months = returns[valid], months[valid]
+    if len(returns) == 0:
+        raise ValueError("Không có return hợp lệ để kiểm định")
+    if months.min() < 1 or months.max() > N_MONTHS:
+        raise ValueError("months chỉ được chứa giá trị 1-12")
+    if month_sets is None:
+        month_sets = {'Season': months_in_periods(PERIODS)}
+
+    n = len(returns)
+    if chunk_size is None:
+        chunk_size = max(1, MAX_CHUNK_BYTES // (n * 8 * 3))
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, int(n_jobs))
+
+    with pipeline('calendar_significance', instrument) as prof:
+        with prof.stage('observed'):
+            # mean quan sát giống analyze_monthly / analyze_quarterly (cộng theo thứ tự thời gian)
+            quarters = (months - 1) // 3 + 1
+            by_month = group_stats(returns, {'Month': months})
+            by_quarter = group_stats(returns, {'Quarter': quarters})
+            obs_month = np.full(N_MONTHS, np.nan)
+            obs_month[by_month['Month'].to_numpy() - 1] = by_month['Avg_Return'].to_numpy()
+            obs_quarter = np.full(4, np.nan)
+            obs_quarter[by_quarter['Quarter'].to_numpy() - 1] = by_quarter['Avg_Return'].to_numpy()
+            set_names = list(month_sets)
+            set_months = [sorted(int(m) for m in month_sets[k]) for k in set_names]
+            obs_sets = np.array([returns[np.isin(months, ms)].mean() if np.isin(months, ms).any() else np.nan
+                                 for ms in set_months])
+            observed = np.concatenate([obs_month, obs_quarter, obs_sets])
+
+            # ma trận gộp tháng -> nhóm (12 tháng, 4 quý, các tập tháng)
+            agg = np.zeros((N_MONTHS, N_MONTHS + 4 + len(set_names)))
+            agg[np.arange(N_MONTHS), np.arange(N_MONTHS)] = 1.0
+            agg[np.arange(N_MONTHS), N_MONTHS + np.arange(N_MONTHS) // 3] = 1.0
+            for j, ms in enumerate(set_months):
+                agg[np.asarray(ms, dtype=np.int64) - 1, N_MONTHS + 4 + j] = 1.0
+            month_counts = np.bincount(months - 1, minlength=N_MONTHS).astype(np.float64)
+            group_counts = month_counts @ agg
+
+        ctx = _ResampleContext(returns, months - 1, int(block_size))
+        root = np.random.SeedSequence(seed)
+        perm_seed, boot_seed = root.spawn(2)
+        n_groups = agg.shape[1]
+
+        with prof.stage('permutation'):
+            p_two, p_greater, p_less = (np.full(n_groups, np.nan) for _ in range(3))
+            if n_permutations > 0:
+                sums, _ = _resample(ctx, 'permutation', n_permutations, perm_seed, chunk_size, n_jobs)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    null = (sums @ agg) / group_counts
+                overall = returns.mean()
+                # dung sai tương đối để mean bằng nhau do làm tròn vẫn được tính là "ít nhất cực đoan bằng"
+                tol = 1e-12 * max(1.0, float(np.nanmax(np.abs(observed))))
+                denom = n_permutations + 1
+                p_two = (1 + (np.abs(null - overall) >= np.abs(observed - overall) - tol).sum(axis=0)) / denom
+                p_greater = (1 + (null >= observed - tol).sum(axis=0)) / denom
+                p_less = (1 + (null <= observed + tol).sum(axis=0)) / denom
+                empty = group_counts == 0
+                for p in (p_two, p_greater, p_less):
+                    p[empty] = np.nan
+
+        with prof.stage('bootstrap'):
+            ci_lower, ci_upper, boot_std = (np.full(n_groups, np.nan) for _ in range(3))
+            if n_bootstrap > 0:
+                sums, counts = _resample(ctx, 'bootstrap', n_bootstrap, boot_seed, chunk_size, n_jobs)
+                # chỉ các nhóm có dữ liệu; một resample có thể thiếu nhóm hiếm (NaN, bị bỏ qua)
+                ok = group_counts > 0
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    boot = (sums @ agg[:, ok]) / (counts @ agg[:, ok])
+                alpha = 1 - confidence
+                ci_lower[ok], ci_upper[ok] = np.nanpercentile(boot, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+                if n_bootstrap > 1:
+                    boot_std[ok] = np.nanstd(boot, axis=0, ddof=1)
+
+        with prof.stage('tables'):
+            def table(sl: slice, keys: Dict[str, Any]) -> pd.DataFrame:
+                out = dict(keys)
+                out.update({
+                    'Avg_Return': observed[sl],
+                    'Total_Days': group_counts[sl].astype(np.int64),
+                    'P_Value': p_two[sl],
+                    'P_Holm': _holm(p_two[sl]),
+                    'P_Greater': p_greater[sl],
+                    'P_Less': p_less[sl],
+                    'CI_Lower': ci_lower[sl],
+                    'CI_Upper': ci_upper[sl],
+                    'Boot_Std': boot_std[sl],
+                })
+                return pd.DataFrame(out)
+
+            monthly = table(slice(0, N_MONTHS),
+                            {'Month': np.arange(1, N_MONTHS + 1), 'Month_Name': MONTH_NAMES})
+            quarterly = table(slice(N_MONTHS, N_MONTHS + 4), {'Quarter': ['Q1', 'Q2', 'Q3', 'Q4']})
+            sets = table(slice(N_MONTHS + 4, n_groups),
+                         {'Set': set_names, 'Months': [tuple(ms) for ms in set_months]})
+            # bỏ các tháng / quý không có dữ liệu
+            monthly = monthly[monthly['Total_Days'] > 0].reset_index(drop=True)
+            quarterly = quarterly[quarterly['Total_Days'] > 0].reset_index(drop=True)
+
+    return prof.attach({'monthly': monthly, 'quarterly': quarterly, 'sets': sets})
+
+
+def calendar_significance(df: pd.DataFrame,
+                          date_col: str = 'Date',
+                          price_col: str = 'Close',
+                          return_col: str = 'Daily_Return',
+                          **kwargs) -> Dict[str, pd.DataFrame]:
+    """
+    Như significance_from_returns, lấy ngày / return từ df (cột ngày hoặc DatetimeIndex; return tính
+    pct_change * 100 như compute_daily_return nếu chưa có cột). Ví dụ:
+        sig = calendar_significance(df, n_permutations=10000, seed=0)
+        sig['monthly'][['Month_Name', 'Avg_Return', 'P_Value', 'CI_Lower', 'CI_Upper']]
+    """
+    dates, returns = frame_returns(df, date_col, price_col, return_col)
+    return significance_from_returns(returns, dates.month.to_numpy(), **kwargs)
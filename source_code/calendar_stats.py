@@ -0,0 +1,222 @@
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_loader import parse_dates
+from trading_calendar import _run_bounds
+
+# Các cột thống kê cho mỗi nhóm (cùng tên với bảng của analyze_monthly / analyze_quarterly)
+STAT_COLUMNS = ['Avg_Return', 'Median_Return', 'Std_Dev', 'Positive_Days', 'Negative_Days', 'Total_Days']
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December']
+
+# Số ngày giao dịch đầu tháng (cộng ngày cuối tháng trước) được tính là turn-of-month
+TURN_OF_MONTH_DAYS = 3
+
+
+# ---------------------------------------------------------
+# 1. Các trường lịch (tính một lần, dạng mảng số nguyên)
+# ---------------------------------------------------------
+def _trading_day_of_month(years: np.ndarray, months: np.ndarray, order: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(thứ tự ngày giao dịch trong tháng tính từ 1, số ngày giao dịch còn lại đến cuối tháng tính từ -1)."""
+    keys = (years * 12 + months)[order]
+    starts, stops = _run_bounds(keys)
+    sizes = stops - starts
+    pos = np.arange(len(keys)) - np.repeat(starts, sizes)
+    from_start = np.empty(len(keys), dtype=np.int64)
+    to_end = np.empty(len(keys), dtype=np.int64)
+    from_start[order] = pos + 1
+    to_end[order] = pos - np.repeat(sizes, sizes)
+    return from_start, to_end
+
+
+def calendar_fields(dates) -> pd.DataFrame:
+    """
+    Bảng các trường lịch cho từng ngày (cùng thứ tự với `dates`):
+    Year, Month, Quarter, DayOfWeek, WeekOfMonth (ngày 1-7 = 1, ...), TradingDayOfMonth (1, 2, ...),
+    TradingDaysToMonthEnd (-1 = ngày giao dịch cuối tháng), TurnOfMonth (1 nếu là ngày cuối tháng
+    hoặc một trong TURN_OF_MONTH_DAYS ngày giao dịch đầu tháng).
+    Thứ tự ngày giao dịch tính trên chính các ngày có trong `dates`.
+    """
+    dt = pd.DatetimeIndex(dates)
+    years = dt.year.to_numpy().astype(np.int64)
+    months = dt.month.to_numpy().astype(np.int64)
+    days = dt.day.to_numpy().astype(np.int64)
+    order = np.arange(len(dt)) if dt.is_monotonic_increasing else np.argsort(dt.asi8, kind='stable')
+    from_start, to_end = _trading_day_of_month(years, months, order)
+    return pd.DataFrame({
+        'Year': years,
+        'Month': months,
+        'Quarter': (months - 1) // 3 + 1,
+        'DayOfWeek': dt.dayofweek.to_numpy().astype(np.int64),
+        'WeekOfMonth': (days - 1) // 7 + 1,
+        'TradingDayOfMonth': from_start,
+        'TradingDaysToMonthEnd': to_end,
+        'TurnOfMonth': ((to_end == -1) | (from_start <= TURN_OF_MONTH_DAYS)).astype(np.int64),
+    })
+
+
+def frame_returns(df: pd.DataFrame,
+                  date_col: str = 'Date',
+                  price_col: str = 'Close',
+                  return_col: str = 'Daily_Return') -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    (ngày, return %) của df cho các hàm nhận mảng: return lấy từ return_col, nếu chưa có thì tính
+    pct_change * 100 như compute_daily_return; ngày lấy từ date_col (hoặc index) qua parse_dates, nên
+    chấp nhận offset múi giờ lẫn lộn (-04:00 / -05:00 như Data/KO.csv). Bỏ các dòng không parse được ngày.
+    """
+    if return_col in df.columns:
+        returns = df[return_col]
+    else:
+        if price_col not in df.columns:
+            raise KeyError(f"Không tìm thấy cột giá: {price_col}")
+        returns = df[price_col].pct_change() * 100
+    dates = parse_dates(df[date_col] if date_col in df.columns else df.index.to_series()).to_numpy()
+    valid = ~np.isnat(dates)
+    return pd.DatetimeIndex(dates[valid]), returns.to_numpy(dtype=np.float64)[valid]
+
+
+# Khóa lịch: tên -> các cột của calendar_fields dùng để nhóm.
+# Thêm giả thuyết mới = thêm một cột vào calendar_fields (hoặc truyền sẵn trong df) và một dòng ở đây;
+# calendar_stats vẫn chỉ sắp xếp return một lần cho mọi khóa.
+CALENDAR_KEYS: Dict[str, Tuple[str, ...]] = {
+    'month': ('Month',),
+    'quarter': ('Quarter',),
+    'dayofweek': ('DayOfWeek',),
+    'week_of_month': ('WeekOfMonth',),
+    'trading_day_of_month': ('TradingDayOfMonth',),
+    'trading_days_to_month_end': ('TradingDaysToMonthEnd',),
+    'turn_of_month': ('TurnOfMonth',),
+    'year': ('Year',),
+    'year_month': ('Year', 'Month'),
+    'year_quarter': ('Year', 'Quarter'),
+}
+
+
+def register_calendar_key(name: str, columns: Sequence[str]) -> None:
+    """Đăng ký một khóa nhóm mới từ các cột đã có (trong calendar_fields hoặc df)."""
+    CALENDAR_KEYS[name] = tuple(columns)
+
+
+# ---------------------------------------------------------
+# 2. Thống kê theo nhóm
+# ---------------------------------------------------------
+def _combine_codes(columns: Sequence[np.ndarray]) -> np.ndarray:
+    """Gộp nhiều cột số nguyên thành một mã duy nhất, giữ thứ tự từ điển."""
+    code = np.zeros(len(columns[0]), dtype=np.int64)
+    for col in columns:
+        col = np.asarray(col, dtype=np.int64)
+        lo = col.min() if len(col) else 0
+        code = code * (int(col.max() - lo) + 1 if len(col) else 1) + (col - lo)
+    return code
+
+
+def group_stats(returns: np.ndarray,
+                key_columns: Dict[str, np.ndarray],
+                value_order: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    Thống kê return (không NaN) theo khóa: mean / median / std (ddof=1) / số ngày dương, âm, tổng.
+
+    Kết quả giống từng nhóm returns.mean(), .median(), .std() của pandas (cộng theo đúng thứ tự thời gian
+    trong nhóm). value_order: np.argsort(returns) nếu đã có sẵn — dùng chung cho nhiều khóa để
+    median không phải sắp xếp lại trong từng nhóm.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    names = list(key_columns)
+    cols = [np.asarray(key_columns[k]) for k in names]
+    cols = [c.astype(np.int64) if np.issubdtype(c.dtype, np.integer) else c for c in cols]
+    if len(returns) == 0:
+        return pd.DataFrame(columns=names + STAT_COLUMNS)
+
+    code = _combine_codes(cols)
+    # nhóm liền nhau, trong nhóm giữ thứ tự thời gian (argsort ổn định)
+    by_time = np.argsort(code, kind='stable')
+    starts, stops = _run_bounds(code[by_time])
+    values = returns[by_time]
+
+    # trong nhóm theo giá trị tăng dần: sắp xếp ổn định các vị trí đã theo giá trị
+    if value_order is None:
+        value_order = np.argsort(returns, kind='stable')
+    sorted_values = returns[value_order[np.argsort(code[value_order], kind='stable')]]
+
+    n_groups = len(starts)
+    mean = np.empty(n_groups)
+    median = np.empty(n_groups)
+    std = np.empty(n_groups)
+    for g, (a, b) in enumerate(zip(starts.tolist(), stops.tolist())):
+        seg = values[a:b]
+        n = b - a
+        m = seg.sum() / n
+        mean[g] = m
+        std[g] = np.sqrt(((seg - m) ** 2).sum() / (n - 1)) if n > 1 else np.nan
+        half = n // 2
+        median[g] = sorted_values[a + half] if n % 2 else (sorted_values[a + half - 1] + sorted_values[a + half]) / 2
+    pos = np.add.reduceat((values > 0).astype(np.int64), starts)
+    neg = np.add.reduceat((values < 0).astype(np.int64), starts)
+
+    out = {name: col[by_time[starts]] for name, col in zip(names, cols)}
+    out.update({
+        'Avg_Return': mean,
+        'Median_Return': median,
+        'Std_Dev': std,
+        'Positive_Days': pos,
+        'Negative_Days': neg,
+        'Total_Days': (stops - starts).astype(np.int64),
+    })
+    return pd.DataFrame(out)
+
+
+def calendar_stats(df: pd.DataFrame,
+                   keys: Iterable[str] = ('month', 'quarter'),
+                   return_col: str = 'Daily_Return',
+                   date_col: str = 'Date',
+                   fields: Optional[pd.DataFrame] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Thống kê return cho nhiều khóa lịch trong một lượt: tính calendar_fields, bỏ NaN và sắp xếp return
+    MỘT lần, rồi mỗi khóa chỉ còn một argsort ổn định trên mã nhóm số nguyên.
+
+    keys   : tên trong CALENDAR_KEYS hoặc tên cột có sẵn trong df (ví dụ một cột giả thuyết tự thêm).
+    fields : calendar_fields đã tính sẵn (bỏ qua bước tính lại).
+    Trả về {key: DataFrame(cột khóa..., Avg_Return, Median_Return, Std_Dev, Positive_Days, Negative_Days, Total_Days)}
+    sắp theo khóa tăng dần.
+    """
+    if return_col not in df.columns:
+        raise KeyError(f"Không tìm thấy cột return: {return_col}")
+    keys = list(keys)
+    if fields is None:
+        if date_col not in df.columns:
+            raise KeyError(f"Không tìm thấy cột ngày: {date_col}")
+        fields = calendar_fields(df[date_col])
+
+    returns = df[return_col].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(returns)
+    returns = returns[valid]
+    value_order = np.argsort(returns, kind='stable')
+
+    out = {}
+    for key in keys:
+        columns = CALENDAR_KEYS.get(key, (key,))
+        key_columns = {}
+        for c in columns:
+            if c in fields.columns:
+                key_columns[c] = fields[c].to_numpy()[valid]
+            elif c in df.columns:
+                key_columns[c] = df[c].to_numpy()[valid]
+            else:
+                raise KeyError(f"Không tìm thấy khóa lịch '{key}' (cột '{c}')")
+        out[key] = group_stats(returns, key_columns, value_order)
+    return out
+
+
+def split_by(stats: pd.DataFrame, column: str = 'Year') -> Dict[int, pd.DataFrame]:
+    """Tách bảng thống kê theo một cột khóa (ví dụ year_month -> {year: bảng theo tháng})."""
+    out = {}
+    if stats.empty:
+        return out
+    values = stats[column].to_numpy()
+    starts, stops = _run_bounds(values)
+    for a, b in zip(starts.tolist(), stops.tolist()):
+        out[int(values[a])] = stats.iloc[a:b].drop(columns=column).reset_index(drop=True)
+    return out
@@ -1,25 +1,29 @@
 import numpy as np
 import pandas as pd
-import talib
-import matplotlib.pyplot as plt
-from scipy.stats import linregress
-import matplotlib.dates as mdates
+from lazy_imports import lazy_module, lazy_callable
+from indicator_cache import get_return, get_sma, get_adx
+from sma_cross import sma_cross_events, crosses_to_df
 
+# matplotlib / scipy chỉ được import khi gọi hàm vẽ
+plt = lazy_module('matplotlib.pyplot')
+mdates = lazy_module('matplotlib.dates')
+linregress = lazy_callable('scipy.stats', 'linregress')
 
 
 
-# Tính các indicators
+
+# Tính các indicators (lấy từ indicator_cache, dùng chung với check_trend_following)
 def compute_indicators_mean_reversion(df):
     df = df.copy()
 
     # Return
-    df['Return'] = df['Close'].pct_change()
+    df['Return'] = get_return(df)
 
     # Long-term SMA
-    df['SMA50'] = df['Close'].rolling(50).mean()
+    df['SMA50'] = get_sma(df, 50)
 
     # ADX
-    df['ADX'] = talib.ADX(df['High'], df['Low'], df['Close'], timeperiod=14)
+    df['ADX'] = get_adx(df, timeperiod=14)
 
     return df
 
@@ -35,22 +39,18 @@ def check_adx_mr(df):
 
 
 # Hàm tính số lần cắt SMA trung hạn
-def check_cross_per_year(df, sma_col='SMA50', price_col='Close'):
-
-    df = df.copy()
-    df[sma_col] = df[price_col].rolling(50).mean()
-    df = df.dropna(subset=[sma_col, price_col])
-
-    # Số lần cắt
-    prev_price = df[price_col].shift(1)
-    prev_sma = df[sma_col].shift(1)
-    cross_up = (prev_price < prev_sma) & (df[price_col] > df[sma_col])
-    cross_down = (prev_price > prev_sma) & (df[price_col] < df[sma_col])
-    total_crosses = cross_up.sum() + cross_down.sum()
+def check_cross_per_year(df, sma_col='SMA50', price_col='Close', sma_window=50):
+    """
+    Số lần giá cắt SMA(sma_window) trung bình mỗi năm.
+    sma_col: deprecated, không còn được dùng (SMA luôn tính từ get_sma(df, sma_window), không đọc cột nào);
+    chỉ giữ lại để không đổi vị trí của price_col khi gọi theo vị trí.
+    """
 
-    n_days = df.shape[0]
+    # SMA lấy từ indicator_cache, đếm cắt bằng sma_cross (cùng logic dropna + shift(1))
+    sma = get_sma(df, sma_window, price_col=price_col)
+    _, summary = sma_cross_events(df[price_col].to_numpy(dtype=np.float64), [sma_window], sma=sma)
 
-    crosses_per_year = total_crosses/n_days * 252
+    crosses_per_year = summary['crosses_per_year'][0]
 
     return crosses_per_year
 
@@ -179,45 +179,15 @@ def get_sma_crosses_df(df, sma_col='SMA50', price_col='Close'):
     Trả về DataFrame các lần cross với cột: date, type ('up'/'down'), price, sma.
     Yêu cầu: df đã có cột SMA (ví dụ 'SMA50') hoặc sẽ tính SMA50 tại đây.
     """
-    df = df.copy()
     # đảm bảo có SMA50
-    if sma_col not in df.columns:
-        df[sma_col] = df[price_col].rolling(50).mean()
-
-    df = df.dropna(subset=[sma_col, price_col]).copy()
-    if df.empty:
-        return pd.DataFrame(columns=['date', 'type', 'price', 'sma'])
-
-    prev_price = df[price_col].shift(1)
-    prev_sma = df[sma_col].shift(1)
-
-    cross_up_mask = (prev_price < prev_sma) & (df[price_col] > df[sma_col])
-    cross_down_mask = (prev_price > prev_sma) & (df[price_col] < df[sma_col])
-
-    # Lấy ngày/idx cho mỗi điểm cắt
-    if 'Date' in df.columns:
-        dates = df['Date']
+    if sma_col in df.columns:
+        sma = df[sma_col].to_numpy(dtype=np.float64)
     else:
-        dates = df.index
-
-    crosses = []
-    for idx in df.index[cross_up_mask]:
-        crosses.append({'date': dates.loc[idx] if hasattr(dates, 'loc') else dates[idx],
-                        'type': 'up',
-                        'price': float(df.loc[idx, price_col]),
-                        'sma': float(df.loc[idx, sma_col])})
-    for idx in df.index[cross_down_mask]:
-        crosses.append({'date': dates.loc[idx] if hasattr(dates, 'loc') else dates[idx],
-                        'type': 'down',
-                        'price': float(df.loc[idx, price_col]),
-                        'sma': float(df.loc[idx, sma_col])})
-
-    crosses_df = pd.DataFrame(crosses)
-    # sắp theo thời gian
-    if not crosses_df.empty:
-        crosses_df = crosses_df.sort_values('date').reset_index(drop=True)
+        sma = get_sma(df, 50, price_col=price_col)
 
-    return crosses_df
+    # nhãn window không dùng ở đây (SMA truyền sẵn); crosses_to_df sắp xếp lại theo date
+    events, _ = sma_cross_events(df[price_col].to_numpy(dtype=np.float64), [0], sma=sma)
+    return crosses_to_df(df, events)
 
 
 def plot_price_with_sma_crosses(df, sma_window=50, marker_size=60):
@@ -225,10 +195,10 @@ def plot_price_with_sma_crosses(df, sma_window=50, marker_size=60):
     df = df.copy()
     # đảm bảo cột Date nếu có, hoặc dùng index
     if sma_window != 50:
-        df['SMA'] = df['Close'].rolling(sma_window).mean()
+        df['SMA'] = get_sma(df, sma_window)
         sma_col = 'SMA'
     else:
-        df['SMA50'] = df['Close'].rolling(50).mean()
+        df['SMA50'] = get_sma(df, 50)
         sma_col = 'SMA50'
 
     # x-axis
@@ -237,9 +207,11 @@ def plot_price_with_sma_crosses(df, sma_window=50, marker_size=60):
     else:
         x = pd.to_datetime(df.index)
 
-    # compute crosses and crosses_per_year
-    crosses_df = get_sma_crosses_df(df, sma_col=sma_col, price_col='Close')
-    crosses_per_year = check_cross_per_year(df, sma_col=sma_col, price_col='Close')
+    # compute crosses and crosses_per_year (một lượt cho cả hai)
+    events, summary = sma_cross_events(df['Close'].to_numpy(dtype=np.float64), [sma_window],
+                                       sma=df[sma_col].to_numpy(dtype=np.float64))
+    crosses_df = crosses_to_df(df, events)
+    crosses_per_year = summary['crosses_per_year'][0]
 
     plt.figure(figsize=(14,5))
     plt.plot(x, df['Close'], label='Close', linewidth=1)
@@ -1,7 +1,16 @@
+from bisect import bisect_right, insort
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
 import numpy as np
 import pandas as pd
-from scipy import stats
-import matplotlib.pyplot as plt
+from lazy_imports import lazy_module
+from instrumentation import pipeline
+
+# scipy / matplotlib chỉ được import khi dùng lần đầu
+stats = lazy_module('scipy.stats')
+plt = lazy_module('matplotlib.pyplot')
 
 # ---------------------------------------------------------
 # 1. Compute returns
@@ -15,6 +24,28 @@ def compute_returns(df: pd.DataFrame, price_col: str = 'Close') -> pd.DataFrame:
     return df.dropna()
 
 
+# Các loại return cho quét nhiều cột: tên cột -> hàm tính từ df (Open / Close)
+RETURN_TYPES = {
+    'return': lambda df, price_col: df[price_col].pct_change(),
+    'return_oc': lambda df, price_col: df[price_col] / df['Open'] - 1,
+    'log_return': lambda df, price_col: np.log(df[price_col]).diff(),
+}
+
+
+def compute_return_columns(df: pd.DataFrame, price_col: str = 'Close',
+                           columns: Sequence[str] = tuple(RETURN_TYPES)) -> pd.DataFrame:
+    """
+    Tính nhiều loại return cùng lúc: 'return' (close-to-close, như compute_returns), 'return_oc'
+    (open-to-close), 'log_return'. Bỏ các dòng có NaN ở bất kỳ cột nào.
+    """
+    df = df.copy()
+    for col in columns:
+        if col not in RETURN_TYPES:
+            raise KeyError(f"Không hỗ trợ loại return '{col}'. Chọn một trong: {list(RETURN_TYPES)}")
+        df[col] = RETURN_TYPES[col](df, price_col)
+    return df.dropna()
+
+
 # ---------------------------------------------------------
 # 2. Detect outliers bằng QQ-plot deviation
 # ---------------------------------------------------------
@@ -31,8 +62,7 @@ def detect_outliers_qq(df: pd.DataFrame, column: str = 'return', threshold: floa
     sorted_r = np.sort(r)
 
     # theoretical normal quantiles
-    probs = (np.arange(1, n + 1) - 0.5) / n
-    theoretical = stats.norm.ppf(probs)
+    theoretical = normal_quantiles(n)
 
     # standardize actual data
     r_mean = sorted_r.mean()
@@ -56,27 +86,267 @@ def detect_outliers_qq(df: pd.DataFrame, column: str = 'return', threshold: floa
     return df
 
 
+@lru_cache(maxsize=64)
+def normal_quantiles(n: int) -> np.ndarray:
+    """Quantile chuẩn lý thuyết ppf((i - 0.5) / n), i = 1..n; được cache theo n (chỉ đọc)."""
+    probs = (np.arange(1, n + 1) - 0.5) / n
+    q = stats.norm.ppf(probs)
+    q.flags.writeable = False
+    return q
+
+
+# ---------------------------------------------------------
+# 2b. QQ deviation theo cửa sổ trượt
+# ---------------------------------------------------------
+# Trong cửa sổ w return gần nhất, return mới nhất có thứ hạng k (số phần tử nhỏ hơn nó cộng số phần tử
+# bằng nó nhưng đến trước) thì deviation = |(r - mean_w) / std_w - normal_quantiles(w)[k]|,
+# tức đúng giá trị detect_outliers_qq cho điểm cuối nếu chỉ chạy trên cửa sổ đó (std với ddof=0).
+
+class _SortedWindow:
+    """Cửa sổ `window` giá trị gần nhất kèm bản sắp xếp (insort / bisect): mỗi push O(log w) so sánh."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._values: deque = deque()
+        self._sorted: list = []
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    @property
+    def values(self) -> deque:
+        return self._values
+
+    def push(self, r: float) -> Optional[float]:
+        """Thêm r; trả về giá trị cũ nhất bị đẩy ra khỏi cửa sổ (None nếu chưa đầy)."""
+        self._values.append(r)
+        insort(self._sorted, r)
+        if len(self._values) > self.window:
+            old = self._values.popleft()
+            del self._sorted[bisect_right(self._sorted, old) - 1]
+            return old
+        return None
+
+    def rank_of_last(self, r: float) -> int:
+        """Thứ hạng của r vừa push: r được chèn sau các phần tử bằng nó nên là vị trí cuối cùng của r."""
+        return bisect_right(self._sorted, r) - 1
+
+
+def _window_ranks(r: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Thứ hạng của r[t] trong cửa sổ kết thúc tại t và số phần tử của cửa sổ, dùng cùng _SortedWindow."""
+    n = len(r)
+    win = _SortedWindow(window)
+    ranks = np.empty(n, dtype=np.int64)
+    for t, x in enumerate(r.tolist()):
+        win.push(x)
+        ranks[t] = win.rank_of_last(x)
+    sizes = np.minimum(np.arange(1, n + 1), window)
+    return ranks, sizes
+
+
+def rolling_qq_deviation(returns, window: int = 500, min_periods: Optional[int] = None) -> np.ndarray:
+    """
+    QQ deviation của từng return so với cửa sổ `window` return gần nhất (kể cả chính nó).
+    NaN khi cửa sổ có ít hơn min_periods phần tử (mặc định = window). returns không được chứa NaN.
+    """
+    r = np.asarray(returns, dtype=np.float64)
+    if window < 2:
+        raise ValueError("window phải >= 2")
+    min_periods = window if min_periods is None else max(int(min_periods), 2)
+    n = len(r)
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+
+    ranks, sizes = _window_ranks(r, window)
+    roll = pd.Series(r).rolling(window, min_periods=1)
+    mean = roll.mean().to_numpy()
+    std = roll.std(ddof=0).to_numpy()
+
+    valid = sizes >= min_periods
+    full = valid & (sizes == window)
+    theoretical = np.empty(n)
+    theoretical[full] = normal_quantiles(window)[ranks[full]]
+    part = valid & ~full
+    if part.any():
+        theoretical[part] = stats.norm.ppf((ranks[part] + 0.5) / sizes[part])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out[valid] = np.abs((r[valid] - mean[valid]) / std[valid] - theoretical[valid])
+    return out
+
+
+def detect_outliers_qq_rolling(df: pd.DataFrame, column: str = 'return', threshold: float = 3.0,
+                               window: int = 500, min_periods: Optional[int] = None) -> pd.DataFrame:
+    """
+    Như detect_outliers_qq nhưng mỗi ngày chỉ xét return mới nhất trong cửa sổ trượt `window` ngày:
+    is_outlier[t] = return ngày t là outlier của cửa sổ kết thúc tại t (không dùng dữ liệu tương lai).
+    """
+    df = df.copy()
+    deviation = rolling_qq_deviation(df[column].values, window, min_periods)
+    df['is_outlier'] = deviation > threshold
+    df['qq_deviation'] = deviation
+    return df
+
+
+class RollingQQDetector:
+    """
+    Bản streaming cho dữ liệu nạp từng ngày (mỗi mã một detector): giữ cửa sổ đã sắp xếp (_SortedWindow)
+    cùng tổng / tổng bình phương, nên mỗi update chỉ cần một lần chèn + xóa thay vì sắp xếp lại.
+    Tổng được tính lại từ đầu sau mỗi `window` lần update để không tích lũy sai số làm tròn.
+    """
+
+    def __init__(self, window: int = 500, threshold: float = 3.0, min_periods: Optional[int] = None):
+        if window < 2:
+            raise ValueError("window phải >= 2")
+        self.window = window
+        self.threshold = threshold
+        self.min_periods = window if min_periods is None else max(int(min_periods), 2)
+        self._window = _SortedWindow(window)
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._since_refresh = 0
+
+    def update(self, r: float) -> Tuple[bool, float]:
+        """Thêm return mới nhất; trả về (is_outlier, qq_deviation) của nó (False, nan khi chưa đủ dữ liệu)."""
+        r = float(r)
+        if np.isnan(r):
+            raise ValueError("return không được là NaN")
+        old = self._window.push(r)
+        self._sum += r
+        self._sumsq += r * r
+        if old is not None:
+            self._sum -= old
+            self._sumsq -= old * old
+        self._since_refresh += 1
+        if self._since_refresh >= self.window:
+            values = self._window.values
+            self._sum = float(np.sum(values))
+            self._sumsq = float(np.dot(values, values))
+            self._since_refresh = 0
+
+        m = len(self._window)
+        if m < self.min_periods:
+            return False, float('nan')
+        rank = self._window.rank_of_last(r)
+        theoretical = normal_quantiles(m)[rank]
+        mean = self._sum / m
+        var = max(self._sumsq / m - mean * mean, 0.0)
+        std = np.sqrt(var)
+        deviation = abs((r - mean) / std - theoretical) if std > 0 else float('nan')
+        return bool(deviation > self.threshold), deviation
+
 
 # Pipeline chính
-def detect_outliers(df: pd.DataFrame, price_col: str = 'Close', threshold: float = 3.0) -> dict:
+def detect_outliers(df: pd.DataFrame, price_col: str = 'Close', threshold: float = 3.0, instrument: bool = False,
+                    window: Optional[int] = None) -> dict:
     """
     Tính returns, phát hiện outlier và trả về dict kết quả.
+    window=None: QQ trên toàn bộ lịch sử; window=w: QQ theo cửa sổ trượt w ngày (detect_outliers_qq_rolling).
+    instrument=True (hoặc gọi trong instrumentation.profiling()): thêm 'timings' theo từng stage.
     """
-    df = df.copy()
-    df.index = pd.to_datetime(df['Date']).dt.date
-    df = df.drop(columns=['Date'])
+    with pipeline('detect_outliers', instrument) as prof:
+        with prof.stage('prepare_index'):
+            df = df.copy()
+            df.index = pd.to_datetime(df['Date']).dt.date
+            df = df.drop(columns=['Date'])
 
-    df = compute_returns(df, price_col)
-    df = detect_outliers_qq(df, 'return', threshold)
+        with prof.stage('compute_returns'):
+            df = compute_returns(df, price_col)
+        with prof.stage('detect_outliers_qq'):
+            if window is None:
+                df = detect_outliers_qq(df, 'return', threshold)
+            else:
+                df = detect_outliers_qq_rolling(df, 'return', threshold, window)
 
-    outliers = df[df['is_outlier']]
+        outliers = df[df['is_outlier']]
 
-    return {
+    return prof.attach({
         'df': df,
         'outliers': outliers,
+    })
+
+
+# ---------------------------------------------------------
+# 4. Quét nhiều ngưỡng / nhiều cột return với một lần sắp xếp
+# ---------------------------------------------------------
+def qq_deviation_matrix(values: np.ndarray) -> np.ndarray:
+    """
+    QQ deviation (trị tuyệt đối) cho từng cột của ma trận (n, m): sắp xếp cả ma trận một lần,
+    dùng chung quantile lý thuyết; mỗi cột cho đúng qq_deviation của detect_outliers_qq.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    # làm việc trên ma trận chuyển vị (m, n) liên tục theo dòng để mean / std cộng theo từng dãy
+    # giống hệt bản một cột (cùng thứ tự cộng, cùng kết quả làm tròn)
+    rows = np.ascontiguousarray(values.T)
+    order = np.argsort(rows, axis=1)
+    sorted_v = np.take_along_axis(rows, order, axis=1)
+    z = (sorted_v - sorted_v.mean(axis=1, keepdims=True)) / sorted_v.std(axis=1, keepdims=True)
+    deviation_sorted = np.abs(z - normal_quantiles(n)[None, :])
+    out = np.empty_like(deviation_sorted)
+    np.put_along_axis(out, order, deviation_sorted, axis=1)
+    return out.T
+
+
+def outlier_threshold_sweep(df: pd.DataFrame,
+                            thresholds: Sequence[float] = (2.0, 2.5, 3.0, 3.5, 4.0),
+                            columns: Sequence[str] = ('return',)) -> dict:
+    """
+    Trả lời nhiều ngưỡng cho nhiều cột return sau một lần tính QQ deviation.
+
+    Trả về dict:
+      - deviation : DataFrame qq_deviation (cùng index với df, mỗi cột return một cột)
+      - counts    : DataFrame số outlier (index = threshold, cột = cột return)
+      - dates     : {cột: {threshold: index các ngày outlier}} (theo thứ tự thời gian)
+    """
+    thresholds = sorted(float(t) for t in thresholds)
+    columns = list(columns)
+    dev = qq_deviation_matrix(df[columns].to_numpy())
+
+    # sắp deviation giảm dần một lần: outlier của mọi ngưỡng là các tiền tố của thứ tự này
+    order = np.argsort(-dev, axis=0, kind='stable')
+    sorted_dev = -np.take_along_axis(dev, order, axis=0)
+    counts = {}
+    dates: Dict[str, Dict[float, pd.Index]] = {}
+    for j, col in enumerate(columns):
+        # số phần tử > t = vị trí của -t trong dãy -dev tăng dần (bên trái)
+        k = np.searchsorted(sorted_dev[:, j], -np.asarray(thresholds), side='left')
+        counts[col] = k
+        dates[col] = {t: df.index[np.sort(order[:kk, j])] for t, kk in zip(thresholds, k.tolist())}
+
+    return {
+        'deviation': pd.DataFrame(dev, index=df.index, columns=columns),
+        'counts': pd.DataFrame(counts, index=pd.Index(thresholds, name='threshold')),
+        'dates': dates,
     }
 
 
+def scan_outlier_thresholds(df: pd.DataFrame,
+                            thresholds: Sequence[float] = (2.0, 2.5, 3.0, 3.5, 4.0),
+                            price_col: str = 'Close',
+                            return_columns: Sequence[str] = tuple(RETURN_TYPES),
+                            instrument: bool = False) -> dict:
+    """
+    Pipeline quét độ nhạy: chuẩn bị index và tính các cột return một lần rồi gọi outlier_threshold_sweep,
+    thay vì chạy lại detect_outliers cho từng threshold / từng loại return.
+    """
+    with pipeline('scan_outlier_thresholds', instrument) as prof:
+        with prof.stage('prepare_index'):
+            df = df.copy()
+            df.index = pd.to_datetime(df['Date']).dt.date
+            df = df.drop(columns=['Date'])
+
+        with prof.stage('compute_returns'):
+            df = compute_return_columns(df, price_col, return_columns)
+        with prof.stage('threshold_sweep'):
+            result = outlier_threshold_sweep(df, thresholds, return_columns)
+
+    result['df'] = df
+    return prof.attach(result)
+
+
 # Trực quan hóa outlier
 def plot_outliers(df: pd.DataFrame, column: str = 'return'):
     """
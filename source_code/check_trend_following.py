@@ -1,20 +1,24 @@
 import pandas as pd
-import talib
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy.stats import linregress
-import matplotlib.dates as mdates
+from lazy_imports import lazy_module, lazy_callable
+from indicator_cache import get_return, get_sma, get_adx
+from instrumentation import pipeline
 
-# Tính các indicators
+# matplotlib / scipy chỉ được import khi dùng lần đầu
+plt = lazy_module('matplotlib.pyplot')
+mdates = lazy_module('matplotlib.dates')
+linregress = lazy_callable('scipy.stats', 'linregress')
+
+# Tính các indicators (lấy từ indicator_cache: cùng dữ liệu giá chỉ tính một lần)
 def compute_indicators(df):
     df = df.copy()
-    df['Return'] = df['Close'].pct_change()
+    df['Return'] = get_return(df)
 
     # ADX
-    df['ADX'] = talib.ADX(df['High'], df['Low'], df['Close'], timeperiod=14)
+    df['ADX'] = get_adx(df, timeperiod=14)
 
     # Tính SMA
-    df['SMA50'] = df['Close'].rolling(50).mean()
+    df['SMA50'] = get_sma(df, 50)
 
     return df
 
@@ -31,21 +35,32 @@ def check_adx(df):
 
 
 # Kiểm tra pattern trend_following
-def check_trend_following(df):
-    df = compute_indicators(df)
+def check_trend_following(df, instrument=False):
+    # instrument=True (hoặc gọi trong instrumentation.profiling()): thêm results['timings'] theo từng stage
+    with pipeline('check_trend_following', instrument) as prof:
+        results = _check_trend_following(prof, df)
+    return prof.attach(results)
+
+
+def _check_trend_following(prof, df):
+    with prof.stage('compute_indicators'):
+        df = compute_indicators(df)
     results = {}
 
     # Indicators
-    results['autocorr'] = check_autocorrelation(df)
-    results['adx_median'] = check_adx(df)
-    results['pct_close_above_SMA50'] = (df['Close'] > df['SMA50']).mean()
-    results['pct_close_below_SMA50'] = (df['Close'] < df['SMA50']).mean()
+    with prof.stage('autocorr_adx'):
+        results['autocorr'] = check_autocorrelation(df)
+        results['adx_median'] = check_adx(df)
+    with prof.stage('sma_position'):
+        results['pct_close_above_SMA50'] = (df['Close'] > df['SMA50']).mean()
+        results['pct_close_below_SMA50'] = (df['Close'] < df['SMA50']).mean()
 
     # Linear regression trên SMA50 để tính slope trend
-    valid_idx = ~df['SMA50'].isna()  # loại NaN đầu window
-    x = np.arange(len(df[valid_idx]))
-    y = df.loc[valid_idx, 'SMA50'].values
-    slope, intercept, r_value, p_value, std_err = linregress(x, y)
+    with prof.stage('sma_slope'):
+        valid_idx = ~df['SMA50'].isna()  # loại NaN đầu window
+        x = np.arange(len(df[valid_idx]))
+        y = df.loc[valid_idx, 'SMA50'].values
+        slope, intercept, r_value, p_value, std_err = linregress(x, y)
     results['SMA50_slope'] = slope
 
     # Xác định trend direction
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Định dạng ngày của file crawl từ yfinance, ví dụ: 2005-10-03 00:00:00-04:00
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S%z'
+CACHE_DIRNAME = '.ohlcv_cache'
+CACHE_VERSION = 2
+
+
+# ---------------------------------------------------------
+# 1. Parse ngày
+# ---------------------------------------------------------
+def _parse_fixed_offset(values: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Fast path cho chuỗi độ rộng cố định 'YYYY-MM-DD HH:MM:SS±HH:MM'.
+    Trả về mảng datetime64[s] theo UTC (không tz), hoặc None nếu dữ liệu không đúng định dạng.
+    """
+    try:
+        raw = values.astype('S25')
+    except (UnicodeEncodeError, ValueError, TypeError):
+        return None
+    if len(raw) == 0 or not (np.char.str_len(raw) == 25).all():
+        return None
+
+    b = raw.view(np.uint8).reshape(-1, 25)
+    sign = b[:, 19]
+    if not (np.isin(sign, (ord('+'), ord('-'))).all() and (b[:, 22] == ord(':')).all()):
+        return None
+    digits = b[:, [20, 21, 23, 24]].astype(np.int64) - ord('0')
+    if ((digits < 0) | (digits > 9)).any():
+        return None
+
+    try:
+        local = raw.astype('S19').astype('datetime64[s]')
+    except ValueError:
+        return None
+
+    offset_min = (digits[:, 0] * 10 + digits[:, 1]) * 60 + digits[:, 2] * 10 + digits[:, 3]
+    offset_min = np.where(sign == ord('-'), -offset_min, offset_min)
+    return local - offset_min.astype('timedelta64[m]')
+
+
+def parse_dates(values) -> pd.Series:
+    """
+    Chuyển cột ngày về datetime (UTC, bỏ tz) giống ensure_datetime_index:
+        pd.to_datetime(values, errors='coerce', utc=True).dt.tz_convert(None)
+    Cột đã là datetime không tz thì trả lại nguyên vẹn (không parse lại).
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.tz_convert(None) if s.dt.tz is not None else s
+
+    arr = s.to_numpy(dtype=object)
+    fast = _parse_fixed_offset(arr)
+    if fast is not None:
+        # giữ cùng đơn vị thời gian mà pandas sẽ trả về cho đường parse thông thường
+        unit = pd.to_datetime(arr[:1], format=DATE_FORMAT, utc=True).unit
+        return pd.Series(fast, index=s.index, name=s.name).astype(f'datetime64[{unit}]')
+
+    try:
+        parsed = pd.to_datetime(s, format=DATE_FORMAT, utc=True)
+    except (ValueError, TypeError):
+        parsed = pd.to_datetime(s, errors='coerce', utc=True)
+    return parsed.dt.tz_convert(None)
+
+
+# ---------------------------------------------------------
+# 2. Cache dạng cột (.npy mỗi cột) cạnh file nguồn
+# ---------------------------------------------------------
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _source_key(path: Path) -> str:
+    """Định danh file nguồn trong cache: đường dẫn tuyệt đối đã resolve."""
+    return str(path.resolve())
+
+
+def get_cache_dir(path: str, cache_dir: Optional[str] = None) -> Path:
+    """
+    Thư mục cache của một file CSV: <thư mục chứa file>/.ohlcv_cache/<tên file>-<hash đường dẫn>/
+    Khóa theo tên file đầy đủ + hash đường dẫn tuyệt đối, nên KO.csv / KO.txt hay hai file KO.csv
+    ở hai thư mục dùng chung cache_dir không ghi đè cache của nhau.
+    """
+    path = Path(path)
+    root = Path(cache_dir) if cache_dir is not None else path.parent / CACHE_DIRNAME
+    digest = hashlib.sha256(_source_key(path).encode('utf-8')).hexdigest()[:16]
+    return root / f'{path.name}-{digest}'
+
+
+def _read_meta(cache: Path) -> Optional[dict]:
+    try:
+        with open(cache / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == CACHE_VERSION else None
+
+
+def _write_meta(cache: Path, meta: dict) -> None:
+    tmp = cache / 'meta.json.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, cache / 'meta.json')
+
+
+def _cache_is_valid(path: Path, cache: Path, meta: Optional[dict]) -> bool:
+    """
+    Hợp lệ nếu cache thuộc đúng file nguồn và mtime/size khớp; nếu mtime đổi nhưng nội dung (hash)
+    không đổi thì vẫn dùng lại.
+    """
+    if meta is None or meta.get('source') != _source_key(path):
+        return False
+    st = path.stat()
+    if meta.get('mtime_ns') == st.st_mtime_ns and meta.get('size') == st.st_size:
+        return True
+    if meta.get('size') != st.st_size:
+        return False
+    if meta.get('sha256') != _file_sha256(path):
+        return False
+    meta['mtime_ns'] = st.st_mtime_ns
+    _write_meta(cache, meta)
+    return True
+
+
+def _write_cache(path: Path, cache: Path, df: pd.DataFrame) -> None:
+    cache.mkdir(parents=True, exist_ok=True)
+    columns = []
+    for i, col in enumerate(df.columns):
+        arr = df[col].to_numpy()
+        fname = f'col_{i}.npy'
+        entry = {'name': col, 'file': fname}
+        if arr.dtype == object:
+            # cột chuỗi lưu dạng unicode độ rộng cố định + mặt nạ NaN, để đọc lại không cần pickle
+            mask = pd.isna(arr)
+            arr = np.where(mask, '', arr).astype('U')
+            entry['mask'] = f'col_{i}_na.npy'
+            np.save(cache / entry['mask'], mask, allow_pickle=False)
+        np.save(cache / fname, arr, allow_pickle=False)
+        columns.append(entry)
+
+    st = path.stat()
+    # meta.json ghi sau cùng: chỉ khi có meta thì cache mới được coi là hoàn chỉnh
+    _write_meta(cache, {
+        'version': CACHE_VERSION,
+        'source': _source_key(path),
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'sha256': _file_sha256(path),
+        'columns': columns,
+    })
+
+
+def _read_cache(cache: Path, meta: dict) -> pd.DataFrame:
+    data = {}
+    for col in meta['columns']:
+        arr = np.load(cache / col['file'], allow_pickle=False)
+        if 'mask' in col:
+            arr = arr.astype(object)
+            arr[np.load(cache / col['mask'], allow_pickle=False)] = np.nan
+        data[col['name']] = arr
+    return pd.DataFrame(data)
+
+
+# ---------------------------------------------------------
+# 3. Loader chính
+# ---------------------------------------------------------
+def read_ohlcv_csv(path: str, date_col: str = 'Date') -> pd.DataFrame:
+    """Đọc CSV OHLCV và parse cột ngày một lần (UTC, bỏ tz)."""
+    df = pd.read_csv(path)
+    if date_col in df.columns:
+        df[date_col] = parse_dates(df[date_col])
+    return df
+
+
+def load_ohlcv(path: str, use_cache: bool = True, cache_dir: Optional[str] = None, date_col: str = 'Date') -> pd.DataFrame:
+    """
+    Đọc file OHLCV; cột Date trả về dạng datetime UTC không tz (cùng giá trị với
+    ensure_datetime_index), các hàm phía sau không cần parse lại.
+
+    Lần đầu parse CSV rồi ghi cache nhị phân (.npy mỗi cột) cạnh file nguồn; các lần sau đọc
+    thẳng từ cache. Cache bị bỏ khi mtime/size của file nguồn đổi và hash nội dung khác.
+    """
+    path = Path(path)
+    if not use_cache:
+        return read_ohlcv_csv(path, date_col=date_col)
+
+    cache = get_cache_dir(path, cache_dir)
+    meta = _read_meta(cache)
+    if _cache_is_valid(path, cache, meta):
+        try:
+            return _read_cache(cache, meta)
+        except (OSError, ValueError, KeyError):
+            pass  # cache hỏng -> đọc lại từ CSV
+
+    df = read_ohlcv_csv(path, date_col=date_col)
+    try:
+        _write_cache(path, cache, df)
+    except OSError as e:
+        print(f"Không thể ghi cache cho {path.name}: {e}")
+    return df
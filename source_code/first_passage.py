@@ -0,0 +1,105 @@
+from typing import Tuple, Union
+import numpy as np
+
+ArrayLike = Union[float, int, np.ndarray]
+
+
+class FirstPassageIndex:
+    """
+    Chỉ mục first-passage trên mảng giá Close cho việc dò TP/SL.
+
+    Câu hỏi cần trả lời: với giá vào lệnh `entry` và ngưỡng (stop_loss, take_profit),
+    vị trí j đầu tiên trong [start, stop) mà
+        Close[j] / entry - 1 <= stop_loss   hoặc   Close[j] / entry - 1 >= take_profit
+    là bao nhiêu?
+
+    Dựng sparse table max/min theo các khối độ dài 2^k, rồi nhảy nhị phân (binary lifting)
+    qua các khối không chạm ngưỡng: O(log n) mỗi truy vấn thay vì quét từng ngày.
+    Vì x -> x / entry - 1 đơn điệu nên chỉ cần so sánh max/min của khối, kết quả
+    giống hệt việc quét tuần tự. Giá NaN không bao giờ được coi là chạm ngưỡng.
+
+    max_level giới hạn số tầng (bộ nhớ ~ 2 * (max_level + 1) * n float64); các đoạn dài
+    hơn 2^max_level được nhảy từng khối lớn nhất.
+    """
+
+    def __init__(self, closes: np.ndarray, max_level: int = 10):
+        closes = np.asarray(closes, dtype=np.float64)
+        n = len(closes)
+        self.n = n
+
+        nan = np.isnan(closes)
+        base_max = np.where(nan, -np.inf, closes)
+        base_min = np.where(nan, np.inf, closes)
+
+        self.maxs = [base_max]
+        self.mins = [base_min]
+        k = 1
+        while k <= max_level and (1 << k) <= n:
+            half = 1 << (k - 1)
+            prev_max = self.maxs[-1]
+            prev_min = self.mins[-1]
+            self.maxs.append(np.maximum(prev_max[:-half], prev_max[half:]))
+            self.mins.append(np.minimum(prev_min[:-half], prev_min[half:]))
+            k += 1
+        self.top = len(self.maxs) - 1
+
+    def _block_free(self, k: int, p: int, entry: float, stop_loss: float, take_profit: float) -> bool:
+        """Khối [p, p + 2^k) không có ngày nào chạm ngưỡng."""
+        return (self.maxs[k][p] / entry - 1 < take_profit) and (self.mins[k][p] / entry - 1 > stop_loss)
+
+    def first_cross(self, start: int, stop: int, entry: float,
+                    stop_loss: float, take_profit: float) -> int:
+        """Vị trí đầu tiên trong [start, stop) chạm SL/TP, -1 nếu không có."""
+        stop = min(stop, self.n)
+        p = start
+        if p >= stop:
+            return -1
+
+        # Đoạn dài: nhảy từng khối ở tầng cao nhất
+        big = 1 << self.top
+        while p + big <= stop and self._block_free(self.top, p, entry, stop_loss, take_profit):
+            p += big
+
+        for k in range(self.top, -1, -1):
+            step = 1 << k
+            if p + step <= stop and self._block_free(k, p, entry, stop_loss, take_profit):
+                p += step
+
+        return p if p < stop else -1
+
+    def first_cross_many(self, starts: ArrayLike, stops: ArrayLike, entries: ArrayLike,
+                         stop_loss: ArrayLike, take_profit: ArrayLike) -> np.ndarray:
+        """
+        Phiên bản vector hóa của first_cross cho nhiều điểm vào lệnh / ngưỡng cùng lúc.
+        Các tham số được broadcast với nhau; trả về mảng vị trí (int64), -1 nếu không chạm.
+        """
+        starts, stops, entries, stop_loss, take_profit = np.broadcast_arrays(
+            np.asarray(starts, dtype=np.int64),
+            np.asarray(stops, dtype=np.int64),
+            np.asarray(entries, dtype=np.float64),
+            np.asarray(stop_loss, dtype=np.float64),
+            np.asarray(take_profit, dtype=np.float64),
+        )
+        stops = np.minimum(stops, self.n)
+        p = starts.copy()
+
+        def advance(k: int, p: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            step = 1 << k
+            fits = p + step <= stops
+            q = np.where(fits, p, 0)
+            free = (fits
+                    & (self.maxs[k][q] / entries - 1 < take_profit)
+                    & (self.mins[k][q] / entries - 1 > stop_loss))
+            return np.where(free, p + step, p), free
+
+        # Đoạn dài: lặp ở tầng cao nhất tới khi không truy vấn nào nhảy được nữa
+        while True:
+            p, moved = advance(self.top, p)
+            if not moved.any():
+                break
+
+        for k in range(self.top, -1, -1):
+            p, _ = advance(k, p)
+
+        return np.where(p < stops, p, -1)
+
@@ -0,0 +1,106 @@
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from indicators import adx
+
+
+def fingerprint(*arrays: np.ndarray) -> str:
+    """Dấu vân tay (blake2b) của nội dung các mảng giá, dùng làm một phần của key cache."""
+    h = hashlib.blake2b(digest_size=16)
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update(str(arr.dtype).encode())
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+class IndicatorCache:
+    """
+    Cache LRU cho các indicator (Return / SMA / ADX) tính từ cùng một dữ liệu giá.
+
+    Key = (fingerprint của các mảng giá đầu vào, tên indicator, tham số). Khi vượt
+    max_entries hoặc max_bytes thì loại các mục ít được dùng gần đây nhất.
+    Giá trị lưu là mảng NumPy chỉ đọc để không bị sửa ngoài ý muốn.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 256 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._store: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        value = self._store.get(key)
+        if value is not None:
+            self._store.move_to_end(key)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = np.array(compute(), dtype=np.float64)
+        value.setflags(write=False)
+        if value.nbytes > self.max_bytes:
+            return value  # quá lớn để cache
+
+        self._store[key] = value
+        self._nbytes += value.nbytes
+        while len(self._store) > self.max_entries or self._nbytes > self.max_bytes:
+            _, old = self._store.popitem(last=False)
+            self._nbytes -= old.nbytes
+        return value
+
+    def clear(self) -> None:
+        self._store.clear()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._store), 'bytes': self._nbytes, 'hits': self.hits, 'misses': self.misses}
+
+
+# Cache dùng chung cho mọi module trong cùng process
+DEFAULT_CACHE = IndicatorCache()
+
+
+def _values(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        raise KeyError(f"Không tìm thấy cột giá: {col}")
+    return df[col].to_numpy(dtype=np.float64)
+
+
+def get_return(df: pd.DataFrame, price_col: str = 'Close', cache: Optional[IndicatorCache] = None) -> np.ndarray:
+    """Return = pct_change của cột giá."""
+    cache = DEFAULT_CACHE if cache is None else cache
+    close = _values(df, price_col)
+    key = (fingerprint(close), 'Return')
+    return cache.get_or_compute(key, lambda: pd.Series(close).pct_change().to_numpy())
+
+
+def get_sma(df: pd.DataFrame, window: int = 50, price_col: str = 'Close', cache: Optional[IndicatorCache] = None) -> np.ndarray:
+    """SMA = rolling(window).mean() của cột giá."""
+    cache = DEFAULT_CACHE if cache is None else cache
+    close = _values(df, price_col)
+    key = (fingerprint(close), 'SMA', int(window))
+    return cache.get_or_compute(key, lambda: pd.Series(close).rolling(window).mean().to_numpy())
+
+
+def get_adx(df: pd.DataFrame, timeperiod: int = 14, cache: Optional[IndicatorCache] = None,
+            backend: str = 'numpy') -> np.ndarray:
+    """ADX(timeperiod) từ High / Low / Close; backend xem indicators.adx ('numpy' / 'talib' / 'auto')."""
+    cache = DEFAULT_CACHE if cache is None else cache
+    high = _values(df, 'High')
+    low = _values(df, 'Low')
+    close = _values(df, 'Close')
+    key = (fingerprint(high, low, close), 'ADX', int(timeperiod), backend)
+    return cache.get_or_compute(key, lambda: adx(high, low, close, timeperiod=timeperiod, backend=backend))
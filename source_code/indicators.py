@@ -0,0 +1,170 @@
+import importlib
+import math
+
+import numpy as np
+
+# Các backend ADX được hỗ trợ
+ADX_BACKENDS = ('numpy', 'talib', 'auto')
+
+_TALIB = None
+
+
+def load_talib(required: bool = False):
+    """
+    Import talib khi cần (lazy). Trả về module, hoặc None nếu chưa cài
+    (khi required=True thì báo ImportError).
+    """
+    global _TALIB
+    if _TALIB is None:
+        try:
+            _TALIB = importlib.import_module('talib')
+        except ImportError:
+            if required:
+                raise ImportError("backend='talib' cần cài TA-Lib (pip install TA-Lib)")
+            return None
+    return _TALIB
+
+
+def _is_zero(v: np.ndarray) -> np.ndarray:
+    # giống TA_IS_ZERO của TA-Lib
+    return (v > -1e-8) & (v < 1e-8)
+
+
+def linear_recursion(x: np.ndarray, a: float, s0: float = 0.0, block: int = 256) -> np.ndarray:
+    """
+    s[t] = a * s[t-1] + x[t] (s[-1] = s0) tính vector hóa theo khối.
+
+    Trong mỗi khối độ dài B: s_local[k] = a^k * cumsum(x[j] * a^-j), sau đó cộng phần
+    trạng thái chuyển từ khối trước. B được chặn để a^-B không tràn số, nên kết quả ổn định
+    với chuỗi dài (không cần một vòng lặp Python qua từng phần tử).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = len(x)
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+    if not 0.0 < a < 1.0:
+        raise ValueError("a phải nằm trong (0, 1)")
+
+    block = max(1, min(block, int(200 / -math.log(a))))
+    nb = -(-n // block)
+    X = np.zeros(nb * block, dtype=np.float64)
+    X[:n] = x
+    X = X.reshape(nb, block)
+
+    k = np.arange(block, dtype=np.float64)
+    inv_pow = a ** -k
+    pow_ = a ** k
+    local = np.cumsum(X * inv_pow, axis=1) * pow_
+
+    # trạng thái đầu mỗi khối (chỉ nb phần tử nên vòng lặp là rẻ)
+    a_block = a ** block
+    starts = np.empty(nb, dtype=np.float64)
+    s = s0
+    for b in range(nb):
+        starts[b] = s
+        s = a_block * s + local[b, -1]
+
+    out = local + starts[:, None] * (pow_ * a)
+    return out.reshape(-1)[:n]
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """TRUE_RANGE của TA-Lib: max(H-L, |H-C_trước|, |L-C_trước|); phần tử đầu là NaN."""
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    tr = high - low
+    with np.errstate(invalid='ignore'):
+        tmp = np.abs(high - prev_close)
+        tr = np.where(tmp > tr, tmp, tr)
+        tmp = np.abs(low - prev_close)
+        tr = np.where(tmp > tr, tmp, tr)
+    tr[0] = np.nan
+    return tr
+
+
+def directional_movement(high: np.ndarray, low: np.ndarray):
+    """(+DM, -DM) một phiên theo luật của TA-Lib; phần tử đầu bằng 0."""
+    diff_p = np.concatenate(([np.nan], np.diff(high)))
+    diff_m = np.concatenate(([np.nan], -np.diff(low)))
+    with np.errstate(invalid='ignore'):
+        minus = (diff_m > 0) & (diff_p < diff_m)
+        plus = ~minus & (diff_p > 0) & (diff_p > diff_m)
+    return np.where(plus, diff_p, 0.0), np.where(minus, diff_m, 0.0)
+
+
+def _adx_numpy(high: np.ndarray, low: np.ndarray, close: np.ndarray, timeperiod: int) -> np.ndarray:
+    p = timeperiod
+    n = len(close)
+    out = np.full(n, np.nan)
+
+    # bỏ các phiên NaN ở đầu chuỗi như talib
+    valid = ~(np.isnan(high) | np.isnan(low) | np.isnan(close))
+    if not valid.any():
+        return out
+    f = int(np.argmax(valid))
+    high, low, close = high[f:], low[f:], close[f:]
+    m = len(close)
+    if m < 2 * p:
+        return out
+
+    plus_dm, minus_dm = directional_movement(high, low)
+    tr = true_range(high, low, close)
+    a = 1.0 - 1.0 / p
+
+    # Giai đoạn 1: tổng (p - 1) phiên đầu, sau đó làm trơn Wilder từ phiên p
+    s_plus = linear_recursion(plus_dm[p:], a, plus_dm[1:p].sum())
+    s_minus = linear_recursion(minus_dm[p:], a, minus_dm[1:p].sum())
+    s_tr = linear_recursion(tr[p:], a, tr[1:p].sum())
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        plus_di = 100.0 * (s_plus / s_tr)
+        minus_di = 100.0 * (s_minus / s_tr)
+        di_sum = minus_di + plus_di
+        dx = 100.0 * (np.abs(minus_di - plus_di) / di_sum)
+    has_dx = ~_is_zero(s_tr) & ~_is_zero(di_sum)
+
+    # Giai đoạn 2: ADX đầu tiên = trung bình DX của p phiên (bỏ các phiên không có DX)
+    first = np.where(has_dx[:p], dx[:p], 0.0).sum() / p
+    rest_dx = dx[p:]
+    rest_has = has_dx[p:]
+
+    # Giai đoạn 3: ADX[t] = a * ADX[t-1] + DX[t] / p
+    if rest_has.all():
+        rest = linear_recursion(rest_dx / p, a, first)
+    else:
+        # hiếm gặp (TR hoặc tổng DI bằng 0): phiên đó giữ nguyên ADX như talib
+        rest = np.empty(len(rest_dx))
+        adx = first
+        for i, (v, ok) in enumerate(zip(rest_dx, rest_has)):
+            if ok:
+                adx = ((adx * (p - 1)) + v) / p
+            rest[i] = adx
+
+    out[f + 2 * p - 1] = first
+    out[f + 2 * p:] = rest
+    return out
+
+
+def adx(high, low, close, timeperiod: int = 14, backend: str = 'numpy') -> np.ndarray:
+    """
+    ADX (Wilder) cùng trình tự tính và cùng vị trí NaN với talib.ADX.
+
+    backend:
+      - 'numpy' : bản NumPy vector hóa (mặc định, không cần TA-Lib). Khác talib ở mức sai số làm tròn.
+      - 'talib' : gọi talib.ADX (báo ImportError nếu chưa cài).
+      - 'auto'  : dùng talib nếu đã cài, ngược lại dùng NumPy.
+    """
+    if backend not in ADX_BACKENDS:
+        raise ValueError(f"backend phải là một trong {ADX_BACKENDS}")
+    if timeperiod < 2:
+        raise ValueError("timeperiod phải >= 2")
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    if not (len(high) == len(low) == len(close)):
+        raise ValueError("high, low, close phải cùng độ dài")
+
+    if backend != 'numpy':
+        talib = load_talib(required=backend == 'talib')
+        if talib is not None:
+            return talib.ADX(high, low, close, timeperiod=timeperiod)
+    return _adx_numpy(high, low, close, timeperiod)
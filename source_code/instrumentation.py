@@ -0,0 +1,228 @@
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Profiler đang hoạt động trong ngữ cảnh hiện tại (None = không đo)
+_ACTIVE: contextvars.ContextVar = contextvars.ContextVar('active_profiler', default=None)
+
+# Đếm DataFrame.copy bằng cách bọc tạm thời hàm gốc khi có ít nhất một profiler đang đếm.
+# Bản vá trên class là của cả process nên được bật / tắt dưới _COPY_LOCK theo tổng số listener;
+# danh sách listener là riêng từng thread, nên profiler chỉ đếm copy của chính thread đã start nó.
+_ORIGINAL_COPY = pd.DataFrame.copy
+_COPY_LOCK = threading.Lock()
+_COPY_LOCAL = threading.local()
+_n_copy_listeners = 0
+
+
+def _thread_listeners() -> List['StageProfiler']:
+    listeners = getattr(_COPY_LOCAL, 'listeners', None)
+    if listeners is None:
+        listeners = _COPY_LOCAL.listeners = []
+    return listeners
+
+
+def _counting_copy(self, *args, **kwargs):
+    for prof in getattr(_COPY_LOCAL, 'listeners', ()):
+        prof._on_copy()
+    return _ORIGINAL_COPY(self, *args, **kwargs)
+
+
+def _add_copy_listener(prof: 'StageProfiler') -> None:
+    global _n_copy_listeners
+    with _COPY_LOCK:
+        if _n_copy_listeners == 0:
+            pd.DataFrame.copy = _counting_copy
+        _n_copy_listeners += 1
+        _thread_listeners().append(prof)
+
+
+def _remove_copy_listener(prof: 'StageProfiler') -> None:
+    global _n_copy_listeners
+    with _COPY_LOCK:
+        _thread_listeners().remove(prof)
+        _n_copy_listeners -= 1
+        if _n_copy_listeners == 0:
+            pd.DataFrame.copy = _ORIGINAL_COPY
+
+
+class _Frame:
+    __slots__ = ('name', 't0', 'mem_base', 'peak', 'copies')
+
+    def __init__(self, name: str, mem_base: int):
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.mem_base = mem_base
+        self.peak = 0
+        self.copies = 0
+
+
+class StageProfiler:
+    """
+    Ghi lại theo từng stage: thời gian (giây), bộ nhớ cấp phát đỉnh trong stage (byte, tracemalloc)
+    và số lần DataFrame.copy được gọi trong thread đã start profiler (kể cả các copy bên trong pandas).
+
+    Stage lồng nhau được đặt tên dạng 'cha.con'; số liệu của stage cha bao gồm cả các stage con.
+    Dùng qua profiling() hoặc tham số instrument=True của các pipeline.
+    """
+
+    def __init__(self, memory: bool = True, count_copies: bool = True, log: bool = False,
+                 log_level: int = logging.INFO):
+        self.memory = memory
+        self.count_copies = count_copies
+        self.log = log
+        self.log_level = log_level
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self._stack: List[_Frame] = []
+        self._started_tracemalloc = False
+        self._depth = 0
+        self.last_stage: Optional[str] = None
+
+    # ---- vòng đời ----
+    def start(self) -> None:
+        if self._depth == 0:
+            if self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            if self.count_copies:
+                _add_copy_listener(self)
+        self._depth += 1
+
+    def stop(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            if self.count_copies:
+                _remove_copy_listener(self)
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    def _on_copy(self) -> None:
+        for frame in self._stack:
+            frame.copies += 1
+
+    # ---- bộ nhớ ----
+    def _fold_peak(self) -> None:
+        """Cập nhật peak của mọi stage đang mở từ peak của tracemalloc (trước khi reset_peak)."""
+        if not (self.memory and tracemalloc.is_tracing()):
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._stack:
+            frame.peak = max(frame.peak, peak - frame.mem_base)
+
+    def _current_memory(self) -> int:
+        if self.memory and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[0]
+        return 0
+
+    # ---- stage ----
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        full = f"{self._stack[-1].name}.{name}" if self._stack else name
+        self._fold_peak()
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        frame = _Frame(full, self._current_memory())
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._fold_peak()
+            self._stack.pop()
+            seconds = time.perf_counter() - frame.t0
+            self._record(full, seconds, frame.peak if self.memory else None, frame.copies if self.count_copies else None)
+            self.last_stage = full
+
+    def _record(self, name: str, seconds: float, peak: Optional[int], copies: Optional[int]) -> None:
+        entry = self.timings.get(name)
+        if entry is None:
+            entry = self.timings[name] = {'seconds': 0.0, 'peak_bytes': peak, 'copies': copies, 'calls': 0}
+        else:
+            if peak is not None:
+                entry['peak_bytes'] = max(entry['peak_bytes'] or 0, peak)
+            if copies is not None:
+                entry['copies'] = (entry['copies'] or 0) + copies
+        entry['seconds'] += seconds
+        entry['calls'] += 1
+        if self.log:
+            logger.log(self.log_level, "%s: %.4fs, peak=%s bytes, copies=%s", name, seconds, peak, copies)
+
+    # ---- kết quả ----
+    def to_frame(self) -> pd.DataFrame:
+        """Bảng timings (mỗi dòng một stage)."""
+        return pd.DataFrame.from_dict(self.timings, orient='index').rename_axis('stage').reset_index()
+
+    def attach(self, result: Dict[str, Any], prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Thêm result['timings'] = các stage thuộc `prefix` (mặc định: stage vừa kết thúc gần nhất,
+        tức chính pipeline vừa chạy xong).
+        """
+        prefix = self.last_stage if prefix is None else prefix
+        result['timings'] = {k: dict(v) for k, v in self.timings.items()
+                             if prefix is None or k == prefix or k.startswith(prefix + '.')}
+        return result
+
+
+class _NullProfiler:
+    """Profiler rỗng khi không bật instrumentation: stage() không làm gì."""
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        yield
+
+    def attach(self, result: Dict[str, Any], prefix: Optional[str] = None) -> Dict[str, Any]:
+        return result
+
+
+_NULL = _NullProfiler()
+
+
+@contextlib.contextmanager
+def profiling(memory: bool = True, count_copies: bool = True, log: bool = False) -> Iterator[StageProfiler]:
+    """
+    Bật instrumentation cho mọi pipeline được gọi bên trong khối with:
+        with profiling(log=True) as prof:
+            analyze_calendar_effects(df, plot=False)
+        prof.to_frame()
+    """
+    prof = StageProfiler(memory=memory, count_copies=count_copies, log=log)
+    token = _ACTIVE.set(prof)
+    prof.start()
+    try:
+        yield prof
+    finally:
+        prof.stop()
+        _ACTIVE.reset(token)
+
+
+@contextlib.contextmanager
+def pipeline(name: str, instrument: bool = False, log: bool = False) -> Iterator[Any]:
+    """
+    Dùng trong các pipeline: trả về profiler đang hoạt động (profiling() bên ngoài hoặc
+    một profiler mới nếu instrument=True), ngược lại một profiler rỗng không tốn chi phí.
+    Toàn bộ pipeline được đo như stage `name`.
+    """
+    prof = _ACTIVE.get()
+    if prof is None and not instrument:
+        yield _NULL
+        return
+
+    token = None
+    if prof is None:
+        prof = StageProfiler(log=log)
+        token = _ACTIVE.set(prof)
+    prof.start()
+    try:
+        with prof.stage(name):
+            yield prof
+    finally:
+        prof.stop()
+        if token is not None:
+            _ACTIVE.reset(token)
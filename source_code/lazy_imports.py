@@ -0,0 +1,58 @@
+import importlib
+import sys
+from types import ModuleType
+from typing import Any, Callable
+
+
+class LazyModule(ModuleType):
+    """
+    Proxy cho một module chỉ được import ở lần truy cập thuộc tính đầu tiên.
+
+    Dùng cho các thư viện nặng chỉ cần khi vẽ / hiển thị (matplotlib, IPython, scipy):
+        plt = lazy_module('matplotlib.pyplot')
+    Các hàm tính toán import module chứa proxy này mà không phải khởi tạo matplotlib.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_target'] = None
+
+    def _load(self) -> ModuleType:
+        target = self.__dict__['_lazy_target']
+        if target is None:
+            target = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_target'] = target
+        return target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_lazy_target'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    """Trả về proxy của module `name`, import thật khi được dùng lần đầu."""
+    return LazyModule(name)
+
+
+def lazy_callable(module: str, attr: str) -> Callable:
+    """Hàm `module.attr` được import khi gọi lần đầu, ví dụ lazy_callable('IPython.display', 'display')."""
+    mod = lazy_module(module)
+
+    def call(*args, **kwargs):
+        return getattr(mod, attr)(*args, **kwargs)
+
+    call.__name__ = attr
+    call.__qualname__ = attr
+    call.__doc__ = f"Gọi {module}.{attr} (import khi dùng lần đầu)."
+    return call
+
+
+def is_loaded(name: str) -> bool:
+    """Module đã thực sự được import trong process hiện tại chưa."""
+    return name in sys.modules
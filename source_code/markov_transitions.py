@@ -0,0 +1,179 @@
+from collections import deque
+from typing import Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from pattern_ngrams import LETTERS, decode_pattern, encode_pattern, encode_signs, rolling_pattern_codes
+
+# Trạng thái theo thứ tự chữ số hệ 3 (D = 0, N = 1, U = 2)
+STATES = tuple(LETTERS)
+
+Transition = Union[str, Tuple[str, str]]
+
+
+def _prepare(signs, drop_neutral: bool) -> np.ndarray:
+    signs = np.asarray(signs)
+    if drop_neutral:
+        signs = signs[signs != 0]
+    return encode_signs(signs)
+
+
+def transition_codes(signs, order: int = 1, drop_neutral: bool = False) -> np.ndarray:
+    """
+    Mã của mỗi chuyển trạng thái bậc `order`: (order ngày trước, ngày hiện tại) -> một số nguyên
+    trong [0, 3^(order+1)). Phần tử i ứng với ngày đích ở vị trí i + order.
+    """
+    if order < 1:
+        raise ValueError("order phải >= 1")
+    digits = _prepare(signs, drop_neutral)
+    return rolling_pattern_codes(digits, order + 1)[order]
+
+
+def transition_counts(signs, order: int = 1, drop_neutral: bool = False) -> np.ndarray:
+    """Tensor số lần chuyển, shape (3,) * order + (3,): counts[h_1, ..., h_k, next] (chỉ số theo D/N/U)."""
+    codes = transition_codes(signs, order, drop_neutral)
+    counts = np.bincount(codes, minlength=3 ** (order + 1))
+    return counts.reshape((3,) * (order + 1))
+
+
+def transition_matrix(signs, order: int = 1, drop_neutral: bool = False, dropna: bool = True) -> pd.DataFrame:
+    """
+    Ma trận xác suất chuyển bậc `order`: index = lịch sử (chuỗi 'UD...' dài order), cột = D / N / U.
+    dropna=True bỏ các lịch sử chưa từng xuất hiện (và cột N khi drop_neutral).
+    """
+    counts = transition_counts(signs, order, drop_neutral).reshape(-1, 3)
+    totals = counts.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        probs = counts / totals
+    index = [decode_pattern(h, order) for h in range(3 ** order)]
+    out = pd.DataFrame(probs, index=pd.Index(index, name='history'), columns=pd.Index(STATES, name='next'))
+    out['n'] = totals[:, 0]
+    if dropna:
+        out = out[out['n'] > 0]
+        if drop_neutral:
+            keep = [h for h in out.index if 'N' not in h]
+            out = out.loc[keep].drop(columns='N')
+    return out
+
+
+def _parse_transition(t: Transition, order: int) -> Tuple[int, int]:
+    if isinstance(t, str):
+        hist, nxt = [p.strip() for p in t.split('->')]
+    else:
+        hist, nxt = t
+    if len(hist) != order or len(nxt) != 1:
+        raise ValueError(f"Chuyển trạng thái không hợp lệ cho order={order}: {t!r}")
+    return encode_pattern(hist), LETTERS.index(nxt)
+
+
+def rolling_transition_probs(signs,
+                             window: int = 252,
+                             order: int = 1,
+                             transitions: Optional[Iterable[Transition]] = None,
+                             drop_neutral: bool = False,
+                             min_periods: Optional[int] = None,
+                             index: Optional[Sequence] = None) -> pd.DataFrame:
+    """
+    Xác suất chuyển theo cửa sổ trượt (ví dụ 252 phiên), cập nhật mỗi ngày.
+
+    Số lần chuyển trong cửa sổ = tổng tích lũy tại t trừ tại t - window (cộng chuyển mới vào,
+    bỏ chuyển cũ ra), nên cả chuỗi chỉ tốn O(n) cho mỗi chuyển được theo dõi thay vì O(n·w).
+    Một chuyển thuộc cửa sổ nếu ngày đích nằm trong window ngày gần nhất.
+
+    transitions : danh sách như ['D->U', 'U->U'] hoặc [('DD', 'U')]; None = mọi chuyển (3^(order+1) cột).
+    index       : nhãn thời gian của chuỗi signs (ví dụ sign_series.index); kết quả dùng nhãn của ngày đích.
+    Cột 'X->Y' là P(Y | X), thêm cột 'n_X' là số lần gặp lịch sử X trong cửa sổ.
+    """
+    if window < 1:
+        raise ValueError("window phải >= 1")
+    min_periods = window if min_periods is None else min_periods
+    signs_arr = np.asarray(signs)
+    if index is None and isinstance(signs, pd.Series):
+        index = signs.index
+    if drop_neutral:
+        mask = signs_arr != 0
+        signs_arr = signs_arr[mask]
+        if index is not None:
+            index = pd.Index(index)[mask]
+
+    codes = transition_codes(signs_arr, order)
+    n = len(codes)
+    if transitions is None:
+        pairs = [(h, s) for h in range(3 ** order) for s in range(3)]
+        if drop_neutral:
+            pairs = [(h, s) for h, s in pairs if s != 1 and 'N' not in decode_pattern(h, order)]
+    else:
+        pairs = [_parse_transition(t, order) for t in transitions]
+
+    def windowed(mask: np.ndarray) -> np.ndarray:
+        c = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(mask, out=c[1:])
+        hi = np.arange(1, n + 1)
+        lo = np.maximum(hi - window, 0)
+        return c[hi] - c[lo]
+
+    hist_codes = codes // 3
+    filled = np.minimum(np.arange(1, n + 1), window)
+    data = {}
+    hist_cache = {}
+    for h, s in pairs:
+        if h not in hist_cache:
+            hist_cache[h] = windowed(hist_codes == h)
+        n_hist = hist_cache[h]
+        n_trans = windowed(codes == h * 3 + s)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            p = np.where(n_hist > 0, n_trans / np.maximum(n_hist, 1), np.nan)
+        p[filled < min_periods] = np.nan
+        data[f"{decode_pattern(h, order)}->{LETTERS[s]}"] = p
+    for h, n_hist in hist_cache.items():
+        data[f"n_{decode_pattern(h, order)}"] = n_hist
+
+    out_index = pd.Index(index)[order:] if index is not None else pd.RangeIndex(order, order + n)
+    return pd.DataFrame(data, index=out_index)
+
+
+class RollingTransitionCounter:
+    """
+    Bộ đếm chuyển trạng thái bậc `order` trên cửa sổ `window` cho dữ liệu nạp từng ngày:
+    mỗi update cộng chuyển mới và bỏ chuyển rơi khỏi cửa sổ, O(1).
+    """
+
+    def __init__(self, order: int = 1, window: int = 252):
+        if order < 1 or window < 1:
+            raise ValueError("order và window phải >= 1")
+        self.order = order
+        self.window = window
+        self.counts = np.zeros(3 ** (order + 1), dtype=np.int64)
+        self._history: deque = deque(maxlen=order)
+        self._codes: deque = deque()
+
+    def update(self, sign: int) -> None:
+        d = int(sign) + 1
+        if not 0 <= d <= 2:
+            raise ValueError("sign chỉ được là -1, 0, 1")
+        if len(self._history) == self.order:
+            code = 0
+            for h in self._history:
+                code = code * 3 + h
+            code = code * 3 + d
+            self.counts[code] += 1
+            self._codes.append(code)
+            if len(self._codes) > self.window:
+                self.counts[self._codes.popleft()] -= 1
+        self._history.append(d)
+
+    def probability(self, transition: Transition) -> float:
+        """P(next | history) trong cửa sổ hiện tại, ví dụ probability('D->U')."""
+        h, s = _parse_transition(transition, self.order)
+        row = self.counts[h * 3:(h + 1) * 3]
+        total = row.sum()
+        return row[s] / total if total > 0 else float('nan')
+
+    def matrix(self) -> pd.DataFrame:
+        counts = self.counts.reshape(-1, 3)
+        totals = counts.sum(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            probs = counts / totals
+        index = [decode_pattern(h, self.order) for h in range(3 ** self.order)]
+        return pd.DataFrame(probs, index=pd.Index(index, name='history'), columns=pd.Index(STATES, name='next'))
@@ -0,0 +1,186 @@
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import pipeline
+from lazy_imports import lazy_module
+from trading_strategy_season import INITIAL_CAPITAL, compute_basic_metrics
+
+# matplotlib chỉ được import khi gọi hàm vẽ
+plt = lazy_module('matplotlib.pyplot')
+
+METHODS = ('bootstrap', 'block', 'shuffle')
+SAMPLE_COLUMNS = ['Total return (%)', 'CAGR (%)', 'Max drawdown (%)']
+# Giới hạn bộ nhớ cho các ma trận (số path × số lệnh) của mỗi chunk
+MAX_CHUNK_BYTES = 64 << 20
+# Giới hạn bộ nhớ cho tập path giữ lại để tính dải percentile equity
+MAX_BAND_BYTES = 64 << 20
+
+
+def trade_growth_factors(trades_df: pd.DataFrame, initial_capital: float = INITIAL_CAPITAL) -> np.ndarray:
+    """
+    Hệ số tăng vốn của từng lệnh: capital_after[k] / capital_after[k-1] (lệnh đầu so với initial_capital).
+    Lấy từ chuỗi vốn thật nên đã gồm phần tiền lẻ bị bỏ khi làm tròn số cổ phiếu;
+    cumprod theo đúng thứ tự cho lại equity của compute_basic_metrics.
+    """
+    if 'capital_after' not in trades_df.columns:
+        raise KeyError("trades_df phải có cột capital_after")
+    equity = np.concatenate(([float(initial_capital)], trades_df['capital_after'].to_numpy(dtype=np.float64)))
+    return equity[1:] / equity[:-1]
+
+
+def resample_indices(rng: np.random.Generator, n_paths: int, n_trades: int,
+                     method: str = 'bootstrap', block_size: int = 5) -> np.ndarray:
+    """
+    Ma trận chỉ số lệnh (n_paths × n_trades) cho mỗi path:
+      - bootstrap : rút có hoàn lại từng lệnh
+      - block     : circular block bootstrap, nối các block block_size lệnh liên tiếp (giữ chuỗi thắng / thua)
+      - shuffle   : hoán vị thứ tự lệnh (tổng return không đổi, chỉ drawdown thay đổi)
+    """
+    if method == 'bootstrap':
+        return rng.integers(0, n_trades, size=(n_paths, n_trades))
+    if method == 'block':
+        L = max(1, min(int(block_size), n_trades))
+        starts = rng.integers(0, n_trades, size=(n_paths, -(-n_trades // L)))
+        return ((starts[:, :, None] + np.arange(L)).reshape(n_paths, -1)[:, :n_trades]) % n_trades
+    if method == 'shuffle':
+        return rng.permuted(np.broadcast_to(np.arange(n_trades), (n_paths, n_trades)), axis=1)
+    raise ValueError(f"method không hợp lệ: {method} (chỉ hỗ trợ {', '.join(METHODS)})")
+
+
+def simulate_paths(factors: np.ndarray, idx: np.ndarray, initial_capital: float = INITIAL_CAPITAL) -> np.ndarray:
+    """Equity sau từng lệnh của mọi path: initial_capital * cumprod(factors[idx], axis=1)."""
+    return initial_capital * np.cumprod(factors[idx], axis=1)
+
+
+def max_drawdowns(paths: np.ndarray, initial_capital: float = INITIAL_CAPITAL) -> np.ndarray:
+    """Max drawdown (số âm) của mỗi path, tính cả mức vốn ban đầu như compute_basic_metrics."""
+    running_max = np.maximum(np.maximum.accumulate(paths, axis=1), initial_capital)
+    return (paths / running_max - 1).min(axis=1).clip(max=0.0)
+
+
+def monte_carlo_trades(trades_df: pd.DataFrame,
+                       initial_capital: float = INITIAL_CAPITAL,
+                       n_sims: int = 10000,
+                       method: str = 'bootstrap',
+                       block_size: int = 5,
+                       percentiles: Sequence[float] = (5, 25, 50, 75, 95),
+                       seed: Optional[int] = None,
+                       chunk_size: Optional[int] = None,
+                       keep_bands: bool = True,
+                       band_paths: Optional[int] = None,
+                       instrument: bool = False) -> Dict[str, Any]:
+    """
+    Monte Carlo trên chuỗi lệnh của run_strategy: mỗi path là một cách rút lại hệ số tăng vốn của các lệnh
+    (resample_indices), equity = cumprod theo trục lệnh, drawdown = maximum.accumulate theo cùng trục.
+    Các path được tính theo chunk (không vượt MAX_CHUNK_BYTES nếu chunk_size=None), mỗi chunk một seed con.
+
+    CAGR dùng cùng khoảng thời gian với chuỗi lệnh gốc (entry đầu tiên -> exit cuối cùng) như compute_basic_metrics.
+    Trả về:
+      - 'samples'  : phân phối Total return (%), CAGR (%), Max drawdown (%) (mỗi dòng một path)
+      - 'summary'  : mỗi dòng một chỉ số: observed (compute_basic_metrics), mean, std, các percentile p5, p25, ...
+      - 'bands'    : percentile của equity sau từng lệnh (dòng 0 = vốn ban đầu), nếu keep_bands.
+                     Chỉ ước lượng trên tối đa band_paths path đầu tiên (các path độc lập cùng phân phối nên
+                     đây là một mẫu ngẫu nhiên); band_paths=None giới hạn theo MAX_BAND_BYTES, nên bộ nhớ
+                     không tăng theo n_sims.
+      - 'observed' : compute_basic_metrics của chuỗi lệnh gốc
+    """
+    if method not in METHODS:
+        raise ValueError(f"method không hợp lệ: {method} (chỉ hỗ trợ {', '.join(METHODS)})")
+    if n_sims < 1:
+        raise ValueError("n_sims phải >= 1")
+    if trades_df.empty:
+        raise ValueError("Không có lệnh để mô phỏng")
+    percentiles = [float(q) for q in percentiles]
+
+    with pipeline('monte_carlo_trades', instrument) as prof:
+        with prof.stage('prepare'):
+            factors = trade_growth_factors(trades_df, initial_capital)
+            n = len(factors)
+            observed = compute_basic_metrics(trades_df, initial_capital=initial_capital)
+            num_years = (trades_df['exit_date'].iloc[-1] - trades_df['entry_date'].iloc[0]).days / 365.25
+            if chunk_size is None:
+                # chỉ số int64 + hệ số + equity + running max
+                chunk_size = max(1, MAX_CHUNK_BYTES // (n * 8 * 4))
+            if band_paths is None:
+                band_paths = max(1, MAX_BAND_BYTES // (n * 8))
+            n_band = min(int(band_paths), n_sims) if keep_bands else 0
+
+        with prof.stage('simulate'):
+            final = np.empty(n_sims)
+            worst = np.empty(n_sims)
+            kept = np.empty((n_band, n)) if n_band else None
+            sizes = [min(chunk_size, n_sims - lo) for lo in range(0, n_sims, chunk_size)]
+            lo = 0
+            for size, child in zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))):
+                rng = np.random.default_rng(child)
+                paths = simulate_paths(factors, resample_indices(rng, size, n, method, block_size), initial_capital)
+                final[lo:lo + size] = paths[:, -1]
+                worst[lo:lo + size] = max_drawdowns(paths, initial_capital)
+                if lo < n_band:
+                    take = min(size, n_band - lo)
+                    kept[lo:lo + take] = paths[:take]
+                lo += size
+
+        with prof.stage('summary'):
+            growth = final / initial_capital
+            with np.errstate(invalid='ignore'):
+                cagr = growth ** (1 / num_years) - 1 if num_years > 0 else np.full(n_sims, np.nan)
+            samples = pd.DataFrame({
+                'Total return (%)': (growth - 1) * 100,
+                'CAGR (%)': cagr * 100,
+                'Max drawdown (%)': worst * 100,
+            })
+            names = [f'p{q:g}' for q in percentiles]
+            rows = []
+            for col in SAMPLE_COLUMNS:
+                values = samples[col].to_numpy()
+                row = {'metric': col,
+                       'observed': observed[col] if observed is not None else np.nan,
+                       'mean': np.nanmean(values),
+                       'std': np.nanstd(values, ddof=1) if n_sims > 1 else np.nan}
+                row.update(zip(names, np.nanpercentile(values, percentiles)))
+                rows.append(row)
+            summary = pd.DataFrame(rows).set_index('metric')
+
+            bands = None
+            if n_band:
+                q = np.percentile(kept, percentiles, axis=0)
+                bands = pd.DataFrame(np.column_stack([np.full(len(percentiles), float(initial_capital)), q]).T,
+                                     columns=names).rename_axis('trade')
+
+    return prof.attach({
+        'samples': samples,
+        'summary': summary,
+        'bands': bands,
+        'observed': observed,
+    })
+
+
+def plot_monte_carlo_bands(result: Dict[str, Any], trades_df: Optional[pd.DataFrame] = None,
+                           initial_capital: float = INITIAL_CAPITAL, title: str = "Monte Carlo Equity Bands"):
+    """Vẽ dải percentile của equity theo số lệnh (kèm equity gốc nếu truyền trades_df)."""
+    bands = result.get('bands')
+    if bands is None or bands.empty:
+        return
+    cols = list(bands.columns)
+    x = bands.index.to_numpy()
+
+    plt.figure(figsize=(12, 5))
+    # tô các cặp percentile đối xứng từ ngoài vào trong
+    for k in range(len(cols) // 2):
+        plt.fill_between(x, bands[cols[k]], bands[cols[-1 - k]], alpha=0.15 + 0.1 * k, color='tab:blue',
+                         label=f"{cols[k]}–{cols[-1 - k]}")
+    if len(cols) % 2:
+        plt.plot(x, bands[cols[len(cols) // 2]], color='tab:blue', linewidth=1.5, label=cols[len(cols) // 2])
+    if trades_df is not None and not trades_df.empty:
+        equity = [initial_capital] + trades_df['capital_after'].tolist()
+        plt.plot(np.arange(len(equity)), equity, color='black', linewidth=1.2, label='Observed')
+    plt.title(title)
+    plt.xlabel("Trade #")
+    plt.ylabel("Equity")
+    plt.grid(True, alpha=0.3)
+    plt.legend()
+    plt.tight_layout()
+    plt.show()
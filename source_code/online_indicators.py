@@ -0,0 +1,299 @@
+import math
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class OnlineReturn:
+    """Return từng ngày = price / price_trước - 1 (giống pct_change), O(1) mỗi lần cập nhật."""
+
+    def __init__(self):
+        self.prev = math.nan
+
+    def update(self, price: float) -> float:
+        r = price / self.prev - 1 if not (math.isnan(self.prev) or math.isnan(price)) else math.nan
+        self.prev = price
+        return r
+
+
+class OnlineSMA:
+    """
+    SMA cửa sổ cố định, O(1) mỗi lần cập nhật.
+
+    Cộng/trừ theo đúng thuật toán roll_mean của pandas (Kahan summation với bù trừ riêng cho
+    phần cộng và phần trừ, xử lý NaN, chuỗi giá trị trùng nhau và dấu), nên cho kết quả trùng
+    khớp với Series.rolling(window).mean().
+    """
+
+    def __init__(self, window: int = 50):
+        if window < 1:
+            raise ValueError("window phải >= 1")
+        self.window = window
+        self.buffer = deque()
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.n_same = 0
+        self.prev_value = math.nan
+
+    def _add(self, val: float) -> None:
+        if val == val:
+            self.nobs += 1
+            y = val - self.comp_add
+            t = self.sum_x + y
+            self.comp_add = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct += 1
+            if val == self.prev_value:
+                self.n_same += 1
+            else:
+                self.n_same = 1
+            self.prev_value = val
+
+    def _remove(self, val: float) -> None:
+        if val == val:
+            self.nobs -= 1
+            y = -val - self.comp_remove
+            t = self.sum_x + y
+            self.comp_remove = t - self.sum_x - y
+            self.sum_x = t
+            if math.copysign(1.0, val) < 0:
+                self.neg_ct -= 1
+
+    def _reset(self, first: float) -> None:
+        self.nobs = self.neg_ct = 0
+        self.sum_x = self.comp_add = self.comp_remove = 0.0
+        self.n_same = 0
+        self.prev_value = first
+
+    def update(self, price: float) -> float:
+        price = float(price)
+        if not self.buffer or self.window == 1:
+            # cửa sổ đầu tiên (hoặc window=1): pandas khởi tạo lại trạng thái
+            self.buffer.clear()
+            self._reset(price)
+        elif len(self.buffer) == self.window:
+            self._remove(self.buffer.popleft())
+        self.buffer.append(price)
+        self._add(price)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.nobs >= self.window and self.nobs > 0:
+            result = self.sum_x / self.nobs
+            if self.n_same >= self.nobs:
+                result = self.prev_value
+            elif self.neg_ct == 0 and result < 0:
+                result = 0.0
+            elif self.neg_ct == self.nobs and result > 0:
+                result = 0.0
+            return result
+        return math.nan
+
+
+def _is_zero(v: float) -> bool:
+    return -1e-8 < v < 1e-8
+
+
+class OnlineADX:
+    """
+    ADX / +DI / -DI theo Wilder, O(1) mỗi lần cập nhật, cùng trình tự tính với talib.ADX:
+    (period - 1) phiên cộng dồn DM/TR, period phiên tiếp theo cộng dồn DX, sau đó làm trơn.
+    Giá trị ADX đầu tiên xuất hiện ở phiên thứ 2 * period (chỉ số 2 * period - 1).
+    """
+
+    def __init__(self, period: int = 14):
+        if period < 2:
+            raise ValueError("period phải >= 2")
+        self.period = period
+        self.n = 0
+        self.prev_high = self.prev_low = self.prev_close = math.nan
+        self.plus_dm = self.minus_dm = self.tr = 0.0
+        self.sum_dx = 0.0
+        self.adx = math.nan
+        self.plus_di = self.minus_di = math.nan
+
+    def update(self, high: float, low: float, close: float) -> float:
+        p = self.period
+        if self.n == 0:
+            if math.isnan(high) or math.isnan(low) or math.isnan(close):
+                return math.nan  # talib bỏ qua các NaN ở đầu chuỗi
+            self.prev_high, self.prev_low, self.prev_close = high, low, close
+            self.n = 1
+            return math.nan
+
+        i = self.n
+        self.n += 1
+        diff_p = high - self.prev_high
+        diff_m = self.prev_low - low
+        self.prev_high, self.prev_low = high, low
+
+        tr = high - low
+        tmp = abs(high - self.prev_close)
+        if tmp > tr:
+            tr = tmp
+        tmp = abs(low - self.prev_close)
+        if tmp > tr:
+            tr = tmp
+        self.prev_close = close
+
+        if i < p:
+            # Giai đoạn 1: cộng dồn DM, TR
+            if diff_m > 0 and diff_p < diff_m:
+                self.minus_dm += diff_m
+            elif diff_p > 0 and diff_p > diff_m:
+                self.plus_dm += diff_p
+            self.tr += tr
+            return math.nan
+
+        self.minus_dm -= self.minus_dm / p
+        self.plus_dm -= self.plus_dm / p
+        if diff_m > 0 and diff_p < diff_m:
+            self.minus_dm += diff_m
+        elif diff_p > 0 and diff_p > diff_m:
+            self.plus_dm += diff_p
+        self.tr = self.tr - self.tr / p + tr
+
+        dx = None
+        if not _is_zero(self.tr):
+            self.minus_di = 100.0 * (self.minus_dm / self.tr)
+            self.plus_di = 100.0 * (self.plus_dm / self.tr)
+            di_sum = self.minus_di + self.plus_di
+            if not _is_zero(di_sum):
+                dx = 100.0 * (abs(self.minus_di - self.plus_di) / di_sum)
+
+        if i < 2 * p:
+            # Giai đoạn 2: cộng dồn DX, ADX đầu tiên = trung bình DX
+            if dx is not None:
+                self.sum_dx += dx
+            if i == 2 * p - 1:
+                self.adx = self.sum_dx / p
+                return self.adx
+            return math.nan
+
+        # Giai đoạn 3: làm trơn Wilder
+        if dx is not None:
+            self.adx = ((self.adx * (p - 1)) + dx) / p
+        return self.adx
+
+
+class OnlineAutocorr:
+    """
+    Autocorrelation lag-1 chạy dồn trên toàn bộ lịch sử (giống Series.autocorr(lag=1)).
+    Dùng cập nhật đồng phương sai kiểu Welford (ổn định số học), O(1) mỗi lần cập nhật;
+    khác bản pandas chỉ ở mức sai số làm tròn.
+    """
+
+    def __init__(self):
+        self.prev = math.nan
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.m2_x = self.m2_y = self.c_xy = 0.0
+
+    def update(self, value: float) -> float:
+        x, y = self.prev, value
+        self.prev = value
+        if not (math.isnan(x) or math.isnan(y)):
+            self.n += 1
+            dx = x - self.mean_x
+            self.mean_x += dx / self.n
+            dy = y - self.mean_y
+            self.mean_y += dy / self.n
+            self.c_xy += dx * (y - self.mean_y)
+            self.m2_x += dx * (x - self.mean_x)
+            self.m2_y += dy * (y - self.mean_y)
+        return self.value
+
+    @property
+    def value(self) -> float:
+        if self.n < 2:
+            return math.nan
+        denom = math.sqrt(self.m2_x * self.m2_y)
+        return self.c_xy / denom if denom > 0 else math.nan
+
+
+class OnlineSMACross:
+    """
+    Phát hiện giá cắt SMA (giống get_sma_crosses_df / check_cross_per_year):
+    so sánh với phiên hợp lệ (giá và SMA không NaN) liền trước.
+    """
+
+    def __init__(self):
+        self.prev_price = math.nan
+        self.prev_sma = math.nan
+        self.n_days = 0
+        self.n_crosses = 0
+
+    def update(self, price: float, sma: float) -> Optional[str]:
+        if math.isnan(price) or math.isnan(sma):
+            return None
+        cross = None
+        if self.prev_price < self.prev_sma and price > sma:
+            cross = 'up'
+        elif self.prev_price > self.prev_sma and price < sma:
+            cross = 'down'
+        self.prev_price, self.prev_sma = price, sma
+        self.n_days += 1
+        if cross is not None:
+            self.n_crosses += 1
+        return cross
+
+    @property
+    def crosses_per_year(self) -> float:
+        return self.n_crosses / self.n_days * 252 if self.n_days > 0 else math.nan
+
+
+class OnlineIndicatorEngine:
+    """
+    Gom Return, SMA, ADX, autocorrelation và SMA-cross cho dữ liệu nạp từng phiên.
+    Seed bằng from_history(df) rồi gọi update(...) cho mỗi phiên mới; giá trị khớp với
+    compute_indicators / check_autocorrelation / get_sma_crosses_df trên toàn bộ lịch sử.
+    """
+
+    def __init__(self, sma_window: int = 50, adx_period: int = 14):
+        self.sma_col = f'SMA{sma_window}'
+        self.ret = OnlineReturn()
+        self.sma = OnlineSMA(sma_window)
+        self.adx = OnlineADX(adx_period)
+        self.autocorr = OnlineAutocorr()
+        self.cross = OnlineSMACross()
+        self.crosses: List[Dict[str, Any]] = []
+
+    def update(self, high: float, low: float, close: float, date=None) -> Dict[str, Any]:
+        high, low, close = float(high), float(low), float(close)
+        r = self.ret.update(close)
+        sma = self.sma.update(close)
+        adx = self.adx.update(high, low, close)
+        ac = self.autocorr.update(r)
+        cross = self.cross.update(close, sma)
+        if cross is not None:
+            self.crosses.append({'date': date, 'type': cross, 'price': close, 'sma': sma})
+        return {
+            'Return': r,
+            self.sma_col: sma,
+            'ADX': adx,
+            'autocorr': ac,
+            'cross': cross,
+        }
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, sma_window: int = 50, adx_period: int = 14) -> 'OnlineIndicatorEngine':
+        """Seed trạng thái bằng cách chạy qua toàn bộ lịch sử (một lần, O(n))."""
+        engine = cls(sma_window=sma_window, adx_period=adx_period)
+        dates = df['Date'] if 'Date' in df.columns else pd.Series(df.index, index=df.index)
+        for d, h, l, c in zip(dates.to_numpy(), df['High'].to_numpy(dtype=np.float64),
+                              df['Low'].to_numpy(dtype=np.float64), df['Close'].to_numpy(dtype=np.float64)):
+            engine.update(h, l, c, date=d)
+        return engine
+
+    def crosses_df(self) -> pd.DataFrame:
+        """Các lần cắt SMA dạng DataFrame (date, type, price, sma), giống get_sma_crosses_df."""
+        if not self.crosses:
+            return pd.DataFrame(columns=['date', 'type', 'price', 'sma'])
+        return pd.DataFrame(self.crosses)
@@ -0,0 +1,206 @@
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from first_passage import FirstPassageIndex
+from trading_calendar import TradingCalendar
+from trading_strategy_season import (
+    INITIAL_CAPITAL,
+    PERIODS,
+    STOP_LOSS,
+    TAKE_PROFIT,
+    compute_basic_metrics,
+    ensure_datetime_index,
+    prepare_price_arrays,
+    run_strategy_arrays,
+)
+
+# Tham số của một tổ hợp: (stop_loss, take_profit, periods)
+Combo = Tuple[float, float, Tuple[Tuple[int, int], ...]]
+
+# Trạng thái của mỗi worker (mảng giá gắn vào shared memory + calendar dựng một lần)
+_WORKER: Dict[str, Any] = {}
+
+
+class _SweepContext:
+    """Mảng giá đã chuẩn bị + TradingCalendar + FirstPassageIndex, dùng lại cho mọi tổ hợp tham số."""
+
+    def __init__(self, dates: np.ndarray, opens: np.ndarray, closes: np.ndarray):
+        self.index = pd.DatetimeIndex(dates)
+        self.calendar = TradingCalendar(self.index)
+        self.passage = FirstPassageIndex(closes)
+        self.opens = opens
+        self.closes = closes
+
+    def run(self, combo: Combo, initial_capital: float,
+            trade_years: Optional[Sequence[int]] = None) -> pd.DataFrame:
+        """Trades của một tổ hợp (chỉ vào lệnh trong trade_years nếu truyền)."""
+        stop_loss, take_profit, periods = combo
+        return run_strategy_arrays(self.calendar, self.opens, self.closes,
+                                   initial_capital=initial_capital,
+                                   stop_loss=stop_loss,
+                                   take_profit=take_profit,
+                                   periods=periods,
+                                   passage=self.passage,
+                                   trade_years=trade_years)
+
+    def evaluate(self, combo: Combo, initial_capital: float,
+                 trade_years: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """Chạy kernel cho một tổ hợp và trả về dòng kết quả (tham số + compute_basic_metrics)."""
+        stop_loss, take_profit, periods = combo
+        trades_df = self.run(combo, initial_capital, trade_years)
+        metrics = compute_basic_metrics(trades_df, initial_capital=initial_capital)
+
+        row = {"stop_loss": stop_loss, "take_profit": take_profit, "periods": periods}
+        if metrics is None:
+            row["Number of trades"] = 0
+        else:
+            row.update(metrics)
+        return row
+
+
+# ---------------------------------------------------------
+# Shared memory: parent tạo, worker gắn vào theo tên
+# ---------------------------------------------------------
+def _to_shared(arr: np.ndarray) -> Tuple[shared_memory.SharedMemory, Tuple[str, Tuple[int, ...], str]]:
+    """Copy mảng vào một block shared memory, trả về (shm, spec để worker gắn lại)."""
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+def _attach(spec: Tuple[str, Tuple[int, ...], str]) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _init_worker(dates_spec, opens_spec, closes_spec, initial_capital):
+    """Initializer của process pool: gắn mảng giá, dựng calendar và first-passage index một lần cho mỗi worker."""
+    handles = []
+    arrays = []
+    for spec in (dates_spec, opens_spec, closes_spec):
+        shm, arr = _attach(spec)
+        handles.append(shm)
+        arrays.append(arr)
+    _WORKER["shm"] = handles  # giữ tham chiếu để buffer không bị giải phóng
+    _WORKER["ctx"] = _SweepContext(*arrays)
+    _WORKER["initial_capital"] = initial_capital
+
+
+def _evaluate_chunk(tasks: List[Tuple[Combo, Optional[Tuple[int, ...]]]]) -> List[Dict[str, Any]]:
+    ctx = _WORKER["ctx"]
+    initial_capital = _WORKER["initial_capital"]
+    return [ctx.evaluate(combo, initial_capital, trade_years) for combo, trade_years in tasks]
+
+
+def _normalize_periods(periods: Iterable[Tuple[int, int]]) -> Tuple[Tuple[int, int], ...]:
+    return tuple((int(start_m), int(end_m)) for start_m, end_m in periods)
+
+
+def build_param_grid(stop_losses: Sequence[float] = (STOP_LOSS,),
+                     take_profits: Sequence[float] = (TAKE_PROFIT,),
+                     periods_list: Sequence[Iterable[Tuple[int, int]]] = (PERIODS,)) -> List[Combo]:
+    """Tích Descartes stop_loss × take_profit × periods."""
+    periods_list = [_normalize_periods(p) for p in periods_list]
+    return [(float(sl), float(tp), p) for sl, tp, p in itertools.product(stop_losses, take_profits, periods_list)]
+
+
+def sweep_price_arrays(dates: np.ndarray,
+                       opens: np.ndarray,
+                       closes: np.ndarray,
+                       combos: List[Combo],
+                       initial_capital: float = INITIAL_CAPITAL,
+                       n_jobs: Optional[int] = None,
+                       chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Đánh giá danh sách tổ hợp trên mảng giá đã chuẩn bị.
+    n_jobs=1 chạy tuần tự trong process hiện tại; ngược lại mảng giá được đặt vào shared
+    memory và các tổ hợp được chia thành chunk cho process pool.
+    """
+    tasks = [(combo, None) for combo in combos]
+    return sweep_tasks(dates, opens, closes, tasks, initial_capital=initial_capital,
+                       n_jobs=n_jobs, chunk_size=chunk_size)
+
+
+def sweep_tasks(dates: np.ndarray,
+                opens: np.ndarray,
+                closes: np.ndarray,
+                tasks: List[Tuple[Combo, Optional[Tuple[int, ...]]]],
+                initial_capital: float = INITIAL_CAPITAL,
+                n_jobs: Optional[int] = None,
+                chunk_size: Optional[int] = None,
+                context: Optional[_SweepContext] = None) -> List[Dict[str, Any]]:
+    """
+    Như sweep_price_arrays cho danh sách phẳng (tổ hợp, các năm được vào lệnh hoặc None = mọi năm),
+    ví dụ mọi (fold, tổ hợp) của walk-forward: cùng một pool / shared memory cho mọi task.
+    Kết quả theo đúng thứ tự tasks. context: _SweepContext dựng sẵn cho cùng mảng giá (chạy tuần tự).
+    """
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = max(1, min(int(n_jobs), len(tasks)))
+
+    if n_jobs == 1:
+        ctx = context if context is not None else _SweepContext(dates, opens, closes)
+        return [ctx.evaluate(combo, initial_capital, trade_years) for combo, trade_years in tasks]
+
+    if chunk_size is None:
+        # ~4 chunk / worker để cân bằng tải mà không tốn nhiều chi phí IPC
+        chunk_size = max(1, math.ceil(len(tasks) / (n_jobs * 4)))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+
+    blocks = []
+    try:
+        specs = []
+        for arr in (np.ascontiguousarray(dates), opens, closes):
+            shm, spec = _to_shared(arr)
+            blocks.append(shm)
+            specs.append(spec)
+
+        with ProcessPoolExecutor(max_workers=n_jobs,
+                                 initializer=_init_worker,
+                                 initargs=(*specs, initial_capital)) as pool:
+            rows = []
+            for chunk_rows in pool.map(_evaluate_chunk, chunks):
+                rows.extend(chunk_rows)
+        return rows
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+# Quét tham số
+def run_parameter_sweep(df: pd.DataFrame,
+                        stop_losses: Sequence[float] = (STOP_LOSS,),
+                        take_profits: Sequence[float] = (TAKE_PROFIT,),
+                        periods_list: Sequence[Iterable[Tuple[int, int]]] = (PERIODS,),
+                        initial_capital: float = INITIAL_CAPITAL,
+                        n_jobs: Optional[int] = None,
+                        chunk_size: Optional[int] = None) -> pd.DataFrame:
+    """
+    Quét lưới tham số stop_loss × take_profit × periods cho chiến lược theo mùa.
+
+    df chỉ được chuẩn hóa (ensure_datetime_index) và trích mảng giá MỘT lần; mỗi tổ hợp
+    chạy kernel NumPy của run_strategy. Trả về bảng tidy: mỗi dòng một tổ hợp với các cột
+    stop_loss, take_profit, periods và các chỉ số của compute_basic_metrics.
+    """
+    df = ensure_datetime_index(df)
+    dates, opens, closes = prepare_price_arrays(df)
+
+    combos = build_param_grid(stop_losses, take_profits, periods_list)
+    if not combos:
+        return pd.DataFrame(columns=["stop_loss", "take_profit", "periods"])
+
+    rows = sweep_price_arrays(dates, opens, closes, combos,
+                              initial_capital=initial_capital,
+                              n_jobs=n_jobs,
+                              chunk_size=chunk_size)
+    return pd.DataFrame(rows)
@@ -0,0 +1,181 @@
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Mã hóa trạng thái thành chữ số hệ 3: D (-1) -> 0, N (0) -> 1, U (1) -> 2
+LETTERS = 'DNU'
+# Với độ dài có 3^L lớn hơn ngưỡng này thì đếm bằng np.unique thay vì bincount (mảng dày)
+DENSE_MAX_CODES = 3 ** 13
+
+Signs = Union[np.ndarray, Sequence[int]]
+
+
+def encode_signs(signs: Signs) -> np.ndarray:
+    """Dấu (-1 / 0 / 1) -> chữ số hệ 3 (0 / 1 / 2), dạng int8."""
+    signs = np.asarray(signs)
+    if signs.size and (np.abs(signs) > 1).any():
+        raise ValueError("signs chỉ được chứa -1, 0, 1")
+    return (signs + 1).astype(np.int8)
+
+
+def decode_pattern(code: int, length: int) -> str:
+    """Mã pattern -> chuỗi 'UDN...' (chữ số cao nhất = ngày xa nhất)."""
+    chars = []
+    for _ in range(length):
+        code, d = divmod(int(code), 3)
+        chars.append(LETTERS[d])
+    return ''.join(reversed(chars))
+
+
+def encode_pattern(pattern: str) -> int:
+    """Chuỗi 'UDN...' -> mã pattern."""
+    code = 0
+    for ch in pattern:
+        code = code * 3 + LETTERS.index(ch)
+    return code
+
+
+def rolling_pattern_codes(digits: np.ndarray, max_length: int) -> List[np.ndarray]:
+    """
+    Mã của mọi cửa sổ cho từng độ dài 1..max_length, tính dồn:
+        code_L[t] = code_{L-1}[t-1] * 3 + digit[t]
+    Phần tử i của mảng độ dài L là pattern kết thúc tại vị trí i + L - 1.
+    """
+    digits = np.asarray(digits, dtype=np.int64)
+    codes = [digits]
+    for L in range(2, max_length + 1):
+        prev = codes[-1]
+        if len(prev) <= 1:
+            codes.append(np.empty(0, dtype=np.int64))
+            continue
+        codes.append(prev[:-1] * 3 + digits[L - 1:])
+    return codes
+
+
+def _as_sequences(signs) -> List[np.ndarray]:
+    """Một chuỗi dấu hoặc danh sách nhiều chuỗi (nhiều mã): pattern không nối qua ranh giới giữa các mã."""
+    if isinstance(signs, (np.ndarray, pd.Series)) or (len(signs) and np.isscalar(signs[0])):
+        return [np.asarray(signs)]
+    return [np.asarray(s) for s in signs]
+
+
+def _first_occurrences(codes: np.ndarray, n_distinct: int, first: Dict[int, Tuple[int, int]], seq_id: int) -> None:
+    """
+    Vị trí xuất hiện đầu tiên của từng mã: quét tiền tố với kích thước khối tăng gấp đôi và dừng khi
+    đã gặp đủ n_distinct mã (thường chỉ vài khối đầu), thay vì sắp xếp toàn bộ chuỗi.
+    """
+    found = 0
+    pos, chunk = 0, 4096
+    seen = set()
+    while found < n_distinct and pos < len(codes):
+        block = codes[pos:pos + chunk]
+        uniq, idx = np.unique(block, return_index=True)
+        for c, i in zip(uniq.tolist(), idx.tolist()):
+            if c not in seen:
+                seen.add(c)
+                found += 1
+                if c not in first:
+                    first[c] = (seq_id, pos + i)
+        pos += chunk
+        chunk *= 2
+
+
+def count_patterns(signs, max_length: int = 8) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Đếm mọi pattern độ dài 1..max_length (và số lần xuất hiện kèm ngày kế tiếp).
+
+    Trả về {L: {'codes', 'counts', 'first', 'next_counts'}} chỉ với các pattern có xuất hiện:
+      - first       : (mã thứ mấy, vị trí bắt đầu) của lần xuất hiện đầu tiên, dùng để xếp các pattern
+                      cùng số lần như Counter.most_common.
+      - next_counts : ma trận (số pattern, 3) số lần ngày kế tiếp là D / N / U.
+    """
+    if max_length < 1:
+        raise ValueError("max_length phải >= 1")
+    seqs = [encode_signs(s) for s in _as_sequences(signs)]
+
+    out: Dict[int, Dict[str, np.ndarray]] = {}
+    dense = {L: 3 ** L <= DENSE_MAX_CODES for L in range(1, max_length + 2)}
+    acc = {L: (np.zeros(3 ** L, dtype=np.int64) if dense[L] else {}) for L in range(1, max_length + 2)}
+    first_acc: Dict[int, Dict[int, Tuple[int, int]]] = {L: {} for L in range(1, max_length + 2)}
+
+    for seq_id, digits in enumerate(seqs):
+        codes_by_len = rolling_pattern_codes(digits, max_length + 1)
+        for L, codes in enumerate(codes_by_len, start=1):
+            if len(codes) == 0:
+                continue
+            track_first = L <= max_length
+            if dense[L]:
+                seq_counts = np.bincount(codes, minlength=3 ** L)
+                acc[L] += seq_counts
+                if track_first:
+                    _first_occurrences(codes, np.count_nonzero(seq_counts), first_acc[L], seq_id)
+            else:
+                uniq, idx, cnt = np.unique(codes, return_index=True, return_counts=True)
+                d, fa = acc[L], first_acc[L]
+                for c, i, k in zip(uniq.tolist(), idx.tolist(), cnt.tolist()):
+                    d[c] = d.get(c, 0) + k
+                    if track_first and c not in fa:
+                        fa[c] = (seq_id, i)
+
+    def lookup(L: int, codes: np.ndarray) -> np.ndarray:
+        a = acc[L]
+        if isinstance(a, np.ndarray):
+            return a[codes]
+        return np.array([a.get(int(c), 0) for c in codes], dtype=np.int64)
+
+    for L in range(1, max_length + 1):
+        fa = first_acc[L]
+        codes = np.array(sorted(fa), dtype=np.int64)
+        counts = lookup(L, codes)
+        first = np.array([fa[c] for c in codes.tolist()], dtype=np.int64).reshape(-1, 2)
+        # ngày kế tiếp: pattern L nối thêm một chữ số = pattern L+1
+        nxt = codes[:, None] * 3 + np.arange(3)[None, :]
+        next_counts = lookup(L + 1, nxt.reshape(-1)).reshape(-1, 3) if len(codes) else np.zeros((0, 3), dtype=np.int64)
+        out[L] = {'codes': codes, 'counts': counts, 'first': first, 'next_counts': next_counts}
+    return out
+
+
+def pattern_table(counted: Dict[str, np.ndarray], length: int) -> pd.DataFrame:
+    """
+    Bảng tần suất đầy đủ cho một độ dài: pattern, count, freq, n_next, P(next=U/D/N).
+    Sắp theo count giảm dần, cùng count thì theo lần xuất hiện đầu tiên (giống Counter.most_common).
+    """
+    codes, counts, first, nc = counted['codes'], counted['counts'], counted['first'], counted['next_counts']
+    order = np.lexsort((first[:, 1], first[:, 0], -counts)) if len(codes) else np.empty(0, dtype=np.int64)
+    n_next = nc.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        probs = nc / n_next[:, None]
+    total = counts.sum()
+    table = pd.DataFrame({
+        'pattern': [decode_pattern(c, length) for c in codes[order].tolist()],
+        'count': counts[order],
+        'freq': counts[order] / total if total else np.zeros(len(order)),
+        'n_next': n_next[order],
+        'P_next_U': probs[order, 2],
+        'P_next_D': probs[order, 0],
+        'P_next_N': probs[order, 1],
+    })
+    return table
+
+
+def mine_patterns(signs, max_length: int = 8, top_n: Optional[int] = 10) -> Dict[int, Dict[str, pd.DataFrame]]:
+    """
+    Khai phá pattern U/D/N cho mọi độ dài 1..max_length trong một lượt.
+
+    signs : một chuỗi dấu (-1/0/1) hoặc danh sách chuỗi của nhiều mã.
+    Trả về {L: {'table': bảng đầy đủ, 'top': top_n dòng đầu}}.
+    """
+    counted = count_patterns(signs, max_length=max_length)
+    result = {}
+    for L, c in counted.items():
+        table = pattern_table(c, L)
+        result[L] = {'table': table, 'top': table.head(top_n) if top_n is not None else table}
+    return result
+
+
+def top_patterns(signs, length: int = 3, top_n: int = 10) -> List[Tuple[str, int]]:
+    """Top-N pattern độ dài `length` dạng [(pattern_str, count)], cùng thứ tự với Counter.most_common."""
+    counted = count_patterns(signs, max_length=length)[length]
+    table = pattern_table(counted, length).head(top_n)
+    return list(zip(table['pattern'].tolist(), table['count'].astype(int).tolist()))
@@ -1,9 +1,13 @@
 from typing import Dict, Any, List, Tuple, Optional
-from collections import Counter
-import itertools
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from lazy_imports import lazy_module
+from instrumentation import pipeline
+from pattern_ngrams import top_patterns
+from markov_transitions import transition_counts
+
+# matplotlib chỉ được import khi gọi hàm vẽ
+plt = lazy_module('matplotlib.pyplot')
 
 
 def compute_sign_series(df: pd.DataFrame, return_col: str = 'Daily_Return', price_col: str = 'Close', percent: bool = True) -> pd.Series:
@@ -17,21 +21,38 @@ def compute_sign_series(df: pd.DataFrame, return_col: str = 'Daily_Return', pric
         if percent:
             df[return_col] = df[return_col] * 100
 
-    sign_series = df[return_col].dropna().apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0)).astype(int)
+    returns = df[return_col].dropna()
+    sign_series = pd.Series(np.sign(returns.to_numpy(dtype=np.float64)).astype(int), index=returns.index, name=returns.name)
     return sign_series
 
 
+def run_length_encode(signs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Run-length encoding vector hóa: (values int8, lengths int64), mỗi phần tử một chuỗi liên tiếp.
+    Ranh giới chuỗi là các vị trí np.diff(signs) != 0.
+    """
+    signs = np.asarray(signs, dtype=np.int8)
+    n = len(signs)
+    if n == 0:
+        return np.empty(0, dtype=np.int8), np.empty(0, dtype=np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(signs)) + 1))
+    lengths = np.diff(np.append(starts, n))
+    return signs[starts], lengths
+
+
 def run_length_encoding(vals: List[int]) -> List[Tuple[int, int]]:
     """Run-length encoding: trả về list of (value, length)."""
-    runs = []
-    for key, group in itertools.groupby(vals):
-        length = sum(1 for _ in group)
-        runs.append((int(key), length))
-    return runs
+    values, lengths = run_length_encode(np.asarray(vals))
+    return list(zip(values.tolist(), lengths.tolist()))
+
+
+def run_length_histograms(values: np.ndarray, lengths: np.ndarray) -> Dict[int, np.ndarray]:
+    """Histogram độ dài chuỗi theo trạng thái: {1: counts, -1: counts, 0: counts}, counts[L] = số chuỗi dài L."""
+    return {state: np.bincount(lengths[values == state]) for state in (1, -1, 0)}
 
 
 def summarize_runs(lst: List[int]) -> Dict[str, float]:
-    """Trả về thống kê cơ bản cho danh sách độ dài chuỗi."""
+    """Trả về thống kê cơ bản cho danh sách (hoặc mảng) độ dài chuỗi."""
     if len(lst) == 0:
         return {'count': 0, 'mean': 0.0, 'median': 0.0, 'max': 0}
     arr = np.array(lst)
@@ -44,42 +65,37 @@ def compute_transitions(sign_series: pd.Series) -> Optional[pd.DataFrame]:
     sign_no0 = sign_series[sign_series != 0]
     if len(sign_no0) < 2:
         return None
-    prev = sign_no0.shift(1).dropna()
-    curr = sign_no0.loc[prev.index]
-    if len(prev) == 0:
-        return None
-    trans_df = pd.crosstab(prev, curr, normalize='index')
-    return trans_df
+    # đếm chuyển bậc 1 bằng bincount (markov_transitions); như crosstab, chỉ giữ dòng (trạng thái trước)
+    # và cột (trạng thái sau) có xuất hiện. Nhãn là int -1 / 1, các trục không đặt tên.
+    counts = transition_counts(sign_no0.to_numpy(), order=1)[[0, 2]][:, [0, 2]].astype(np.float64)
+    rows, cols = counts.sum(axis=1) > 0, counts.sum(axis=0) > 0
+    states = np.array([-1, 1])
+    counts = counts[rows][:, cols]
+    return pd.DataFrame(counts / counts.sum(axis=1, keepdims=True), index=states[rows], columns=states[cols])
 
 
 def top_short_patterns(vals: List[int], length: int = 3, top_n: int = 10) -> List[Tuple[str, int]]:
     """Đếm các pattern ngắn (ví dụ length=3). Trả về danh sách (pattern_str, count)."""
-    patterns = []
-    for i in range(len(vals) - length + 1):
-        pattern = tuple(vals[i:i + length])
-        patterns.append(pattern)
-    counts = Counter(patterns)
-
-    def pat_to_str(p: Tuple[int, ...]) -> str:
-        return ''.join('U' if x == 1 else 'D' if x == -1 else 'N' for x in p)
+    # mã hóa hệ 3 + bincount (pattern_ngrams), cùng thứ tự với Counter.most_common
+    if len(vals) < length:
+        return []
+    return top_patterns(np.asarray(vals), length=length, top_n=top_n)
 
-    return [(pat_to_str(k), v) for k, v in counts.most_common(top_n)]
 
-
-def plot_pattern_results(up_runs: List[int], down_runs: List[int], trans_df: Optional[pd.DataFrame]) -> Optional[plt.Figure]:
+def plot_pattern_results(up_runs: List[int], down_runs: List[int], trans_df: Optional[pd.DataFrame]) -> Optional['plt.Figure']:
     """Vẽ 3 biểu đồ (up-run dist, down-run dist, transition probs). Trả về figure."""
     try:
         fig, axes = plt.subplots(1, 3, figsize=(18, 4))
 
         # Up histogram
-        bins_up = range(1, max(up_runs) + 2) if up_runs else [0, 1]
+        bins_up = range(1, max(up_runs) + 2) if len(up_runs) else [0, 1]
         axes[0].hist(up_runs, bins=bins_up, alpha=0.7, color='green', edgecolor='black')
         axes[0].set_title('Distribution of Up-run Lengths')
         axes[0].set_xlabel('Consecutive Up Days')
         axes[0].set_ylabel('Count')
 
         # Down histogram
-        bins_down = range(1, max(down_runs) + 2) if down_runs else [0, 1]
+        bins_down = range(1, max(down_runs) + 2) if len(down_runs) else [0, 1]
         axes[1].hist(down_runs, bins=bins_down, alpha=0.7, color='red', edgecolor='black')
         axes[1].set_title('Distribution of Down-run Lengths')
         axes[1].set_xlabel('Consecutive Down Days')
@@ -126,23 +142,34 @@ def _format_stats_table(up_stats: Dict[str, float], down_stats: Dict[str, float]
     return header + "\n" + "\n".join(rows)
 
 
-def analyze_up_down(df: pd.DataFrame, price_col: str = 'Close', return_col: str = 'Daily_Return', percent: bool = True, plot: bool = True, print_summary: bool = True) -> Dict[str, Any]:
-    # signs
-    sign_series = compute_sign_series(df, return_col=return_col, price_col=price_col, percent=percent)
-    vals = sign_series.tolist()
+def analyze_up_down(df: pd.DataFrame, price_col: str = 'Close', return_col: str = 'Daily_Return', percent: bool = True, plot: bool = True, print_summary: bool = True, instrument: bool = False) -> Dict[str, Any]:
+    # instrument=True (hoặc gọi trong instrumentation.profiling()): thêm result['timings'] theo từng stage
+    with pipeline('analyze_up_down', instrument) as prof:
+        pattern_results = _analyze_up_down(prof, df, price_col, return_col, percent, plot, print_summary)
+    return prof.attach(pattern_results)
 
-    # runs
-    runs = run_length_encoding(vals)
-    up_runs = [l for k, l in runs if k == 1]
-    down_runs = [l for k, l in runs if k == -1]
-    neutral_runs = [l for k, l in runs if k == 0]
 
-    up_stats = summarize_runs(up_runs)
-    down_stats = summarize_runs(down_runs)
-    neutral_stats = summarize_runs(neutral_runs)
+def _analyze_up_down(prof, df, price_col, return_col, percent, plot, print_summary) -> Dict[str, Any]:
+    # signs
+    with prof.stage('compute_sign_series'):
+        sign_series = compute_sign_series(df, return_col=return_col, price_col=price_col, percent=percent)
+        signs = sign_series.to_numpy(dtype=np.int8)
+
+    # runs (mảng NumPy thay cho list Python)
+    with prof.stage('run_length_encoding'):
+        run_values, run_lengths = run_length_encode(signs)
+        up_runs = run_lengths[run_values == 1]
+        down_runs = run_lengths[run_values == -1]
+        neutral_runs = run_lengths[run_values == 0]
+
+    with prof.stage('summarize_runs'):
+        up_stats = summarize_runs(up_runs)
+        down_stats = summarize_runs(down_runs)
+        neutral_stats = summarize_runs(neutral_runs)
 
     # transitions
-    trans_df = compute_transitions(sign_series)
+    with prof.stage('compute_transitions'):
+        trans_df = compute_transitions(sign_series)
 
     # Print concise, pretty summary
     if print_summary:
@@ -163,15 +190,17 @@ def analyze_up_down(df: pd.DataFrame, price_col: str = 'Close', return_col: str
 
     fig = None
     if plot:
-        fig = plot_pattern_results(up_runs, down_runs, trans_df)
-        if fig is not None:
-            plt.show()
+        with prof.stage('plot'):
+            fig = plot_pattern_results(up_runs, down_runs, trans_df)
+            if fig is not None:
+                plt.show()
 
     pattern_results = {
         'sign_series': sign_series,
         'up_runs': up_runs,
         'down_runs': down_runs,
         'neutral_runs': neutral_runs,
+        'run_histograms': run_length_histograms(run_values, run_lengths),
         'up_stats': up_stats,
         'down_stats': down_stats,
         'neutral_stats': neutral_stats,
@@ -0,0 +1,172 @@
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from indicator_cache import get_return, get_sma, get_adx
+
+TREND_FOLLOWING = 'TREND_FOLLOWING'
+MEAN_REVERSION = 'MEAN_REVERSION'
+SIDEWAYS = 'SIDEWAYS'
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    """Tổng tích lũy có phần tử 0 ở đầu: tổng đoạn [s, e) = P[e] - P[s]."""
+    out = np.zeros(len(values) + 1, dtype=np.float64)
+    np.cumsum(values, out=out[1:])
+    return out
+
+
+def _window_starts(n: int, window: int, step: int) -> np.ndarray:
+    if n < window:
+        return np.empty(0, dtype=np.int64)
+    return np.arange(0, n - window + 1, step, dtype=np.int64)
+
+
+def compute_regime_features(df: pd.DataFrame,
+                            window: int = 126,
+                            step: Optional[int] = None,
+                            sma_window: int = 50,
+                            adx_period: int = 14) -> pd.DataFrame:
+    """
+    Tính các chỉ số của check_trend_following / check_mean_reversion cho MỌI cửa sổ trong
+    một lượt vector hóa (tổng tích lũy + rolling), thay vì cắt df và gọi lại từng hàm.
+
+    window : độ dài cửa sổ theo số phiên (126 ≈ 6 tháng giao dịch).
+    step   : bước trượt; None = window (các cửa sổ không chồng lấn), 1 = trượt từng ngày.
+
+    Indicator (Return, SMA, ADX) được tính MỘT lần trên toàn bộ lịch sử rồi mới tổng hợp
+    theo cửa sổ, nên không mất các phiên khởi động SMA/ADX ở đầu mỗi cửa sổ.
+    """
+    if step is None:
+        step = window
+    if window < 2 or step < 1:
+        raise ValueError("window phải >= 2 và step phải >= 1")
+
+    n = len(df)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    ret = np.asarray(get_return(df), dtype=np.float64)
+    sma = np.asarray(get_sma(df, sma_window), dtype=np.float64)
+    adx = np.asarray(get_adx(df, timeperiod=adx_period), dtype=np.float64)
+
+    starts = _window_starts(n, window, step)
+    ends = starts + window
+
+    # --- 1. Autocorrelation lag-1 của Return: cặp (r[t-1], r[t]) với t-1, t cùng trong cửa sổ ---
+    x = np.concatenate(([np.nan], ret[:-1]))  # r[t-1]
+    pair = ~np.isnan(ret) & ~np.isnan(x)
+    xv = np.where(pair, x, 0.0)
+    yv = np.where(pair, ret, 0.0)
+    P_n, P_x, P_y = _prefix(pair.astype(np.float64)), _prefix(xv), _prefix(yv)
+    P_xx, P_yy, P_xy = _prefix(xv * xv), _prefix(yv * yv), _prefix(xv * yv)
+    a, b = starts + 1, ends
+    cnt = P_n[b] - P_n[a]
+    sx, sy = P_x[b] - P_x[a], P_y[b] - P_y[a]
+    sxx, syy, sxy = P_xx[b] - P_xx[a], P_yy[b] - P_yy[a], P_xy[b] - P_xy[a]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = cnt * sxy - sx * sy
+        var = (cnt * sxx - sx * sx) * (cnt * syy - sy * sy)
+        autocorr = np.where((cnt >= 2) & (var > 0), cov / np.sqrt(var), np.nan)
+
+    # --- 2. Median ADX (bỏ NaN) ---
+    adx_median = pd.Series(adx).rolling(window, min_periods=1).median().to_numpy()
+    adx_median = adx_median[ends - 1] if len(ends) else np.empty(0)
+
+    # --- 3. Slope hồi quy tuyến tính của SMA trên các điểm hợp lệ (x = 0..m-1) ---
+    # Như linregress(arange(m), sma.dropna()) của bản gốc: x là thứ tự của điểm trong các điểm hợp lệ
+    # của cửa sổ, nên NaN ở giữa lịch sử (ví dụ Close thiếu) bị bỏ qua chứ không tính là y = 0.
+    valid = ~np.isnan(sma)
+    P_valid = _prefix(valid.astype(np.float64))
+    y0 = np.where(valid, sma - np.nanmean(sma) if valid.any() else 0.0, 0.0)  # slope không đổi khi trừ hằng số
+    rank = P_valid[:-1]                         # số điểm hợp lệ đứng trước t
+    P_y1, P_ry = _prefix(y0), _prefix(rank * y0)
+    m = P_valid[ends] - P_valid[starts]
+    s_y = P_y1[ends] - P_y1[starts]
+    s_xy = (P_ry[ends] - P_ry[starts]) - P_valid[starts] * s_y   # Σ (rank - rank đầu cửa sổ) * y
+    s_x = m * (m - 1) / 2
+    s_xx = (m - 1) * m * (2 * m - 1) / 6
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = np.where(m >= 2, (m * s_xy - s_x * s_y) / (m * s_xx - s_x * s_x), np.nan)
+
+    # --- 4. % Close trên/dưới SMA (NaN SMA tính là không thỏa, giống bản gốc) ---
+    P_above = _prefix((close > sma).astype(np.float64))
+    P_below = _prefix((close < sma).astype(np.float64))
+    pct_above = (P_above[ends] - P_above[starts]) / window
+    pct_below = (P_below[ends] - P_below[starts]) / window
+
+    # --- 5. Số lần cắt SMA / năm (như check_cross_per_year trên các ngày có SMA) ---
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    prev_sma = np.concatenate(([np.nan], sma[:-1]))
+    cross = (((prev_close < prev_sma) & (close > sma)) |
+             ((prev_close > prev_sma) & (close < sma)))
+    P_cross = _prefix(cross.astype(np.float64))
+    n_cross = P_cross[ends] - P_cross[starts + 1]   # ngày t-1 phải nằm trong cửa sổ
+    n_days = P_valid[ends] - P_valid[starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        crosses_per_year = np.where(n_days > 0, n_cross / n_days * 252, np.nan)
+
+    if 'Date' in df.columns:
+        dates = pd.DatetimeIndex(df['Date'])
+    else:
+        dates = pd.DatetimeIndex(df.index)
+
+    return pd.DataFrame({
+        'start_date': dates[starts],
+        'end_date': dates[ends - 1],
+        'start_pos': starts,
+        'end_pos': ends,
+        'autocorr': autocorr,
+        'adx_median': adx_median,
+        'SMA50_slope': slope,
+        'pct_close_above_SMA50': pct_above,
+        'pct_close_below_SMA50': pct_below,
+        'crosses_per_year': crosses_per_year,
+    })
+
+
+def label_regimes(features: pd.DataFrame,
+                  trend_pct: float = 0.6,
+                  adx_threshold: float = 20.0,
+                  min_crosses_per_year: float = 6.0) -> pd.DataFrame:
+    """
+    Gán regime cho từng cửa sổ theo thứ tự ưu tiên TREND_FOLLOWING → MEAN_REVERSION → SIDEWAYS.
+
+    - trend_direction giống check_trend_following: 'up' nếu slope > 0 và % trên SMA > trend_pct,
+      'down' nếu slope < 0 và % dưới SMA > trend_pct, ngược lại 'none'.
+    - TREND_FOLLOWING : có trend_direction và ADX median >= adx_threshold.
+    - MEAN_REVERSION  : autocorr < 0, ADX median < adx_threshold và cắt SMA >= min_crosses_per_year lần/năm.
+    - SIDEWAYS        : còn lại.
+    (adx_threshold = 20 là ngưỡng "low trend" dùng trong plot_adx_mr.)
+    """
+    out = features.copy()
+    slope = out['SMA50_slope']
+    up = (slope > 0) & (out['pct_close_above_SMA50'] > trend_pct)
+    down = (slope < 0) & (out['pct_close_below_SMA50'] > trend_pct)
+    out['trend_direction'] = np.select([up, down], ['up', 'down'], default='none')
+
+    is_trend = (out['trend_direction'] != 'none') & (out['adx_median'] >= adx_threshold)
+    is_mr = ((out['autocorr'] < 0) & (out['adx_median'] < adx_threshold)
+             & (out['crosses_per_year'] >= min_crosses_per_year))
+    out['regime'] = np.select([is_trend, is_mr], [TREND_FOLLOWING, MEAN_REVERSION], default=SIDEWAYS)
+    return out
+
+
+def classify_regimes(df: pd.DataFrame,
+                     window: int = 126,
+                     step: Optional[int] = None,
+                     **label_kwargs) -> pd.DataFrame:
+    """Timeline regime: các chỉ số theo cửa sổ + trend_direction + regime (mỗi dòng một cửa sổ)."""
+    features = compute_regime_features(df, window=window, step=step)
+    return label_regimes(features, **label_kwargs)
+
+
+def regime_segments(timeline: pd.DataFrame) -> pd.DataFrame:
+    """Gộp các cửa sổ liên tiếp cùng regime thành các đoạn (start_date, end_date, regime, n_windows)."""
+    if timeline.empty:
+        return pd.DataFrame(columns=['start_date', 'end_date', 'regime', 'n_windows'])
+    change = timeline['regime'].ne(timeline['regime'].shift()).cumsum()
+    return (timeline.groupby(change, sort=False)
+            .agg(start_date=('start_date', 'first'),
+                 end_date=('end_date', 'last'),
+                 regime=('regime', 'first'),
+                 n_windows=('regime', 'size'))
+            .reset_index(drop=True))
@@ -0,0 +1,369 @@
+import itertools
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from first_passage import FirstPassageIndex
+from instrumentation import pipeline
+from trading_calendar import TradingCalendar
+from trading_strategy_season import (
+    INITIAL_CAPITAL,
+    STOP_LOSS,
+    TAKE_PROFIT,
+    compute_basic_metrics,
+    ensure_datetime_index,
+    prepare_price_arrays,
+    run_strategy_arrays,
+)
+from yearly_return import (
+    compute_yearly_equity_stats,
+    metrics_yearly_consistency,
+    prepare_seasonal_trades,
+    season_mapper_for,
+)
+
+# Một giai đoạn (tháng bắt đầu, tháng kết thúc), tháng bắt đầu <= tháng kết thúc như run_strategy
+Window = Tuple[int, int]
+Periods = Tuple[Window, ...]
+
+METRIC_COLUMNS = ['Number of trades', 'Total return (%)', 'Win rate (%)', 'CAGR (%)', 'Max drawdown (%)',
+                  'Calmar', 'positive_year_ratio', 'max_year_contribution']
+# Chiều sắp xếp khi xếp hạng (mặc định: lớn hơn là tốt hơn; drawdown âm nên gần 0 là tốt hơn)
+RANK_ASCENDING = {'max_year_contribution': True}
+NS_PER_DAY = 86_400 * 10 ** 9
+
+
+# ---------------------------------------------------------
+# 1. Không gian ứng viên
+# ---------------------------------------------------------
+def month_windows(min_months: int = 1, max_months: int = 12) -> List[Window]:
+    """Mọi giai đoạn tháng liên tục (start_m, end_m) trong năm có độ dài min_months..max_months."""
+    return [(s, e) for s in range(1, 13) for e in range(s, 13) if min_months <= e - s + 1 <= max_months]
+
+
+def candidate_periods(max_windows: int = 2, min_months: int = 1, max_months: int = 12) -> List[Periods]:
+    """
+    Mọi tổ hợp 1..max_windows giai đoạn rời nhau, theo thứ tự trong năm (giai đoạn sau bắt đầu sau
+    khi giai đoạn trước kết thúc), ví dụ ((3, 5), (9, 11)).
+    """
+    windows = month_windows(min_months, max_months)
+    out: List[Periods] = []
+
+    def extend(prefix: Periods) -> None:
+        out.append(prefix)
+        if len(prefix) == max_windows:
+            return
+        for w in windows:
+            if w[0] > prefix[-1][1]:
+                extend(prefix + (w,))
+
+    for w in windows:
+        extend((w,))
+    return out
+
+
+# ---------------------------------------------------------
+# 2. Mô phỏng từng (giai đoạn, SL, TP, năm) một lần
+# ---------------------------------------------------------
+class _PeriodTable:
+    """
+    Kết quả của mỗi period (giai đoạn × cặp SL/TP × năm), shape (W, G, Y), với vốn tương đối 1 ở đầu period:
+      factor     : vốn cuối / vốn đầu (tích exit / entry của các lệnh)
+      cmin, cmax : vốn nhỏ nhất / lớn nhất sau các lệnh
+      dd         : min của (vốn sau lệnh / đỉnh trước đó trong period, tính cả mức 1 ban đầu)
+      trades, wins, first, last : số lệnh, số lệnh lãi, vị trí entry đầu tiên / exit cuối cùng
+    Bốn đại lượng đầu đủ để nối các period thành equity và drawdown của cả chuỗi lệnh mà không cần lệnh lẻ.
+    """
+
+    def __init__(self, shape: Tuple[int, int, int]):
+        self.factor = np.ones(shape)
+        self.cmin = np.full(shape, np.inf)
+        self.cmax = np.full(shape, -np.inf)
+        self.dd = np.ones(shape)
+        self.trades = np.zeros(shape, dtype=np.int64)
+        self.wins = np.zeros(shape, dtype=np.int64)
+        self.first = np.full(shape, -1, dtype=np.int64)
+        self.last = np.full(shape, -1, dtype=np.int64)
+
+
+def simulate_periods(calendar: TradingCalendar,
+                     passage: FirstPassageIndex,
+                     opens: np.ndarray,
+                     closes: np.ndarray,
+                     windows: Sequence[Window],
+                     grid: Sequence[Tuple[float, float]],
+                     years: np.ndarray) -> _PeriodTable:
+    """
+    Chạy luật của _run_strategy_kernel (entry đầu giai đoạn, SL/TP, tái mua, thoát ngày cuối giai đoạn)
+    cho mọi (giai đoạn, (stop_loss, take_profit), năm) cùng lúc: mỗi vòng là một first_cross_many
+    trên các period còn đang mở lệnh, nên số vòng chỉ bằng số lần tái mua nhiều nhất trong một period.
+    Vốn được coi là chia hết (bỏ qua làm tròn số cổ phiếu).
+    """
+    W, G, Y = len(windows), len(grid), len(years)
+    table = _PeriodTable((W, G, Y))
+    n = len(opens)
+    if n == 0 or W * G * Y == 0:
+        return table
+    months = calendar.months
+
+    # vị trí entry / ngày cuối giai đoạn theo (giai đoạn, năm) từ chỉ mục tháng của calendar
+    entry = np.stack([calendar.first_trading_days(years, s) for s, _ in windows])
+    stop = np.stack([calendar.next_period_ends(np.maximum(entry[w], 0), e) for w, (_, e) in enumerate(windows)])
+
+    shape = (W, G, Y)
+    w_idx, g_idx, _ = np.indices(shape).reshape(3, -1)
+    entry = np.broadcast_to(entry[:, None, :], shape).reshape(-1)
+    end_i = np.broadcast_to(stop[:, None, :], shape).reshape(-1)
+    sl = np.asarray([g[0] for g in grid], dtype=np.float64)[g_idx]
+    tp = np.asarray([g[1] for g in grid], dtype=np.float64)[g_idx]
+    start_m = np.asarray([w[0] for w in windows])[w_idx]
+    end_m = np.asarray([w[1] for w in windows])[w_idx]
+
+    factor = table.factor.reshape(-1)
+    cmin, cmax, dd = table.cmin.reshape(-1), table.cmax.reshape(-1), table.dd.reshape(-1)
+    trades, wins = table.trades.reshape(-1), table.wins.reshape(-1)
+    first, last = table.first.reshape(-1), table.last.reshape(-1)
+    peak = np.ones(len(entry))
+
+    rows = np.flatnonzero(entry >= 0)
+    first[rows] = entry[rows]
+    i = entry[rows]
+    price = opens[i]
+    while len(rows):
+        stops = np.where(end_i[rows] >= 0, end_i[rows], n)
+        j = passage.first_cross_many(i, stops, price, sl[rows], tp[rows])
+        crossed = j >= 0
+        # không chạm SL/TP: thoát ở open ngày cuối giai đoạn (hết dữ liệu thì không có lệnh)
+        exit_i = np.where(crossed, np.where(j + 1 >= n, j, j + 1), end_i[rows])
+        traded = crossed | (end_i[rows] >= 0)
+
+        r, x, p = rows[traded], exit_i[traded], price[traded]
+        ratio = opens[x] / p
+        c = factor[r] * ratio
+        factor[r] = c
+        peak[r] = np.maximum(peak[r], c)
+        dd[r] = np.minimum(dd[r], c / peak[r])
+        cmin[r] = np.minimum(cmin[r], c)
+        cmax[r] = np.maximum(cmax[r], c)
+        trades[r] += 1
+        wins[r] += opens[x] > p
+        last[r] = x
+
+        # tái mua tại close ngày thoát nếu vẫn trong giai đoạn và còn dữ liệu
+        exit_m = months[exit_i]
+        again = crossed & (j + 1 < n) & (start_m[rows] <= exit_m) & (exit_m <= end_m[rows])
+        rows = rows[again]
+        i = exit_i[again]
+        price = closes[i]
+    return table
+
+
+# ---------------------------------------------------------
+# 3. Chấm điểm ứng viên bằng cách nối các period
+# ---------------------------------------------------------
+def _score_candidates(table: _PeriodTable,
+                      combos: np.ndarray,
+                      g_idx: np.ndarray,
+                      stamps: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Chỉ số của compute_basic_metrics và metrics_yearly_consistency cho mỗi ứng viên (các giai đoạn
+    combos[c] với cặp SL/TP g_idx[c]) từ bảng period: equity là tích lũy (prefix product) của factor
+    theo thứ tự năm rồi giai đoạn, drawdown nối từ cmin / cmax / dd của từng period.
+    combos: (C, k) chỉ số giai đoạn, -1 = không dùng. stamps: thời điểm (ns) của mỗi vị trí.
+    """
+    C, k = combos.shape
+    Y = table.factor.shape[2]
+    equity = np.ones(C)
+    peak = np.ones(C)
+    worst = np.ones(C)
+    n_trades = np.zeros(C, dtype=np.int64)
+    n_wins = np.zeros(C, dtype=np.int64)
+    first = np.full(C, -1, dtype=np.int64)
+    last = np.full(C, -1, dtype=np.int64)
+    year_end = np.ones((C, Y))
+    year_has = np.zeros((C, Y), dtype=bool)
+
+    for y in range(Y):
+        for t in range(k):
+            w = combos[:, t]
+            use = w >= 0
+            cell = (np.maximum(w, 0), g_idx, y)
+            has = use & (table.trades[cell] > 0)
+            point = np.minimum(equity * table.cmin[cell] / peak, table.dd[cell])
+            worst = np.where(has, np.minimum(worst, point), worst)
+            peak = np.where(has, np.maximum(peak, equity * table.cmax[cell]), peak)
+            equity = np.where(has, equity * table.factor[cell], equity)
+            n_trades += np.where(has, table.trades[cell], 0)
+            n_wins += np.where(has, table.wins[cell], 0)
+            first = np.where(has & (first < 0), table.first[cell], first)
+            last = np.where(has, table.last[cell], last)
+            year_has[:, y] |= has
+        year_end[:, y] = equity
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # như (exit_date - entry_date).days / 365.25 của compute_basic_metrics
+        num_years = ((stamps[last] - stamps[first]) // NS_PER_DAY) / 365.25
+        cagr = np.where(num_years > 0, equity ** (1 / np.where(num_years > 0, num_years, 1)) - 1, np.nan)
+        max_dd = (worst - 1) * 100
+        calmar = np.where(max_dd < 0, cagr * 100 / np.abs(max_dd), np.where(cagr > 0, np.inf, np.nan))
+
+        # năm có lệnh: return = equity cuối năm / cuối năm có lệnh trước đó - 1
+        prev = np.concatenate([np.ones((C, 1)), year_end[:, :-1]], axis=1)
+        n_years = year_has.sum(axis=1)
+        positive_ratio = (year_has & (year_end > prev)).sum(axis=1) / n_years
+        total_gain = equity - 1
+        share = np.where(year_has, (year_end - prev) / total_gain[:, None], -np.inf)
+        contribution = np.where(total_gain != 0, share.max(axis=1), 0.0)
+
+    return {
+        'Number of trades': n_trades,
+        'Total return (%)': (equity - 1) * 100,
+        'Win rate (%)': n_wins / np.maximum(n_trades, 1) * 100,
+        'CAGR (%)': cagr * 100,
+        'Max drawdown (%)': max_dd,
+        'Calmar': calmar,
+        'positive_year_ratio': positive_ratio,
+        'max_year_contribution': contribution,
+    }
+
+
+def _calmar(metrics: Dict[str, Any]) -> float:
+    cagr, max_dd = metrics['CAGR (%)'], metrics['Max drawdown (%)']
+    if max_dd < 0:
+        return cagr / abs(max_dd)
+    return np.inf if cagr > 0 else np.nan
+
+
+def rank_candidates(table: pd.DataFrame, rank_by: Union[str, Sequence[str]] = ('Calmar', 'positive_year_ratio')) -> pd.DataFrame:
+    """Sắp xếp ứng viên theo các cột rank_by (chiều theo RANK_ASCENDING), thêm cột 'rank' từ 1."""
+    rank_by = [rank_by] if isinstance(rank_by, str) else list(rank_by)
+    for col in rank_by:
+        if col not in table.columns:
+            raise KeyError(f"Không có cột xếp hạng: {col}")
+    out = table.sort_values(rank_by, ascending=[RANK_ASCENDING.get(c, False) for c in rank_by],
+                            kind='stable', na_position='last').reset_index(drop=True)
+    out.insert(0, 'rank', np.arange(1, len(out) + 1))
+    return out
+
+
+# ---------------------------------------------------------
+# 4. Pipeline
+# ---------------------------------------------------------
+class SeasonSearch:
+    """
+    Tìm giai đoạn mùa vụ tốt nhất cho một mã: mảng giá, TradingCalendar và FirstPassageIndex dựng một lần;
+    prescreen mọi ứng viên (tổ hợp giai đoạn × SL × TP) bằng bảng period, rồi chạy lại kernel của
+    run_strategy (số cổ phiếu nguyên, như backtest thật) cho top ứng viên.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = ensure_datetime_index(df)
+        if "Open" not in df.columns or "Close" not in df.columns:
+            raise KeyError("DataFrame phải có cột Open và Close")
+        _, self.opens, self.closes = prepare_price_arrays(df)
+        self.index = df.index
+        self.calendar = TradingCalendar(df.index)
+        self.passage = FirstPassageIndex(self.closes)
+        years = self.calendar.years
+        self.years = np.arange(int(years[0]), int(years[-1]) + 1) if len(years) else np.empty(0, dtype=np.int64)
+        # thời điểm (ns) của mỗi vị trí, cho số năm của CAGR
+        self.stamps = self.index.values.astype('datetime64[ns]').astype(np.int64)
+
+    def prescreen(self,
+                  candidates: Sequence[Periods],
+                  stop_losses: Sequence[float] = (STOP_LOSS,),
+                  take_profits: Sequence[float] = (TAKE_PROFIT,)) -> pd.DataFrame:
+        """Chỉ số xấp xỉ (vốn chia hết) cho mọi ứng viên × SL × TP; mỗi giai đoạn chỉ được mô phỏng một lần."""
+        grid = [(float(sl), float(tp)) for sl, tp in itertools.product(stop_losses, take_profits)]
+        windows = sorted({w for periods in candidates for w in periods})
+        w_pos = {w: i for i, w in enumerate(windows)}
+        table = simulate_periods(self.calendar, self.passage, self.opens, self.closes, windows, grid, self.years)
+
+        k = max((len(p) for p in candidates), default=1)
+        combos = np.full((len(candidates), k), -1, dtype=np.int64)
+        for c, periods in enumerate(candidates):
+            combos[c, :len(periods)] = [w_pos[w] for w in periods]
+        C, G = len(candidates), len(grid)
+        combos = np.repeat(combos, G, axis=0)
+        g_idx = np.tile(np.arange(G), C)
+        metrics = _score_candidates(table, combos, g_idx, self.stamps)
+
+        out = pd.DataFrame({
+            'periods': [periods for periods in candidates for _ in range(G)],
+            'stop_loss': np.array([g[0] for g in grid])[g_idx],
+            'take_profit': np.array([g[1] for g in grid])[g_idx],
+        })
+        for col in METRIC_COLUMNS:
+            out[col] = metrics[col]
+        return out
+
+    def evaluate(self, periods: Periods, stop_loss: float, take_profit: float,
+                 initial_capital: float = INITIAL_CAPITAL) -> Dict[str, Any]:
+        """Backtest chính xác một ứng viên bằng kernel của run_strategy + độ bền theo năm."""
+        trades_df = run_strategy_arrays(self.calendar, self.opens, self.closes,
+                                        initial_capital=initial_capital,
+                                        stop_loss=stop_loss,
+                                        take_profit=take_profit,
+                                        periods=periods,
+                                        passage=self.passage)
+        row: Dict[str, Any] = {'periods': tuple(periods), 'stop_loss': stop_loss, 'take_profit': take_profit}
+        metrics = compute_basic_metrics(trades_df, initial_capital=initial_capital)
+        if metrics is None:
+            row['Number of trades'] = 0
+            return row
+        row.update(metrics)
+        row['Calmar'] = _calmar(metrics)
+        prepared = prepare_seasonal_trades(trades_df, season_mapper_for(periods))
+        row.update(metrics_yearly_consistency(compute_yearly_equity_stats(prepared, initial_capital)))
+        return row
+
+    def search(self,
+               stop_losses: Sequence[float] = (STOP_LOSS,),
+               take_profits: Sequence[float] = (TAKE_PROFIT,),
+               max_windows: int = 2,
+               min_months: int = 1,
+               max_months: int = 12,
+               candidates: Optional[Sequence[Periods]] = None,
+               rank_by: Union[str, Sequence[str]] = ('Calmar', 'positive_year_ratio'),
+               top_k: int = 20,
+               min_trades: int = 1,
+               initial_capital: float = INITIAL_CAPITAL,
+               instrument: bool = False) -> Dict[str, pd.DataFrame]:
+        """
+        Trả về {'candidates': bảng prescreen đã xếp hạng, 'top': top_k ứng viên backtest chính xác, xếp hạng lại}.
+        candidates: danh sách tổ hợp giai đoạn tự chọn (mặc định candidate_periods(max_windows, ...)).
+        """
+        with pipeline('season_search', instrument) as prof:
+            if candidates is None:
+                candidates = candidate_periods(max_windows, min_months, max_months)
+            candidates = [tuple((int(s), int(e)) for s, e in p) for p in candidates]
+            with prof.stage('prescreen'):
+                screened = self.prescreen(candidates, stop_losses, take_profits)
+                screened = screened[screened['Number of trades'] >= max(min_trades, 1)]
+                screened = rank_candidates(screened, rank_by)
+            with prof.stage('evaluate_top'):
+                rows = [self.evaluate(r.periods, r.stop_loss, r.take_profit, initial_capital)
+                        for r in screened.head(top_k).itertuples(index=False)]
+                top = pd.DataFrame(rows, columns=['periods', 'stop_loss', 'take_profit'] + METRIC_COLUMNS)
+                top = rank_candidates(top[top['Number of trades'] >= max(min_trades, 1)], rank_by)
+        return prof.attach({'candidates': screened, 'top': top})
+
+
+def search_seasons(df: pd.DataFrame, **kwargs) -> Dict[str, pd.DataFrame]:
+    """Tìm giai đoạn mùa vụ cho một mã (xem SeasonSearch.search cho các tham số)."""
+    return SeasonSearch(df).search(**kwargs)
+
+
+def search_seasons_universe(frames: Union[Dict[str, pd.DataFrame], Iterable[Tuple[str, pd.DataFrame]]],
+                            **kwargs) -> pd.DataFrame:
+    """Chạy search_seasons cho từng mã ({symbol: df} hoặc iterable (symbol, df)); gộp bảng 'top' kèm cột symbol."""
+    items = frames.items() if isinstance(frames, dict) else frames
+    tables = []
+    for symbol, df in items:
+        top = search_seasons(df, **kwargs)['top']
+        top.insert(0, 'symbol', symbol)
+        tables.append(top)
+    if not tables:
+        return pd.DataFrame(columns=['symbol', 'rank', 'periods', 'stop_loss', 'take_profit'] + METRIC_COLUMNS)
+    return pd.concat(tables, ignore_index=True)
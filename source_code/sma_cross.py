@@ -0,0 +1,150 @@
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Giá trị cột 'type' dạng số trong bảng sự kiện
+CROSS_UP = 1
+CROSS_DOWN = -1
+
+
+def rolling_means(values: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """
+    SMA cho nhiều cửa sổ cùng lúc từ MỘT tổng tích lũy: ma trận (n, len(windows)).
+    Giống rolling(w).mean(): NaN khi cửa sổ chưa đủ w giá trị hợp lệ.
+    Giá được trừ đi trung bình trước khi cumsum để giảm sai số làm tròn trên chuỗi dài.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    windows = np.asarray(windows, dtype=np.int64)
+    if (windows < 1).any():
+        raise ValueError("windows phải >= 1")
+
+    valid = ~np.isnan(values)
+    center = values[valid].mean() if valid.any() else 0.0
+    P = np.zeros(n + 1)
+    np.cumsum(np.where(valid, values - center, 0.0), out=P[1:])
+    C = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(valid, out=C[1:])
+
+    end = np.arange(1, n + 1)[:, None]
+    start = np.maximum(end - windows[None, :], 0)
+    count = C[end] - C[start]
+    with np.errstate(invalid='ignore'):
+        out = (P[end] - P[start]) / windows[None, :] + center
+    out[(count < windows[None, :]) | (end < windows[None, :])] = np.nan
+    return out
+
+
+def _cross_masks(price: np.ndarray, sma: np.ndarray):
+    """
+    So sánh mỗi phiên hợp lệ (giá và SMA không NaN) với phiên hợp lệ liền trước của cùng cột,
+    giống dropna(...) + shift(1) trong check_cross_per_year. sma có dạng (n, k).
+    """
+    n = len(price)
+    valid = ~np.isnan(sma) & ~np.isnan(price)[:, None]
+    pos = np.where(valid, np.arange(n)[:, None], -1)
+    last = np.maximum.accumulate(pos, axis=0)
+    prev = np.vstack([np.full((1, sma.shape[1]), -1), last[:-1]])
+    has_prev = valid & (prev >= 0)
+    prev_c = np.maximum(prev, 0)
+    cols = np.arange(sma.shape[1])[None, :]
+    prev_price = price[prev_c]
+    prev_sma = sma[prev_c, cols]
+    price2 = price[:, None]
+    with np.errstate(invalid='ignore'):
+        up = has_prev & (prev_price < prev_sma) & (price2 > sma)
+        down = has_prev & (prev_price > prev_sma) & (price2 < sma)
+    return up, down, valid.sum(axis=0)
+
+
+def sma_cross_events(price: np.ndarray,
+                     windows: Iterable[int],
+                     sma: Optional[np.ndarray] = None,
+                     chunk_size: int = 64):
+    """
+    Tìm mọi lần giá cắt SMA cho danh sách cửa sổ trong một lượt vector hóa.
+
+    sma : ma trận SMA (n, len(windows)) đã có sẵn; None = tính bằng rolling_means.
+    chunk_size : số cửa sổ xử lý mỗi lượt để giới hạn bộ nhớ (n × chunk_size).
+
+    Trả về (events, summary) dạng dict các mảng NumPy:
+      - events  : window, pos (vị trí dòng), type (+1 up / -1 down), price, sma; sắp theo window rồi pos.
+      - summary : window, n_crosses, n_days (số phiên có SMA), crosses_per_year (= n_crosses / n_days * 252).
+    """
+    price = np.asarray(price, dtype=np.float64)
+    windows = np.asarray(list(windows), dtype=np.int64)
+    if sma is not None:
+        sma = np.asarray(sma, dtype=np.float64).reshape(len(price), -1)
+        if sma.shape[1] != len(windows):
+            raise ValueError("sma phải có đúng một cột cho mỗi window")
+
+    ev_w, ev_pos, ev_type, ev_price, ev_sma = [], [], [], [], []
+    n_crosses = np.zeros(len(windows), dtype=np.int64)
+    n_days = np.zeros(len(windows), dtype=np.int64)
+    for lo in range(0, len(windows), max(1, chunk_size)):
+        w = windows[lo:lo + chunk_size]
+        S = rolling_means(price, w) if sma is None else sma[:, lo:lo + len(w)]
+        up, down, days = _cross_masks(price, S)
+        n_days[lo:lo + len(w)] = days
+        n_crosses[lo:lo + len(w)] = up.sum(axis=0) + down.sum(axis=0)
+
+        # transpose để thứ tự kết quả là (window, pos)
+        col, pos = np.nonzero((up | down).T)
+        ev_w.append(w[col])
+        ev_pos.append(pos)
+        ev_type.append(np.where(up[pos, col], CROSS_UP, CROSS_DOWN).astype(np.int8))
+        ev_price.append(price[pos])
+        ev_sma.append(S[pos, col])
+
+    events = {
+        'window': np.concatenate(ev_w) if ev_w else np.empty(0, dtype=np.int64),
+        'pos': np.concatenate(ev_pos) if ev_pos else np.empty(0, dtype=np.int64),
+        'type': np.concatenate(ev_type) if ev_type else np.empty(0, dtype=np.int8),
+        'price': np.concatenate(ev_price) if ev_price else np.empty(0),
+        'sma': np.concatenate(ev_sma) if ev_sma else np.empty(0),
+    }
+    with np.errstate(invalid='ignore', divide='ignore'):
+        per_year = np.where(n_days > 0, n_crosses / np.maximum(n_days, 1) * 252, np.nan)
+    summary = {'window': windows, 'n_crosses': n_crosses, 'n_days': n_days, 'crosses_per_year': per_year}
+    return events, summary
+
+
+def _dates_of(df: pd.DataFrame) -> pd.Index:
+    if 'Date' in df.columns:
+        return pd.Index(df['Date'])
+    return df.index
+
+
+def sma_cross_sweep(df: pd.DataFrame,
+                    windows: Iterable[int] = range(10, 251),
+                    price_col: str = 'Close',
+                    chunk_size: int = 64):
+    """
+    Sweep cửa sổ SMA cho check mean-reversion: (events_df, summary_df).
+    events_df gồm window, date, pos, type ('up'/'down'), price, sma; summary_df mỗi dòng một window.
+    """
+    if price_col not in df.columns:
+        raise KeyError(f"Không tìm thấy cột giá: {price_col}")
+    events, summary = sma_cross_events(df[price_col].to_numpy(dtype=np.float64), windows, chunk_size=chunk_size)
+    events_df = pd.DataFrame({
+        'window': events['window'],
+        'date': _dates_of(df)[events['pos']],
+        'pos': events['pos'],
+        'type': np.where(events['type'] == CROSS_UP, 'up', 'down'),
+        'price': events['price'],
+        'sma': events['sma'],
+    })
+    return events_df, pd.DataFrame(summary)
+
+
+def crosses_to_df(df: pd.DataFrame, events: dict) -> pd.DataFrame:
+    """Bảng sự kiện của MỘT cửa sổ sang dạng get_sma_crosses_df: date, type, price, sma (theo thời gian)."""
+    if len(events['pos']) == 0:
+        return pd.DataFrame(columns=['date', 'type', 'price', 'sma'])
+    return pd.DataFrame({
+        'date': _dates_of(df)[events['pos']],
+        'type': np.where(events['type'] == CROSS_UP, 'up', 'down'),
+        'price': events['price'],
+        'sma': events['sma'],
+    }).sort_values('date').reset_index(drop=True)
@@ -0,0 +1,153 @@
+from typing import Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+class TradingCalendar:
+    """
+    Chỉ mục lịch giao dịch, xây MỘT lần cho một DatetimeIndex đã sắp xếp tăng dần.
+
+    Lưu sẵn vị trí ngày giao dịch đầu/cuối của từng (year, month) để các hàm
+    backtest / calendar không phải quét lại toàn bộ index cho mỗi truy vấn:
+        - first_on_or_after(date)      : ngày giao dịch đầu tiên >= date (searchsorted)
+        - first_trading_day(year, m)   : vị trí ngày đầu tháng, O(1)
+        - last_trading_day(year, m)    : vị trí ngày cuối tháng, O(1)
+        - is_period_end(i, end_m)      : thay cho is_last_day_of_period, O(1)
+    """
+
+    def __init__(self, index):
+        index = pd.DatetimeIndex(index)
+        if not index.is_monotonic_increasing:
+            raise ValueError("TradingCalendar yêu cầu index ngày đã sắp xếp tăng dần")
+
+        self.index = index
+        self.years = index.year.to_numpy()
+        self.months = index.month.to_numpy()
+        n = len(index)
+
+        # Ngày cuối tháng: ngày giao dịch tiếp theo khác tháng (hoặc là ngày cuối dữ liệu)
+        self.month_end = np.ones(n, dtype=bool)
+        if n > 1:
+            self.month_end[:-1] = self.months[1:] != self.months[:-1]
+
+        # Vị trí đầu/cuối của từng (year, month) có dữ liệu
+        keys = self.years * 12 + (self.months - 1)
+        starts, stops = _run_bounds(keys)
+        self.month_keys = keys[starts]
+        self.month_first = starts
+        self.month_last = stops - 1
+
+        # Bảng tra cứu dày: key - key0 -> slot trong month_first/month_last
+        self._key0 = int(keys[0]) if n > 0 else 0
+        size = int(keys[-1]) - self._key0 + 1 if n > 0 else 0
+        self._slot = np.full(size, -1, dtype=np.int64)
+        self._slot[self.month_keys - self._key0] = np.arange(len(self.month_keys))
+
+        self._period_end_cache = {}
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def first_on_or_after(self, date) -> Optional[int]:
+        """Vị trí ngày giao dịch đầu tiên >= date (None nếu không có)."""
+        ts = pd.Timestamp(date)
+        if self.index.tz is not None and ts.tz is None:
+            ts = ts.tz_localize(self.index.tz)
+        pos = int(self.index.searchsorted(ts, side="left"))
+        return pos if pos < len(self.index) else None
+
+    def _month_slot(self, year: int, month: int) -> int:
+        k = year * 12 + (month - 1) - self._key0
+        if k < 0 or k >= len(self._slot):
+            return -1
+        return int(self._slot[k])
+
+    def first_trading_day(self, year: int, month: int) -> Optional[int]:
+        """Vị trí ngày giao dịch đầu tiên của (year, month), None nếu tháng không có dữ liệu."""
+        slot = self._month_slot(year, month)
+        return int(self.month_first[slot]) if slot >= 0 else None
+
+    def last_trading_day(self, year: int, month: int) -> Optional[int]:
+        """Vị trí ngày giao dịch cuối cùng của (year, month), None nếu tháng không có dữ liệu."""
+        slot = self._month_slot(year, month)
+        return int(self.month_last[slot]) if slot >= 0 else None
+
+    def is_period_end(self, i: int, end_m: int) -> bool:
+        """Ngày thứ i có phải ngày giao dịch cuối cùng của tháng end_m không."""
+        return bool(self.months[i] == end_m and self.month_end[i])
+
+    def period_end_positions(self, end_m: int) -> np.ndarray:
+        """Các vị trí là ngày cuối của tháng end_m (đã sắp xếp, cache theo end_m)."""
+        pos = self._period_end_cache.get(end_m)
+        if pos is None:
+            pos = np.flatnonzero((self.months == end_m) & self.month_end)
+            self._period_end_cache[end_m] = pos
+        return pos
+
+    def next_period_end(self, i: int, end_m: int) -> Optional[int]:
+        """Vị trí ngày cuối tháng end_m đầu tiên >= i (None nếu không có)."""
+        pos = self.period_end_positions(end_m)
+        k = int(np.searchsorted(pos, i, side="left"))
+        return int(pos[k]) if k < len(pos) else None
+
+    def first_trading_days(self, years: np.ndarray, month: int) -> np.ndarray:
+        """first_trading_day cho nhiều năm cùng lúc; -1 nếu (year, month) không có dữ liệu."""
+        k = np.asarray(years, dtype=np.int64) * 12 + (month - 1) - self._key0
+        inside = (k >= 0) & (k < len(self._slot))
+        slot = np.where(inside, self._slot[np.where(inside, k, 0)], -1)
+        return np.where(slot >= 0, self.month_first[np.maximum(slot, 0)], -1)
+
+    def next_period_ends(self, positions: np.ndarray, end_m: int) -> np.ndarray:
+        """next_period_end cho nhiều vị trí cùng lúc; -1 nếu không có."""
+        pos = self.period_end_positions(end_m)
+        k = np.searchsorted(pos, np.asarray(positions, dtype=np.int64), side="left")
+        return np.where(k < len(pos), pos[np.minimum(k, len(pos) - 1)] if len(pos) else -1, -1)
+
+    def unique_years(self) -> np.ndarray:
+        """Các năm có dữ liệu (tăng dần)."""
+        return np.unique(self.years)
+
+    def year_bounds(self, year: int) -> Tuple[int, int]:
+        """(start, stop) vị trí của năm `year`, dùng với df.iloc[start:stop]."""
+        start = int(np.searchsorted(self.years, year, side="left"))
+        stop = int(np.searchsorted(self.years, year, side="right"))
+        return start, stop
+
+    def period_slices(self, by: str = 'month') -> Iterator[Tuple[int, int, int, int]]:
+        """
+        Duyệt các đoạn liên tục theo tháng/quý/năm.
+        Trả về (year, period, start, stop); period là tháng (1-12), quý (1-4) hoặc năm.
+        """
+        if by == 'month':
+            for key, start, stop in zip(self.month_keys, self.month_first, self.month_last + 1):
+                yield int(key // 12), int(key % 12) + 1, int(start), int(stop)
+            return
+
+        if by == 'quarter':
+            keys = self.years * 4 + (self.months - 1) // 3
+            starts, stops = _run_bounds(keys)
+            for start, stop in zip(starts, stops):
+                key = int(keys[start])
+                yield key // 4, key % 4 + 1, int(start), int(stop)
+            return
+
+        if by == 'year':
+            starts, stops = _run_bounds(self.years)
+            for start, stop in zip(starts, stops):
+                y = int(self.years[start])
+                yield y, y, int(start), int(stop)
+            return
+
+        raise ValueError(f"Không hỗ trợ by='{by}' (chỉ 'month', 'quarter', 'year')")
+
+
+def _run_bounds(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vị trí (start, stop) của các đoạn liên tục có cùng key."""
+    n = len(keys)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    stops = np.concatenate((boundaries, [n]))
+    return starts, stops
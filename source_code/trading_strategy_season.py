@@ -1,19 +1,27 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 from typing import Optional, Iterable
 import numpy as np
+from lazy_imports import lazy_module
+from trading_calendar import TradingCalendar
+from first_passage import FirstPassageIndex
+from data_loader import parse_dates
+
+# matplotlib chỉ được import khi gọi hàm vẽ
+plt = lazy_module('matplotlib.pyplot')
+mdates = lazy_module('matplotlib.dates')
 
 # Tham số mặc định
 INITIAL_CAPITAL = 100000
 STOP_LOSS = -0.05    # -5%
 TAKE_PROFIT = 0.05   # +5%
+PERIODS = [(3, 5), (9, 11)]   # các giai đoạn (tháng bắt đầu, tháng kết thúc)
 
 def ensure_datetime_index(df, date_col='Date'):
     """Đảm bảo df có DatetimeIndex; nếu có cột Date sẽ dùng nó làm index."""
     df = df.copy()
     if date_col in df.columns:
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce', utc=True).dt.tz_convert(None)
+        # cột đã parse sẵn (ví dụ từ data_loader.load_ohlcv) sẽ không bị parse lại
+        df[date_col] = parse_dates(df[date_col])
         df = df.dropna(subset=[date_col])
         df = df.sort_values(date_col)
         df = df.set_index(date_col)
@@ -45,19 +53,242 @@ def is_last_day_of_period(idx, i, end_m):
     return (i == len(idx) - 1) or (idx[i+1].month != end_m)
 
 
+def prepare_price_arrays(df):
+    """
+    Trích các mảng NumPy liên tục (dates, Open, Close) từ df đã có DatetimeIndex.
+    Dùng cho engine 'numpy' để tránh truy cập df.loc theo nhãn trong vòng lặp.
+    """
+    if "Open" not in df.columns or "Close" not in df.columns:
+        raise KeyError("DataFrame phải có cột Open và Close")
+
+    dates = np.ascontiguousarray(df.index.values)
+    opens = np.ascontiguousarray(df["Open"].to_numpy(dtype=np.float64))
+    closes = np.ascontiguousarray(df["Close"].to_numpy(dtype=np.float64))
+    return dates, opens, closes
+
+
+def _run_strategy_kernel(calendar, opens, closes,
+                         initial_capital=INITIAL_CAPITAL,
+                         stop_loss=STOP_LOSS,
+                         take_profit=TAKE_PROFIT,
+                         periods=PERIODS,
+                         passage=None,
+                         trade_years=None):
+    """
+    Kernel của run_strategy trên mảng NumPy, truy cập theo vị trí.
+    Áp dụng đúng các luật entry / TP / SL / tái mua / period_end như bản pandas.
+    `calendar` là TradingCalendar của cùng dãy ngày với opens/closes.
+    `passage` (FirstPassageIndex trên closes): nếu có, mỗi lệnh chỉ cần một truy vấn
+    first-passage tới ngày cuối period thay vì quét từng ngày.
+    `trade_years`: chỉ vào lệnh trong các năm này (mặc định mọi năm của calendar), để chạy
+    từng đoạn lịch sử (walk-forward) trên cùng mảng giá / calendar / passage.
+
+    Trả về list các tuple:
+        (entry_i, exit_i, entry_price, exit_price, shares, capital_after, reason)
+    """
+    n = len(calendar)
+    if n == 0:
+        return []
+
+    years = calendar.years
+
+    # list Python cho truy cập phần tử nhanh hơn ndarray trong vòng lặp
+    opens_l = opens.tolist()
+    closes_l = closes.tolist()
+    months_l = calendar.months.tolist()
+    month_end_l = calendar.month_end.tolist()
+
+    capital = float(initial_capital)
+    trades = []
+
+    if trade_years is None:
+        trade_years = range(int(years[0]), int(years[-1]) + 1)
+
+    for year in trade_years:
+        for start_m, end_m in periods:
+
+            # Ngày giao dịch đầu tiên >= ngày 1 của tháng start_m
+            entry_i = calendar.first_on_or_after(pd.Timestamp(year, start_m, 1))
+            if entry_i is None or months_l[entry_i] != start_m:
+                continue
+
+            entry_price = opens_l[entry_i]
+            shares = int(capital // entry_price)
+            if shares <= 0:
+                continue
+
+            if passage is not None:
+                capital = _run_period_first_passage(calendar, passage, opens_l, closes_l, months_l,
+                                                    trades, capital, entry_i, entry_price, shares,
+                                                    start_m, end_m, stop_loss, take_profit)
+                continue
+
+            i = entry_i
+            while i < n:
+
+                # --- 1. End of period ---
+                if months_l[i] == end_m and month_end_l[i]:
+                    exit_price = opens_l[i]
+                    capital = shares * exit_price
+                    trades.append((entry_i, i, entry_price, exit_price, shares, capital, "period_end"))
+                    break
+
+                # --- 2. Stop Loss / Take profit signal ---
+                change = closes_l[i] / entry_price - 1
+
+                if (change <= stop_loss) or (change >= take_profit):
+
+                    exec_i = i + 1
+                    exit_i = i if exec_i >= n else exec_i
+                    exit_price = opens_l[exit_i]
+                    capital = shares * exit_price
+                    trades.append((entry_i, exit_i, entry_price, exit_price, shares, capital,
+                                   "TP" if change >= take_profit else "SL"))
+
+                    # --- 3. Tái mua nếu còn trong giai đoạn ---
+                    if start_m <= months_l[exit_i] <= end_m:
+                        entry_i = exit_i
+                        entry_price = closes_l[entry_i]
+                        shares = int(capital // entry_price)
+                        if shares <= 0:
+                            break
+                        i = exec_i
+                        continue
+                    else:
+                        break
+
+                i += 1
+
+    return trades
+
+
+def _run_period_first_passage(calendar, passage, opens_l, closes_l, months_l,
+                              trades, capital, entry_i, entry_price, shares,
+                              start_m, end_m, stop_loss, take_profit):
+    """Một period của kernel dùng FirstPassageIndex; ghi lệnh vào trades, trả về capital."""
+    n = len(opens_l)
+    i = entry_i
+    while i < n:
+        end_i = calendar.next_period_end(i, end_m)
+        j = passage.first_cross(i, n if end_i is None else end_i, entry_price, stop_loss, take_profit)
+
+        # --- 1. End of period (không chạm SL/TP trước ngày cuối period) ---
+        if j < 0:
+            if end_i is not None:
+                exit_price = opens_l[end_i]
+                capital = shares * exit_price
+                trades.append((entry_i, end_i, entry_price, exit_price, shares, capital, "period_end"))
+            break
+
+        # --- 2. Stop Loss / Take profit signal ---
+        change = closes_l[j] / entry_price - 1
+        exec_i = j + 1
+        exit_i = j if exec_i >= n else exec_i
+        exit_price = opens_l[exit_i]
+        capital = shares * exit_price
+        trades.append((entry_i, exit_i, entry_price, exit_price, shares, capital,
+                       "TP" if change >= take_profit else "SL"))
+
+        # --- 3. Tái mua nếu còn trong giai đoạn ---
+        if not (start_m <= months_l[exit_i] <= end_m):
+            break
+        entry_i = exit_i
+        entry_price = closes_l[entry_i]
+        shares = int(capital // entry_price)
+        if shares <= 0:
+            break
+        i = exec_i
+
+    return capital
+
+
+def _kernel_trades_to_df(index, trades):
+    """Chuyển kết quả của _run_strategy_kernel thành DataFrame giống run_strategy."""
+    if not trades:
+        return pd.DataFrame([])
+
+    entry_i, exit_i, entry_price, exit_price, shares, capital, reason = zip(*trades)
+    entry_price = np.asarray(entry_price, dtype=np.float64)
+    exit_price = np.asarray(exit_price, dtype=np.float64)
+
+    return pd.DataFrame({
+        "entry_date": index[list(entry_i)],
+        "exit_date": index[list(exit_i)],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "shares": np.asarray(shares, dtype=np.int64),
+        "return_pct": (exit_price / entry_price - 1) * 100,
+        "capital_after": np.asarray(capital, dtype=np.float64),
+        "reason": list(reason),
+    })
+
+
+def run_strategy_arrays(calendar, opens, closes,
+                        initial_capital=INITIAL_CAPITAL,
+                        stop_loss=STOP_LOSS,
+                        take_profit=TAKE_PROFIT,
+                        periods=PERIODS,
+                        passage=None,
+                        trade_years=None):
+    """
+    run_strategy (engine 'numpy') trên mảng giá đã chuẩn bị (prepare_price_arrays), không chuẩn hóa / copy df.
+    `calendar`: TradingCalendar của cùng dãy ngày; `passage`: FirstPassageIndex(closes) dựng sẵn
+    (None = tự dựng); `trade_years`: chỉ vào lệnh trong các năm này (xem _run_strategy_kernel).
+    Trả về DataFrame trades giống run_strategy.
+    """
+    if passage is None:
+        passage = FirstPassageIndex(closes)
+    trades = _run_strategy_kernel(calendar, opens, closes,
+                                  initial_capital=initial_capital,
+                                  stop_loss=stop_loss,
+                                  take_profit=take_profit,
+                                  periods=periods,
+                                  passage=passage,
+                                  trade_years=trade_years)
+    return _kernel_trades_to_df(calendar.index, trades)
+
+
 # Chạy chiến lược giao dịch
 def run_strategy(df,
                  initial_capital=INITIAL_CAPITAL,
                  stop_loss=STOP_LOSS,
-                 take_profit=TAKE_PROFIT):
+                 take_profit=TAKE_PROFIT,
+                 engine="pandas",
+                 calendar=None,
+                 periods=None):
+    """
+    engine='pandas': vòng lặp gốc dùng df.loc theo nhãn.
+    engine='numpy' : cùng luật giao dịch, chạy trên mảng NumPy theo vị trí (nhanh hơn nhiều
+                     với dữ liệu dài), trả về DataFrame trades giống hệt.
+    calendar       : TradingCalendar dựng sẵn cho index của df (sau ensure_datetime_index);
+                     nếu None sẽ tự dựng.
+    periods        : danh sách (tháng bắt đầu, tháng kết thúc); mặc định PERIODS.
+    """
+    if engine not in ("pandas", "numpy"):
+        raise ValueError(f"engine không hợp lệ: {engine} (chỉ hỗ trợ 'pandas' hoặc 'numpy')")
 
     df = ensure_datetime_index(df)
 
     if "Open" not in df.columns or "Close" not in df.columns:
         raise KeyError("DataFrame phải có cột Open và Close")
 
+    if periods is None:
+        periods = PERIODS
+
+    if calendar is None:
+        calendar = TradingCalendar(df.index)
+    elif len(calendar) != len(df):
+        raise ValueError("calendar không khớp với index của df")
+
+    if engine == "numpy":
+        _, opens, closes = prepare_price_arrays(df)
+        return run_strategy_arrays(calendar, opens, closes,
+                                   initial_capital=initial_capital,
+                                   stop_loss=stop_loss,
+                                   take_profit=take_profit,
+                                   periods=periods)
+
     idx = df.index
-    periods = [(3, 5), (9, 11)]
     capital = float(initial_capital)
 
     trades = []
@@ -68,26 +299,27 @@ def run_strategy(df,
             # Tìm ngày đầu period 
             raw_day = pd.Timestamp(year, start_m, 1)
 
-            entry_date = get_nearest_trading_day_after(raw_day, idx)
+            entry_i = calendar.first_on_or_after(raw_day)
 
             # Kiểm tra có tồn tại ngày giao dịch trong tháng start_m không
-            if entry_date is None or entry_date.month != start_m:
+            if entry_i is None or idx[entry_i].month != start_m:
                 continue
-            
+
+            entry_date = idx[entry_i]
             entry_price = df.loc[entry_date, "Open"]
             shares = int(capital // entry_price)
             if shares <= 0:
                 continue
 
             # Bắt đầu kiểm tra tín hiệu từ ngày BUY (CLOSE của entry_date)
-            i = idx.get_loc(entry_date)
+            i = entry_i
 
             while i < len(idx):
 
                 today = idx[i]
 
                 # --- 1. End of period ---
-                if is_last_day_of_period(idx, i, end_m):
+                if calendar.is_period_end(i, end_m):
                     exit_date = today
                     exit_price = df.loc[exit_date, "Open"]
                     capital = shares * exit_price
@@ -148,7 +380,7 @@ def run_strategy(df,
 
 # Trực quan lịch sử giao dịch
 def plot_trades(df, trades_df):
-    df['Date'] = pd.to_datetime(df['Date'], errors='coerce', utc=True).dt.tz_convert(None)
+    df['Date'] = parse_dates(df['Date'])
     df = df.dropna(subset=['Date']).set_index('Date').sort_index()
     plt.figure(figsize=(14, 6))
     plt.plot(df.index, df["Open"], label="Open", linewidth=1)
@@ -171,25 +403,26 @@ def plot_trades(df, trades_df):
 
 
 # Trực quan lịch sử giao dịch theo năm
-def plot_trades_by_year(df, trades_df, date_fmt="%m-%Y", show_legend=True):
+def plot_trades_by_year(df, trades_df, date_fmt="%m-%Y", show_legend=True, calendar=None):
     """
     Vẽ một biểu đồ cho mỗi năm.
     """
     df = ensure_datetime_index(df)
+    if calendar is None:
+        calendar = TradingCalendar(df.index)
+    years = calendar.unique_years().tolist()
     if trades_df is None or trades_df.empty:
         # nếu không có lệnh thì vẫn vẽ mỗi năm giá
-        years = sorted(set(df.index.year))
         trades_df = pd.DataFrame(columns=["entry_date","exit_date","entry_price","exit_price","shares","reason"])
     else:
         # đảm bảo datetime
         trades_df['entry_date'] = pd.to_datetime(trades_df['entry_date'])
         trades_df['exit_date'] = pd.to_datetime(trades_df['exit_date'])
-        years = sorted(set(df.index.year))
 
     for year in years:
-        # subset giá của năm
-        mask_year = df.index.year == year
-        df_year = df.loc[mask_year]
+        # subset giá của năm (cắt theo vị trí từ calendar, không quét mask)
+        start, stop = calendar.year_bounds(year)
+        df_year = df.iloc[start:stop]
         if df_year.empty:
             continue
 
@@ -0,0 +1,177 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from first_passage import FirstPassageIndex
+from instrumentation import pipeline
+from parameter_sweep import Combo, build_param_grid, sweep_tasks
+from trading_calendar import TradingCalendar
+from trading_strategy_season import (
+    INITIAL_CAPITAL,
+    PERIODS,
+    STOP_LOSS,
+    TAKE_PROFIT,
+    compute_basic_metrics,
+    ensure_datetime_index,
+    prepare_price_arrays,
+    run_strategy_arrays,
+)
+from yearly_return import compute_yearly_equity_stats, prepare_seasonal_trades
+
+# Một fold: (các năm train, các năm test)
+Fold = Tuple[Tuple[int, ...], Tuple[int, ...]]
+
+
+def make_folds(years: Sequence[int],
+               train_years: int = 5,
+               test_years: int = 1,
+               step: Optional[int] = None,
+               expanding: bool = False) -> List[Fold]:
+    """
+    Chia các năm có dữ liệu thành các fold train / test liên tiếp theo năm:
+    train = train_years năm (expanding=True: từ năm đầu tiên), test = test_years năm ngay sau đó,
+    mỗi fold dịch step năm (mặc định test_years để các đoạn test nối liền, không chồng nhau).
+    """
+    if train_years < 1 or test_years < 1:
+        raise ValueError("train_years và test_years phải >= 1")
+    step = test_years if step is None else step
+    if step < test_years:
+        raise ValueError("step phải >= test_years (các đoạn test không được chồng nhau)")
+    years = [int(y) for y in sorted(set(int(y) for y in years))]
+    folds = []
+    start = 0
+    while start + train_years + test_years <= len(years):
+        train_lo = 0 if expanding else start
+        train = tuple(years[train_lo:start + train_years])
+        test = tuple(years[start + train_years:start + train_years + test_years])
+        folds.append((train, test))
+        start += step
+    return folds
+
+
+def _best_rows(sweep: pd.DataFrame, objective: str, min_trades: int) -> pd.DataFrame:
+    """Dòng có objective lớn nhất của mỗi fold (cùng giá trị thì lấy tổ hợp đứng trước trong lưới)."""
+    valid = sweep[(sweep['Number of trades'] >= min_trades) & sweep[objective].notna()]
+    if valid.empty:
+        return valid
+    return valid.loc[valid.groupby('fold', sort=True)[objective].idxmax()]
+
+
+def walk_forward(df: pd.DataFrame,
+                 stop_losses: Sequence[float] = (STOP_LOSS,),
+                 take_profits: Sequence[float] = (TAKE_PROFIT,),
+                 periods_list: Sequence[Iterable[Tuple[int, int]]] = (PERIODS,),
+                 train_years: int = 5,
+                 test_years: int = 1,
+                 step: Optional[int] = None,
+                 expanding: bool = False,
+                 objective: str = 'CAGR (%)',
+                 min_trades: int = 1,
+                 initial_capital: float = INITIAL_CAPITAL,
+                 n_jobs: Optional[int] = None,
+                 chunk_size: Optional[int] = None,
+                 instrument: bool = False) -> Dict[str, Any]:
+    """
+    Walk-forward cho chiến lược theo mùa: với mỗi fold, chọn tổ hợp stop_loss × take_profit × periods
+    có `objective` (cột của compute_basic_metrics, lớn hơn là tốt hơn) cao nhất trên các năm train,
+    rồi giao dịch tổ hợp đó trên các năm test ngay sau.
+
+    Mảng giá, TradingCalendar và FirstPassageIndex chỉ dựng một lần: mọi fold chạy trên cùng mảng,
+    kernel chỉ vào lệnh trong các năm của fold (trade_years). Mọi (fold, tổ hợp) của bước train
+    được gửi chung một lượt cho sweep_tasks (process pool nếu n_jobs != 1).
+    Bước test chạy tuần tự vì vốn được nối từ fold trước sang fold sau.
+
+    Trả về:
+      - 'folds'   : mỗi dòng một fold (năm train / test, tham số chọn, điểm train, chỉ số out-of-sample)
+      - 'sweep'   : kết quả train của mọi (fold, tổ hợp)
+      - 'trades'  : trades out-of-sample nối liền (thêm cột fold)
+      - 'metrics' : compute_basic_metrics của trades out-of-sample (None nếu không có lệnh)
+      - 'yearly'  : compute_yearly_equity_stats của trades out-of-sample
+    """
+    with pipeline('walk_forward', instrument) as prof:
+        with prof.stage('prepare'):
+            df = ensure_datetime_index(df)
+            if "Open" not in df.columns or "Close" not in df.columns:
+                raise KeyError("DataFrame phải có cột Open và Close")
+            dates, opens, closes = prepare_price_arrays(df)
+            calendar = TradingCalendar(df.index)
+            passage = FirstPassageIndex(closes)
+            folds = make_folds(calendar.unique_years(), train_years, test_years, step, expanding)
+            if not folds:
+                raise ValueError("Không đủ số năm dữ liệu cho một fold train + test")
+            combos: List[Combo] = build_param_grid(stop_losses, take_profits, periods_list)
+            if not combos:
+                raise ValueError("Lưới tham số rỗng")
+
+        with prof.stage('train_sweep'):
+            tasks = [(combo, train) for train, _ in folds for combo in combos]
+            rows = sweep_tasks(dates, opens, closes, tasks,
+                               initial_capital=initial_capital,
+                               n_jobs=n_jobs,
+                               chunk_size=chunk_size)
+            sweep = pd.DataFrame(rows)
+            sweep.insert(0, 'fold', np.repeat(np.arange(len(folds)), len(combos)))
+            if objective not in sweep.columns:
+                raise KeyError(f"Không có cột objective: {objective}")
+            best = _best_rows(sweep, objective, min_trades).set_index('fold')
+
+        with prof.stage('test'):
+            capital = float(initial_capital)
+            fold_rows = []
+            fold_trades = []
+            for k, (train, test) in enumerate(folds):
+                row: Dict[str, Any] = {
+                    'fold': k,
+                    'train_start': train[0], 'train_end': train[-1],
+                    'test_start': test[0], 'test_end': test[-1],
+                }
+                if k not in best.index:
+                    # không tổ hợp nào đủ điều kiện trên train: đứng ngoài thị trường trong đoạn test
+                    row.update({'stop_loss': np.nan, 'take_profit': np.nan, 'periods': None,
+                                'train_score': np.nan, 'start_capital': capital, 'end_capital': capital,
+                                'Number of trades': 0})
+                    fold_rows.append(row)
+                    continue
+
+                chosen = best.loc[k]
+                combo = (chosen['stop_loss'], chosen['take_profit'], chosen['periods'])
+                trades = run_strategy_arrays(calendar, opens, closes,
+                                             initial_capital=capital,
+                                             stop_loss=combo[0],
+                                             take_profit=combo[1],
+                                             periods=combo[2],
+                                             passage=passage,
+                                             trade_years=test)
+                row.update({'stop_loss': combo[0], 'take_profit': combo[1], 'periods': combo[2],
+                            'train_score': chosen[objective], 'start_capital': capital})
+                metrics = compute_basic_metrics(trades, initial_capital=capital)
+                if metrics is None:
+                    row['Number of trades'] = 0
+                else:
+                    capital = float(trades['capital_after'].iloc[-1])
+                    trades.insert(0, 'fold', k)
+                    fold_trades.append(trades)
+                    row.update(metrics)
+                row['end_capital'] = capital
+                fold_rows.append(row)
+
+        with prof.stage('stitch'):
+            folds_df = pd.DataFrame(fold_rows)
+            if fold_trades:
+                trades = pd.concat(fold_trades, ignore_index=True)
+                metrics = compute_basic_metrics(trades, initial_capital=initial_capital)
+                yearly = compute_yearly_equity_stats(prepare_seasonal_trades(trades, drop_other=False),
+                                                     initial_capital)
+            else:
+                trades = pd.DataFrame([])
+                metrics = None
+                yearly = pd.DataFrame(columns=['start_equity', 'end_equity', 'return', 'equity_change', 'contribution'])
+
+    return prof.attach({
+        'folds': folds_df,
+        'sweep': sweep,
+        'trades': trades,
+        'metrics': metrics,
+        'yearly': yearly,
+    })
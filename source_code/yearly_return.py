@@ -1,23 +1,42 @@
 
+import calendar
 import pandas as pd
-import matplotlib.pyplot as plt
-from typing import Callable, Tuple
-from matplotlib.ticker import MaxNLocator
-from IPython.display import display 
+from typing import Callable, Iterable, Tuple
+from lazy_imports import lazy_module, lazy_callable
+from trading_strategy_season import PERIODS
+
+# matplotlib / IPython chỉ được import khi vẽ hoặc hiển thị
+plt = lazy_module('matplotlib.pyplot')
+display = lazy_callable('IPython.display', 'display')
 
 # Season classification
+def season_label(start_m: int, end_m: int) -> str:
+    """Tên season của giai đoạn (tháng bắt đầu, tháng kết thúc), ví dụ (3, 5) -> 'Mar-May'."""
+    if start_m == end_m:
+        return calendar.month_abbr[start_m]
+    return f"{calendar.month_abbr[start_m]}-{calendar.month_abbr[end_m]}"
+
+
+def season_mapper_for(periods: Iterable[Tuple[int, int]]) -> Callable[[int], str]:
+    """Season mapper cho một danh sách giai đoạn bất kỳ (tháng ngoài mọi giai đoạn -> 'Other')."""
+    labels = {}
+    for start_m, end_m in periods:
+        for m in range(int(start_m), int(end_m) + 1):
+            labels.setdefault(m, season_label(int(start_m), int(end_m)))
+    return lambda month: labels.get(month, "Other")
+
+
 def default_season_mapper(month: int) -> str:
     """
-    Gán season dựa trên tháng entry.
+    Gán season dựa trên tháng entry, theo PERIODS của chiến lược:
 
-    Mar–Jul  : 3–5
-    Oct–Dec  : 9–11
+    Mar–May  : 3–5
+    Sep–Nov  : 9–11
     Other    : còn lại
     """
-    if 3 <= month <= 5:
-        return "Mar-May"
-    if month in (9, 10, 11):
-        return "Sep-Nov"
+    for start_m, end_m in PERIODS:
+        if start_m <= month <= end_m:
+            return season_label(start_m, end_m)
     return "Other"
 
 